@@ -3,8 +3,12 @@
 ###############
 
 from __future__ import annotations
-import sys, signal, string
-from enum import Enum
+import sys, os, signal, string, re, gc, copy, time, math, mmap, pickle, operator, threading, heapq
+from collections import OrderedDict, Counter
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Callable, Iterable, Iterator, TextIO
+from enum import Enum, IntEnum
 
 #################
 ### CONSTANTS ###
@@ -17,22 +21,119 @@ KEYWORDS = [
     'VAR'
 ]
 
+# Leading blanks, then a number, an identifier or any other single character
+TOKEN_PATTERN = re.compile(r'[ \t\r\n]*+(?:([0-9]+(?:\.[0-9]*)?)|([A-Za-z][A-Za-z0-9_]*)|(.))', re.DOTALL)
+# The same over bytes, with the blanks captured so lines can be counted as they are skipped.
+# Only the blanks match at the end of the input.
+BYTES_TOKEN_PATTERN = re.compile(rb'([ \t\r\n]*+)(?:([0-9]+(?:\.[0-9]*)?)|([A-Za-z][A-Za-z0-9_]*)|(.))?', re.DOTALL)
+
+# Widest line of source shown under an error; a longer one is cut down to the part around the span
+EXCERPT_WIDTH = 80
+# Most lines of source shown under an error whose span covers several
+EXCERPT_LINES = 3
+
 ##############
 ### ERRORS ###
 ##############
 
 class ShorkError(Exception):
     def __init__(self, startPosition:Position, endPosition:Position, errorName:str, details:str) -> None:
+        # The span is kept as two offsets into its file's SourceIndex; positions, lines and the
+        # excerpt are only worked out when something asks for them
+        self.source:SourceIndex = None
         self.startPosition = startPosition
         self.endPosition = endPosition
         self.errorName = errorName
         self.details = details
     
+    @property
+    def startPosition(self) -> Position:
+        return self.PositionAt(self.start)
+    
+    @startPosition.setter
+    def startPosition(self, position:Position) -> None:
+        self.start = self.Offset(position)
+    
+    @property
+    def endPosition(self) -> Position:
+        return self.PositionAt(self.end)
+    
+    @endPosition.setter
+    def endPosition(self, position:Position) -> None:
+        self.end = self.Offset(position)
+    
+    def Offset(self, position:Position) -> int|Position:
+        # Only a plain LazyPosition is reduced to its offset; any other is kept as it is, be it one
+        # that already holds its line and column or one that follows a document's edits
+        if type(position) is LazyPosition:
+            self.source = position.source
+            return position.index
+        return position
+    
+    def PositionAt(self, offset:int|Position) -> Position:
+        return LazyPosition(offset, self.source) if type(offset) is int else offset
+    
+    def Release(self) -> ShorkError:
+        # Drops the frames the error was raised through, and whatever was being handled when it
+        # was, so an error that is kept holds on to its span and not to the parser or interpreter
+        # that raised it
+        self.__traceback__ = None
+        self.__context__ = None
+        return self
+    
     def __str__(self) -> str:
         return self.__repr__()
     def __repr__(self) -> str:
-        return f"""{self.errorName}: {self.details}
-File: {self.startPosition.filename}, Line {self.startPosition.line}"""
+        start = self.startPosition
+        if start == None:
+            return f"{self.errorName}: {self.details}"
+        text = f"""{self.Traceback()}{self.errorName}: {self.details}
+File: {start.filename}, Line {start.line + 1}, Column {start.column + 1}"""
+        excerpt = self.Excerpt()
+        return f"{text}\n\n{excerpt}" if excerpt else text
+    
+    def Traceback(self) -> str:
+        # The contexts the error was raised through, outermost first, for errors raised at run time
+        lines = []
+        position, context = self.startPosition, getattr(self, 'context', None)
+        while context != None and position != None:
+            lines.append(f"  File: {position.filename}, Line {position.line + 1}, in {context.displayName}")
+            position, context = context.parentEntryPosition, context.parent
+        if not lines:
+            return ''
+        return 'Traceback (most recent call last):\n' + '\n'.join(reversed(lines)) + '\n'
+    
+    def Excerpt(self) -> str:
+        start, end = self.startPosition, self.endPosition
+        text = start.filetext
+        if text == None:
+            # Positions from a mapped file only know their line and column
+            return ''
+        # A streamed position only has the text of its own chunk
+        base = start.source.baseIndex if isinstance(start, LazyPosition) else 0
+        return Underline(text, start.index - base, (end.index if end != None else start.index + 1) - base)
+
+def Underline(text:str, start:int, end:int) -> str:
+    # The lines the span [start, end) touches, each followed by carets under its part of the span
+    excerpt = []
+    lineStart = text.rfind('\n', 0, start) + 1
+    while len(excerpt) < 2 * EXCERPT_LINES:
+        lineEnd = text.find('\n', lineStart)
+        if lineEnd == -1: lineEnd = len(text)
+        line = text[lineStart:lineEnd].rstrip('\r')
+        first = max(start - lineStart, 0)
+        last = max(min(end, lineEnd) - lineStart, first + 1)
+        if len(line) > EXCERPT_WIDTH:
+            shift = max(min(first - EXCERPT_WIDTH // 4, len(line) - EXCERPT_WIDTH), 0)
+            line = line[shift:shift + EXCERPT_WIDTH]
+            first, last = first - shift, min(last - shift, EXCERPT_WIDTH + 1)
+        # Tabs are kept, so the carets line up however wide they are shown
+        indent = ''.join('\t' if char == '\t' else ' ' for char in line[:first]).ljust(first)
+        excerpt += [line, indent + '^' * (last - first)]
+        if end <= lineEnd + 1 or lineEnd == len(text):
+            break
+        lineStart = lineEnd + 1
+    return '\n'.join(excerpt)
 
 class IllegalCharacterError(ShorkError):
     def __init__(self, startPosition:Position, endPosition:Position, details: str) -> None:
@@ -53,11 +154,44 @@ class RuntimeError(ShorkError):
         super().__init__(startPosition, endPosition, "Runtime Error", details)
         self.context = context
 
+class CircularDependencyError(ShorkError):
+    def __init__(self, startPosition: Position, endPosition: Position, details: str) -> None:
+        super().__init__(startPosition, endPosition, "Circular Dependency", details)
+
+class LimitExceededError(ShorkError):
+    def __init__(self, startPosition: Position, endPosition: Position, details: str, context:Context) -> None:
+        super().__init__(startPosition, endPosition, "Limit Exceeded", details)
+        self.context = context
+
+def ArithmeticFailure(error:ArithmeticError, startPosition:Position, endPosition:Position, context:Context) -> RuntimeError:
+    # Python's own arithmetic errors, as from 0 ^ -1 or a float power too large, reported over the
+    # operator that raised them and worded as the BatchEvaluator words them
+    if isinstance(error, ZeroDivisionError):
+        details = "Cannot raise zero to a negative power"
+    elif isinstance(error, OverflowError) and len(error.args) == 2:
+        # (errno, message), from a float operation that overflowed
+        details = error.args[1]
+    else:
+        details = str(error)
+        details = details[:1].upper() + details[1:]
+    return RuntimeError(startPosition, endPosition, details, context)
+
+def OperatorSpan(node:BinOpNode) -> tuple[Position, Position]:
+    # Where an error in a binary operator is reported: the divisor of a division, as in
+    # Number.DivideBy, and otherwise the operands, which keep their own extent when the
+    # Optimizer gives a simplified node the wider span of the identity it replaced
+    if node.opToken.tokenType == TokenType.DIVIDE:
+        return node.rightNode.startPosition, node.rightNode.endPosition
+    return node.leftNode.startPosition, node.rightNode.endPosition
+
 ################
 ### POSITION ###
 ################
 
 class Position:
+    # Every token holds two, so they carry no per-instance dictionary
+    __slots__ = ('index', 'line', 'column', 'filename', 'filetext')
+
     def __init__(self, index:int, line:int, column:int, filename:str, filetext:str) -> None:
         self.index = index
         self.line = line
@@ -78,6 +212,69 @@ class Position:
     def Copy(self) -> Position:
         return Position(self.index, self.line, self.column, self.filename, self.filetext)
 
+class SourceIndex:
+    def __init__(self, filename:str, text:str, baseIndex:int = 0, baseLine:int = 0, baseColumn:int = 0) -> None:
+        # A streamed file is indexed one chunk at a time; the base values place the chunk in the file
+        self.filename = filename
+        self.text = text
+        self.baseIndex = baseIndex
+        self.baseLine = baseLine
+        self.baseColumn = baseColumn
+        self.lineStarts:list[int] = None
+    
+    def LineStarts(self) -> list[int]:
+        # Only built the first time a line or column is actually needed
+        if self.lineStarts == None:
+            lineStarts = [0]
+            index = self.text.find('\n')
+            while index != -1:
+                lineStarts.append(index + 1)
+                index = self.text.find('\n', index + 1)
+            self.lineStarts = lineStarts
+        return self.lineStarts
+    
+    def LineColumn(self, index:int) -> tuple[int, int]:
+        lineStarts = self.LineStarts()
+        index -= self.baseIndex
+        line = bisect_right(lineStarts, index) - 1
+        column = index - lineStarts[line]
+        if line == 0: column += self.baseColumn
+        return line + self.baseLine, column
+
+class LazyPosition(Position):
+    __slots__ = ('source',)
+
+    def __init__(self, index:int, source:SourceIndex) -> None:
+        self.index = index
+        self.source = source
+    
+    @property
+    def line(self) -> int:
+        return self.source.LineColumn(self.index)[0]
+    
+    @property
+    def column(self) -> int:
+        return self.source.LineColumn(self.index)[1]
+    
+    @property
+    def filename(self) -> str:
+        return self.source.filename
+    
+    @property
+    def filetext(self) -> str:
+        return self.source.text
+    
+    def Advance(self, currentChar=None) -> Position:
+        self.index += 1
+        return self
+    
+    def Copy(self) -> Position:
+        return LazyPosition(self.index, self.source)
+    
+    def __reduce__(self) -> tuple:
+        # Pickled from its own fields; the slots it inherits are shadowed by the properties above
+        return (LazyPosition, (self.index, self.source))
+
 ##############
 ### TOKENS ###
 ##############
@@ -98,11 +295,14 @@ TokenType = Enum('TokenType', [
 
     'LPAREN',
     'RPAREN',
+    'SEMICOLON',
 
     'EOF'
 ])
 
 class Token:
+    __slots__ = ('tokenType', 'value', 'startPosition', 'endPosition')
+
     def __init__(self, tokenType:TokenType, value:any = None, startPosition:Position = None, endPosition:Position = None) -> None:
         self.tokenType = tokenType
         self.value = value
@@ -123,6 +323,81 @@ class Token:
     
     def Matches(self, tokenType:TokenType, value:any) -> bool:
         return (self.tokenType == tokenType) and (self.value == value)
+    
+    @staticmethod
+    def FromPositions(tokenType:TokenType, value:any, startPosition:Position, endPosition:Position) -> Token:
+        # Takes ownership of the positions instead of copying them
+        token = Token.__new__(Token)
+        token.tokenType = tokenType
+        token.value = value
+        token.startPosition = startPosition
+        token.endPosition = endPosition
+        return token
+
+# Token types by their value, as the columns of a TokenBuffer store them
+TOKEN_TYPES = (None, *TokenType)
+
+class TokenView:
+    # Stands in for a Token of a TokenBuffer. The type and value are copied out, since interpreters
+    # read them on every run; positions are only made when asked for.
+    __slots__ = ('tokenType', 'value', 'buffer', 'index')
+
+    def __init__(self, buffer:TokenBuffer, index:int) -> None:
+        self.tokenType = TOKEN_TYPES[buffer.kinds[index]]
+        self.value = buffer.values[index]
+        self.buffer = buffer
+        self.index = index
+    
+    @property
+    def startPosition(self) -> Position:
+        return LazyPosition(self.buffer.starts[self.index], self.buffer.source)
+    
+    @property
+    def endPosition(self) -> Position:
+        return LazyPosition(self.buffer.ends[self.index], self.buffer.source)
+    
+    __repr__ = Token.__repr__
+    Matches = Token.Matches
+
+    def __reduce__(self):
+        # Pickled and deep-copied as a plain Token, rather than dragging the whole buffer along
+        return (Token.FromPositions, (self.tokenType, self.value, self.startPosition, self.endPosition))
+
+class TokenBuffer:
+    # Tokens stored as columns: the type's value and the start and end offsets in arrays, and the
+    # values of numbers and names in a side table that holds None for every other token. No
+    # object is made per token until a TokenView asks for one.
+    def __init__(self, source:SourceIndex) -> None:
+        self.source = source
+        self.kinds = array('B')
+        self.starts = array('q')
+        self.ends = array('q')
+        self.values:list = []
+    
+    def __len__(self) -> int:
+        return len(self.kinds)
+    
+    def __getitem__(self, index:int) -> TokenView:
+        if index < 0: index += len(self.kinds)
+        if not 0 <= index < len(self.kinds):
+            raise IndexError(index)
+        return TokenView(self, index)
+    
+    def __iter__(self) -> Iterator[TokenView]:
+        # Lets any parser read the buffer, at the cost of a view per token
+        return (TokenView(self, index) for index in range(len(self.kinds)))
+
+SINGLE_CHARACTER_TOKENS = {
+    '+': TokenType.PLUS,
+    '-': TokenType.MINUS,
+    '*': TokenType.MULTIPLY,
+    '/': TokenType.DIVIDE,
+    '^': TokenType.POWER,
+    '=': TokenType.EQUALS,
+    '(': TokenType.LPAREN,
+    ')': TokenType.RPAREN,
+    ';': TokenType.SEMICOLON
+}
 
 #############
 ### LEXER ###
@@ -147,7 +422,7 @@ class Lexer:
         tokens = []
 
         while self.currentChar != None:
-            if self.currentChar in ' \t':
+            if self.currentChar in ' \t\r\n':
                 self.Advance()
             
             elif self.currentChar in DIGITS:
@@ -180,6 +455,9 @@ class Lexer:
             elif self.currentChar == ')':
                 tokens.append(Token(TokenType.RPAREN, startPosition=self.position))
                 self.Advance()
+            elif self.currentChar == ';':
+                tokens.append(Token(TokenType.SEMICOLON, startPosition=self.position))
+                self.Advance()
             
             else:
                 char = self.currentChar
@@ -220,11 +498,404 @@ class Lexer:
         tType = TokenType.KEYWORD if id in KEYWORDS else TokenType.IDENTIFIER
         return Token(tType, id, startPosition, self.position)
 
+###################
+### TABLE LEXER ###
+###################
+
+class TableLexer:
+    # Offsets are wrapped in positions of this type
+    positionType = LazyPosition
+
+    @staticmethod
+    def Lex(text:str, filename:str) -> list[Token]:
+        return TableLexer(text, filename).MakeTokens()
+    
+    @staticmethod
+    def Stream(text:str, filename:str) -> Iterator[Token]:
+        return TableLexer(text, filename).IterTokens()
+
+    def __init__(self, text:str, filename:str) -> None:
+        self.text:str = text
+        self.source:SourceIndex = SourceIndex(filename, text)
+    
+    def MakeTokens(self) -> list[Token]:
+        # Tokens never form reference cycles, so the cyclic collector only slows down building
+        # a large token list
+        gcWasEnabled = gc.isenabled()
+        gc.disable()
+        try:
+            return list(self.IterTokens())
+        finally:
+            if gcWasEnabled: gc.enable()
+    
+    def IterTokens(self) -> Iterator[Token]:
+        index = yield from self.ScanTokens(self.text, 0, self.source)
+        yield Token.FromPositions(TokenType.EOF, None, self.positionType(index, self.source), self.positionType(index + 1, self.source))
+    
+    def ScanTokens(self, text:str, index:int, source:SourceIndex, end:int = None) -> Iterator[Token]:
+        # Produces the same tokens as Lexer, but only records offsets; line and column are
+        # worked out by the SourceIndex when a position is actually inspected.
+        # Scanning stops before any number or identifier that runs into `end`, and the
+        # returned index is where the next scan has to resume.
+        match = TOKEN_PATTERN.match
+        makeToken = Token.FromPositions
+        makePosition = self.positionType
+        singleCharacterTokens = SINGLE_CHARACTER_TOKENS
+        base = source.baseIndex
+
+        while True:
+            m = match(text, index)
+            if m == None:
+                return len(text) + base
+
+            group = m.lastindex
+            start = m.start(group)
+            if m.end() == end and group != 3:
+                return start + base
+            index = m.end()
+            lexeme = m.group(group)
+
+            if group == 1:
+                if '.' in lexeme:
+                    yield makeToken(TokenType.FLOAT, float(lexeme), makePosition(start + base, source), makePosition(index + base, source))
+                else:
+                    yield makeToken(TokenType.INT, int(lexeme), makePosition(start + base, source), makePosition(index + base, source))
+            elif group == 2:
+                tType = TokenType.KEYWORD if lexeme in KEYWORDS else TokenType.IDENTIFIER
+                yield makeToken(tType, lexeme, makePosition(start + base, source), makePosition(index + base, source))
+            else:
+                tType = singleCharacterTokens.get(lexeme)
+                if tType == None:
+                    raise IllegalCharacterError(makePosition(start + base, source), makePosition(index + base, source), f"'{lexeme}'")
+                yield makeToken(tType, None, makePosition(start + base, source), makePosition(index + base, source))
+
+class StreamLexer(TableLexer):
+    @staticmethod
+    def Lex(stream:TextIO, filename:str, chunkSize:int = 1 << 16) -> list[Token]:
+        return StreamLexer(stream, filename, chunkSize).MakeTokens()
+    
+    @staticmethod
+    def Stream(stream:TextIO, filename:str, chunkSize:int = 1 << 16) -> Iterator[Token]:
+        return StreamLexer(stream, filename, chunkSize).IterTokens()
+
+    def __init__(self, stream:TextIO, filename:str, chunkSize:int = 1 << 16) -> None:
+        self.stream = stream
+        self.filename = filename
+        self.chunkSize = chunkSize
+    
+    def IterTokens(self) -> Iterator[Token]:
+        # Reads the stream a chunk at a time, so only the current chunk and the tokens the
+        # parser still holds are kept alive.  Each chunk gets its own SourceIndex, placed in
+        # the file by its starting offset, line and column.
+        carry = ''
+        baseIndex = baseLine = baseColumn = 0
+
+        while True:
+            chunk = self.stream.read(self.chunkSize)
+            text = carry + chunk
+            source = SourceIndex(self.filename, text, baseIndex, baseLine, baseColumn)
+            # Without more input, a token touching the end of the chunk might still continue
+            resume = yield from self.ScanTokens(text, 0, source, len(text) if chunk else None)
+            if not chunk: break
+
+            consumed = resume - baseIndex
+            newlines = text.count('\n', 0, consumed)
+            if newlines:
+                baseLine += newlines
+                baseColumn = consumed - text.rfind('\n', 0, consumed) - 1
+            else:
+                baseColumn += consumed
+            baseIndex = resume
+            carry = text[consumed:]
+        
+        yield Token.FromPositions(TokenType.EOF, None, self.positionType(resume, source), self.positionType(resume + 1, source))
+
+class MappedLexer:
+    @staticmethod
+    def Stream(buffer:bytes|mmap.mmap, filename:str) -> Iterator[Token]:
+        return MappedLexer(buffer, filename).IterTokens()
+
+    def __init__(self, buffer:bytes|mmap.mmap, filename:str) -> None:
+        # Scans any bytes-like buffer, a memory-mapped file included, without decoding it into a str.
+        # Every valid token is ASCII, so byte offsets are character offsets up to the first error.
+        self.buffer = buffer
+        self.filename = filename
+        self.index = 0
+        # Lines are counted while scanning, so positions are complete without keeping the text
+        self.line = 0
+        self.lineStart = 0
+    
+    def IterTokens(self) -> Iterator[Token]:
+        # Carries on from wherever the last scan stopped, including just past an illegal character
+        match = BYTES_TOKEN_PATTERN.match
+        makeToken = Token.FromPositions
+        singleCharacterTokens = SINGLE_CHARACTER_TOKENS
+        buffer, filename = self.buffer, self.filename
+
+        while True:
+            m = match(buffer, self.index)
+            blanks = m.group(1)
+            if blanks and b'\n' in blanks:
+                self.line += blanks.count(b'\n')
+                self.lineStart = m.start(1) + blanks.rindex(b'\n') + 1
+            
+            group = m.lastindex
+            if group == 1:
+                self.index = m.end()
+                break
+            start, end = m.span(group)
+            self.index = end
+            lexeme = m.group(group)
+            startPosition = Position(start, self.line, start - self.lineStart, filename, None)
+            endPosition = Position(end, self.line, end - self.lineStart, filename, None)
+
+            if group == 2:
+                if b'.' in lexeme:
+                    yield makeToken(TokenType.FLOAT, float(lexeme), startPosition, endPosition)
+                else:
+                    yield makeToken(TokenType.INT, int(lexeme), startPosition, endPosition)
+            elif group == 3:
+                lexeme = lexeme.decode('ascii')
+                yield makeToken(TokenType.KEYWORD if lexeme in KEYWORDS else TokenType.IDENTIFIER, lexeme, startPosition, endPosition)
+            else:
+                tType = singleCharacterTokens.get(chr(lexeme[0])) if lexeme[0] < 0x80 else None
+                if tType == None:
+                    raise self.IllegalCharacter(startPosition)
+                yield makeToken(tType, None, startPosition, endPosition)
+        
+        yield makeToken(TokenType.EOF, None, Position(self.index, self.line, self.index - self.lineStart, filename, None),
+                        Position(self.index + 1, self.line, self.index - self.lineStart + 1, filename, None))
+    
+    def IllegalCharacter(self, startPosition:Position) -> IllegalCharacterError:
+        # A character outside ASCII spans several bytes; the whole of it is reported and skipped.
+        # A byte that does not start one, such as Latin-1 text, is reported and skipped alone, so
+        # whatever follows it, a newline included, is still lexed.
+        start = startPosition.index
+        length = 1
+        lead = self.buffer[start]
+        if lead >= 0xF0: length = 4
+        elif lead >= 0xE0: length = 3
+        elif lead >= 0xC0: length = 2
+        try:
+            char = bytes(self.buffer[start:start + length]).decode('utf-8')
+        except UnicodeDecodeError:
+            length = 1
+            char = bytes(self.buffer[start:start + 1]).decode('utf-8', 'replace')
+        self.index = min(start + length, len(self.buffer))
+        # Columns count characters, so the rest of the line is shifted back by the extra bytes
+        self.lineStart += self.index - start - 1
+        endPosition = Position(self.index, self.line, self.index - self.lineStart, self.filename, None)
+        return IllegalCharacterError(startPosition, endPosition, f"'{char}'")
+
+class ColumnarLexer(TableLexer):
+    @staticmethod
+    def Lex(text:str, filename:str) -> TokenBuffer:
+        return ColumnarLexer(text, filename).MakeBuffer()
+    
+    def MakeBuffer(self) -> TokenBuffer:
+        # Scans like TableLexer, appending to the columns instead of making Tokens
+        text, source = self.text, self.source
+        buffer = TokenBuffer(source)
+        match = TOKEN_PATTERN.match
+        singleCharacterTokens = SINGLE_CHARACTER_TOKENS
+        appendKind, appendStart, appendEnd, appendValue = buffer.kinds.append, buffer.starts.append, buffer.ends.append, buffer.values.append
+        INT, FLOAT, IDENTIFIER, KEYWORD = TokenType.INT.value, TokenType.FLOAT.value, TokenType.IDENTIFIER.value, TokenType.KEYWORD.value
+        # A name used many times is stored once
+        names = {}
+        index = 0
+
+        while True:
+            m = match(text, index)
+            if m == None:
+                break
+            group = m.lastindex
+            start = m.start(group)
+            index = m.end()
+            lexeme = m.group(group)
+
+            if group == 1:
+                if '.' in lexeme:
+                    appendKind(FLOAT)
+                    appendValue(float(lexeme))
+                else:
+                    appendKind(INT)
+                    appendValue(int(lexeme))
+            elif group == 2:
+                appendKind(KEYWORD if lexeme in KEYWORDS else IDENTIFIER)
+                appendValue(names.setdefault(lexeme, lexeme))
+            else:
+                tType = singleCharacterTokens.get(lexeme)
+                if tType == None:
+                    raise IllegalCharacterError(LazyPosition(start, source), LazyPosition(index, source), f"'{lexeme}'")
+                appendKind(tType.value)
+                appendValue(None)
+            appendStart(start)
+            appendEnd(index)
+        
+        appendKind(TokenType.EOF.value)
+        appendValue(None)
+        appendStart(len(text))
+        appendEnd(len(text) + 1)
+        return buffer
+
+######################
+### PARALLEL LEXER ###
+######################
+
+# Smallest share of a source each worker lexes; anything shorter is lexed in one piece
+PARALLEL_CHUNK_BYTES = 1 << 20
+
+def ScanChunk(data:bytes, base:int) -> tuple:
+    # Lexes one chunk of UTF-8 source that starts at offset base and ends just after a newline,
+    # or at the end of the source. Returns the chunk's columns as a TokenBuffer holds them, the
+    # offsets its lines start at, and the offset of its first illegal character, if any. Every
+    # valid token is ASCII, so up to that character byte offsets are character offsets.
+    match = BYTES_TOKEN_PATTERN.match
+    singleCharacterTokens = SINGLE_CHARACTER_TOKENS
+    INT, FLOAT, IDENTIFIER, KEYWORD = TokenType.INT.value, TokenType.FLOAT.value, TokenType.IDENTIFIER.value, TokenType.KEYWORD.value
+    kinds, starts, ends, values = array('B'), array('q'), array('q'), []
+    lineStarts = array('q')
+    index = 0
+    while True:
+        m = match(data, index)
+        blanks = m.group(1)
+        if blanks and b'\n' in blanks:
+            newline = blanks.find(b'\n')
+            while newline != -1:
+                lineStarts.append(base + m.start(1) + newline + 1)
+                newline = blanks.find(b'\n', newline + 1)
+        group = m.lastindex
+        if group == 1:
+            return kinds, starts, ends, values, lineStarts, None
+        start, index = m.span(group)
+        lexeme = m.group(group)
+
+        if group == 2:
+            if b'.' in lexeme:
+                kinds.append(FLOAT)
+                values.append(float(lexeme))
+            else:
+                kinds.append(INT)
+                values.append(int(lexeme))
+        elif group == 3:
+            lexeme = lexeme.decode('ascii')
+            kinds.append(KEYWORD if lexeme in KEYWORDS else IDENTIFIER)
+            values.append(lexeme)
+        else:
+            tType = singleCharacterTokens.get(chr(lexeme[0])) if lexeme[0] < 0x80 else None
+            if tType == None:
+                return kinds, starts, ends, values, lineStarts, base + start
+            kinds.append(tType.value)
+            values.append(None)
+        starts.append(base + start)
+        ends.append(base + index)
+
+def ScanSharedChunk(memoryName:str, start:int, end:int) -> tuple:
+    # Runs in a worker, which maps the source rather than being sent it
+    from multiprocessing import shared_memory
+    memory = shared_memory.SharedMemory(memoryName)
+    try:
+        data = bytes(memory.buf[start:end])
+    finally:
+        memory.close()
+    return ScanChunk(data, start)
+
+class ParallelLexer:
+    @staticmethod
+    def Lex(text:str, filename:str, jobs:int = None, chunkSize:int = PARALLEL_CHUNK_BYTES, executor = None) -> list[Token]:
+        return ParallelLexer(text, filename, jobs, chunkSize, executor).MakeTokens()
+    
+    @staticmethod
+    def Buffer(text:str, filename:str, jobs:int = None, chunkSize:int = PARALLEL_CHUNK_BYTES, executor = None) -> TokenBuffer:
+        return ParallelLexer(text, filename, jobs, chunkSize, executor).MakeBuffer()
+
+    def __init__(self, text:str, filename:str, jobs:int = None, chunkSize:int = PARALLEL_CHUNK_BYTES, executor = None) -> None:
+        # Lexes the text in chunks split after newlines, which no token spans, across a process
+        # pool reading one shared copy of the source. The result is the sequential lexers' to the
+        # letter, errors included. An executor passed in is used instead of a pool of its own,
+        # and one job lexes the chunks in this process.
+        self.text = text
+        self.source = SourceIndex(filename, text)
+        self.jobs = jobs or os.cpu_count() or 1
+        self.chunkSize = max(chunkSize, 1)
+        self.executor = executor
+    
+    def MakeTokens(self) -> list[Token]:
+        buffer = self.MakeBuffer()
+        positions = self.source
+        gcWasEnabled = gc.isenabled()
+        gc.disable()
+        try:
+            return [Token.FromPositions(TOKEN_TYPES[kind], value, LazyPosition(start, positions), LazyPosition(end, positions))
+                    for kind, value, start, end in zip(buffer.kinds, buffer.values, buffer.starts, buffer.ends)]
+        finally:
+            if gcWasEnabled: gc.enable()
+    
+    def Split(self, data:bytes) -> list[tuple[int, int]]:
+        bounds = []
+        start = 0
+        while start < len(data):
+            newline = data.find(b'\n', start + self.chunkSize - 1)
+            end = newline + 1 if newline != -1 else len(data)
+            bounds.append((start, end))
+            start = end
+        return bounds
+    
+    def MakeBuffer(self) -> TokenBuffer:
+        data = self.text.encode('utf-8', 'surrogatepass')
+        bounds = self.Split(data)
+        if self.jobs == 1 or len(bounds) <= 1:
+            chunks = [ScanChunk(data[start:end], start) for start, end in bounds]
+        else:
+            chunks = self.ScanShared(data, bounds)
+        
+        buffer = TokenBuffer(self.source)
+        lineStarts = [0]
+        for kinds, starts, ends, values, chunkLineStarts, error in chunks:
+            if error != None:
+                # Everything before the first illegal character is ASCII, so its offset is the
+                # same in characters; the rest of the text is indexed as usual if need be
+                source = self.source
+                raise IllegalCharacterError(LazyPosition(error, source), LazyPosition(error + 1, source), f"'{self.text[error]}'")
+            buffer.kinds.extend(kinds)
+            buffer.starts.extend(starts)
+            buffer.ends.extend(ends)
+            buffer.values.extend(values)
+            lineStarts.extend(chunkLineStarts)
+        # Without an illegal character the text is ASCII, so the lines the workers found are the
+        # source's, and nothing has to scan the text again for them
+        self.source.lineStarts = lineStarts
+        buffer.kinds.append(TokenType.EOF.value)
+        buffer.values.append(None)
+        buffer.starts.append(len(self.text))
+        buffer.ends.append(len(self.text) + 1)
+        return buffer
+    
+    def ScanShared(self, data:bytes, bounds:list[tuple[int, int]]) -> list[tuple]:
+        # Multiprocessing is only needed by this lexer, so it is imported here rather than at startup
+        from multiprocessing import shared_memory
+        from concurrent.futures import ProcessPoolExecutor
+        memory = shared_memory.SharedMemory(create=True, size=len(data))
+        try:
+            memory.buf[:len(data)] = data
+            tasks = [(memory.name, start, end) for start, end in bounds]
+            if self.executor != None:
+                return list(self.executor.map(ScanSharedChunk, *zip(*tasks)))
+            with ProcessPoolExecutor(min(self.jobs, len(bounds))) as executor:
+                return list(executor.map(ScanSharedChunk, *zip(*tasks)))
+        finally:
+            memory.close()
+            memory.unlink()
+
 #############
 ### NODES ###
 #############
 
 class NodeBase:
+    # Set by the HashConser on a node that has more than one parent and assigns nothing: the names
+    # it reads. The MemoInterpreter keeps its result until one of them is assigned.
+    memoReads:frozenset = None
+
     def __init__(self, startPosition:Position, endPosition:Position) -> None:
         self.startPosition = startPosition
         self.endPosition = endPosition
@@ -243,6 +914,10 @@ class BinOpNode(NodeBase):
         self.leftNode = leftNode
         self.opToken = opToken
         self.rightNode = rightNode
+        # Filled in by the AdaptiveInterpreter: the specialized form, and executions counted
+        # towards specializing it or misses counted towards giving the specialization up
+        self.specialization:Specialization = None
+        self.counter = 0
     
     def __repr__(self) -> str:
         return f'({self.leftNode}, {self.opToken}, {self.rightNode})'
@@ -262,11 +937,40 @@ class VarAssignNode(NodeBase):
         super().__init__(varNameToken.startPosition, valueNode.endPosition)
         self.varNameToken = varNameToken
         self.valueNode = valueNode
+        # Filled in by the Resolver
+        self.depth:int = 0
+        self.slot:int = None
 
 class VarAccessNode(NodeBase):
     def __init__(self, varNameToken:Token) -> None:
         super().__init__(varNameToken.startPosition, varNameToken.endPosition)
         self.varNameToken = varNameToken
+        # Filled in by the Resolver
+        self.depth:int = 0
+        self.slot:int = None
+
+def ChildNodes(node:NodeBase) -> tuple[NodeBase, ...]:
+    # Children in the order they are evaluated
+    match node:
+        case BinOpNode():
+            return (node.leftNode, node.rightNode)
+        case UnaryOpNode():
+            return (node.node,)
+        case VarAssignNode():
+            return (node.valueNode,)
+    return ()
+
+def PostOrder(rootNode:NodeBase) -> Iterator[NodeBase]:
+    # Children before their parent, walked with an explicit stack so any depth of tree fits
+    stack = [(rootNode, False)]
+    while stack:
+        node, expanded = stack.pop()
+        if expanded:
+            yield node
+            continue
+        stack.append((node, True))
+        for child in reversed(ChildNodes(node)):
+            stack.append((child, False))
 
 ####################
 ### PARSE RESULT ###
@@ -299,19 +1003,24 @@ class ParseResult:
 
 class Parser:
     @staticmethod
-    def Parse(tokens: list[Token]) -> NodeBase:
+    def Parse(tokens: Iterable[Token]) -> NodeBase:
         return Parser(tokens).DoParse().node
 
 
-    def __init__(self, tokens: list[Token]) -> None:
-        self.tokens = tokens
+    def __init__(self, tokens: Iterable[Token]) -> None:
+        # Tokens are pulled one at a time, so a lexer generator is only run as far as the parser gets
+        self.tokens:Iterator[Token] = iter(tokens)
         self.tokenIndex = -1
+        self.currentToken:Token = None
+        self.currentType:TokenType = None
         self.Advance()
     
     def Advance(self) -> Token:
         self.tokenIndex += 1
-        if self.tokenIndex < len(self.tokens):
-            self.currentToken:Token = self.tokens[self.tokenIndex]
+        token = next(self.tokens, None)
+        if token != None:
+            self.currentToken = token
+            self.currentType = token.tokenType
         return self.currentToken
     
     def DoParse(self) -> ParseResult:
@@ -383,7 +1092,7 @@ class Parser:
 
             return result.Success(VarAssignNode(varName, expression))
         
-        return result.Success(self.ParseBinOp(self.ParseTerm, (TokenType.PLUS, TokenType.MINUS)))
+        return self.ParseBinOp(self.ParseTerm, (TokenType.PLUS, TokenType.MINUS))
 
 
     def ParseBinOp(self, leftFunc, ops, rightFunc = None) -> ParseResult:
@@ -402,229 +1111,3032 @@ class Parser:
         
         return result.Success(left)
 
-######################
-### RUNTIME RESULT ###
-######################
+class IterativeParser(Parser):
+    # Binding power of each binary operator; '^' is the only right associative one
+    BINARY_PRECEDENCE = {
+        TokenType.PLUS: 1,
+        TokenType.MINUS: 1,
+        TokenType.MULTIPLY: 2,
+        TokenType.DIVIDE: 2,
+        TokenType.POWER: 4
+    }
+    # A sign binds tighter than '*' but looser than '^', so -2^2 is -(2^2)
+    UNARY_PRECEDENCE = 3
+    # Tokens that may follow a complete expression, and the error when anything else does
+    TERMINATORS = (TokenType.EOF, )
+    UNTERMINATED = "Expected '+', '-', '*' or '/'"
 
-class RuntimeResult:
-    def __init__(self) -> None:
-        self.value:Object = None
-    
-    def Register(self, result:RuntimeResult) -> Object:
-        return result.value
-    
-    def Success(self, value:Object) -> RuntimeResult:
-        self.value = value
-        return self
-    
-    def Failure(self, error:ShorkError) -> None:
-        raise error
+    @staticmethod
+    def Parse(tokens: Iterable[Token]) -> NodeBase:
+        return IterativeParser(tokens).DoParse().node
 
-##############
-### VALUES ###
-##############
+    def DoParse(self) -> ParseResult:
+        # Operator precedence parsing over explicit stacks. Tokens are consumed, and errors raised,
+        # at exactly the points the recursive Parser consumes and raises them, so both build the
+        # same trees and report the same errors.
+        operands:list[NodeBase] = []
+        # (kind, token, precedence); '(' and 'VAR' entries close only when their expression ends
+        operators:list[tuple[str, Token, int]] = []
+        expectOperand = True
+        expressionStart = True
 
-class Object:
-    def __init__(self, value:any) -> None:
-        self.value = value
+        # Decisions are made on the current token's type alone; the token itself is only taken
+        # when it goes into the tree or an error, which spares a TokenBuffer making views
+        while True:
+            tokenType = self.currentType
+            if expectOperand:
+                if expressionStart and tokenType == TokenType.KEYWORD and self.currentToken.value == 'VAR':
+                    self.Advance()
+                    if self.currentType != TokenType.IDENTIFIER:
+                        raise InvalidSyntaxError(self.currentToken.startPosition, self.currentToken.endPosition,
+                                                 "Expected identifier")
+                    varName = self.currentToken
+                    self.Advance()
+                    if self.currentType != TokenType.EQUALS:
+                        raise InvalidSyntaxError(self.currentToken.startPosition, self.currentToken.endPosition,
+                                                 "Expected '='")
+                    self.Advance()
+                    operators.append(('var', varName, 0))
+                    continue
 
-    def __repr__(self) -> str:
-        return f'{self.value}'
+                expressionStart = False
+                token = self.currentToken
+                if tokenType in (TokenType.PLUS, TokenType.MINUS):
+                    self.Advance()
+                    operators.append(('unary', token, self.UNARY_PRECEDENCE))
+                elif tokenType in (TokenType.INT, TokenType.FLOAT):
+                    self.Advance()
+                    operands.append(NumberNode(token))
+                    expectOperand = False
+                elif tokenType == TokenType.IDENTIFIER:
+                    self.Advance()
+                    operands.append(VarAccessNode(token))
+                    expectOperand = False
+                elif tokenType == TokenType.LPAREN:
+                    group = self.ReuseGroup(token)
+                    if group != None:
+                        operands.append(group)
+                        expectOperand = False
+                        continue
+                    self.Advance()
+                    operators.append(('paren', token, 0))
+                    expressionStart = True
+                else:
+                    raise InvalidSyntaxError(token.startPosition, token.endPosition, "Expected int, float, '+', '-' or ')'")
+                continue
 
-    def SetPosition(self, startPosition, endPosition:Position = None) -> Object:
-        self.startPosition = startPosition
-        self.endPosition = endPosition
-        return self
-    
-    def SetContext(self, context:Context) -> Object:
-        self.context = context
-        return self
-    
-    def AddTo(self, other:Object) -> Object:
-        raise NotImplementedError(None, None, f"{type(self).__name__}.AddTo")
+            precedence = self.BINARY_PRECEDENCE.get(tokenType)
+            if precedence != None:
+                rightAssociative = tokenType == TokenType.POWER
+                while operators and operators[-1][0] in ('binary', 'unary') and \
+                      (operators[-1][2] > precedence or (operators[-1][2] == precedence and not rightAssociative)):
+                    self.Reduce(operators.pop(), operands)
+                token = self.currentToken
+                self.Advance()
+                operators.append(('binary', token, precedence))
+                expectOperand = True
+                continue
+
+            # Anything else ends the innermost expression
+            while operators and operators[-1][0] != 'paren':
+                self.Reduce(operators.pop(), operands)
+            if operators:
+                token = self.currentToken
+                if tokenType != TokenType.RPAREN:
+                    raise InvalidSyntaxError(token.startPosition, token.endPosition, "Expected ')'")
+                self.CloseGroup(operators.pop()[1], token, operands[-1])
+                self.Advance()
+                continue
+
+            if tokenType not in self.TERMINATORS:
+                token = self.currentToken
+                raise InvalidSyntaxError(token.startPosition, token.endPosition, self.UNTERMINATED)
+            return ParseResult().Success(operands.pop())
+
+    def ReuseGroup(self, openToken:Token) -> NodeBase:
+        # A parenthesized group parses the same wherever it appears, so a parser that remembers
+        # groups may hand back an earlier tree for it and skip its tokens
+        return None
+
+    def CloseGroup(self, openToken:Token, closeToken:Token, node:NodeBase) -> None:
+        pass
+
+    def Reduce(self, operator:tuple[str, Token, int], operands:list[NodeBase]) -> None:
+        kind, token, _ = operator
+        if kind == 'binary':
+            right = operands.pop()
+            operands.append(BinOpNode(operands.pop(), token, right))
+        elif kind == 'unary':
+            operands.append(UnaryOpNode(token, operands.pop()))
+        else:
+            operands.append(VarAssignNode(token, operands.pop()))
+
+class StatementParser(IterativeParser):
+    # statement := expression? (';' | EOF)
+    TERMINATORS = (TokenType.SEMICOLON, TokenType.EOF)
+    UNTERMINATED = "Expected '+', '-', '*', '/' or ';'"
+
+    def NextStatement(self) -> NodeBase:
+        # Returns the next statement's tree, or None once the input is used up
+        while self.currentType == TokenType.SEMICOLON:
+            self.Advance()
+        if self.currentType == TokenType.EOF:
+            return None
+        return self.DoParse().node
     
-    def SubFrom(self, other:Object) -> Object:
-        raise NotImplementedError(None, None, f"{type(self).__name__}.SubFrom")
+    def SkipStatement(self) -> None:
+        # Recovers from a syntax error by dropping the rest of the statement
+        while self.currentType not in self.TERMINATORS:
+            self.Advance()
     
-    def MultiplyBy(self, other:Object) -> Object:
-        raise NotImplementedError(None, None, f"{type(self).__name__}.MultiplyBy")
+    def Resume(self, tokens:Iterable[Token]) -> None:
+        # Carries on with a fresh token stream after the lexer stopped on an error
+        self.tokens = iter(tokens)
+        self.Advance()
+
+class BufferParser(IterativeParser):
+    @staticmethod
+    def Parse(buffer:TokenBuffer) -> NodeBase:
+        return BufferParser(buffer).DoParse().node
+
+    def __init__(self, buffer:TokenBuffer) -> None:
+        # Walks the type column; a TokenView is made only for a token the parser takes
+        self.buffer = buffer
+        self.kinds = buffer.kinds
+        self.tokenIndex = -1
+        self.currentType:TokenType = None
+        self.Advance()
     
-    def DivideBy(self, other:Object) -> Object:
-        raise NotImplementedError(None, None, f"{type(self).__name__}.DivideBy")
+    @property
+    def currentToken(self) -> TokenView:
+        return TokenView(self.buffer, self.tokenIndex)
     
-    def ToPowerOf(self, other:Object) -> Object:
-        raise NotImplementedError(None, None, f"{type(self).__name__}.ToPowerOf")
+    def Advance(self) -> None:
+        # Stays on the last token, the EOF, once the buffer is used up
+        if self.tokenIndex + 1 < len(self.kinds):
+            self.tokenIndex += 1
+            self.currentType = TOKEN_TYPES[self.kinds[self.tokenIndex]]
+
+############################
+### INCREMENTAL ANALYSIS ###
+############################
+
+class DocumentSource(SourceIndex):
+    def __init__(self, filename:str, text:str) -> None:
+        super().__init__(filename, text)
+        # (first shifted offset, shift) for every edit; positions replay the edits made since
+        # they were created, so untouched tokens cost nothing when the text changes
+        self.edits:list[tuple[int, int]] = []
+        # Edits dropped from the front of the log once every live position has caught up
+        self.editBase = 0
     
-class Number(Object):
-    def __init__(self, value: int|float) -> None:
-        super().__init__(value)
+    @property
+    def version(self) -> int:
+        return self.editBase + len(self.edits)
     
-    def AddTo(self, other: Object) -> Object:
-        match other:
-            case Number():
-                return Number(self.value + other.value).SetContext(self.context)
-            case _:
-                raise RuntimeError(self.startPosition, self.endPosition, f"Cannot use the '+' operator on objects of type 'Number' and '{type(other).__name__}'")
+    def Replace(self, offset:int, removedLength:int, insertedText:str) -> None:
+        self.text = self.text[:offset] + insertedText + self.text[offset + removedLength:]
+        self.lineStarts = None
+        self.edits.append((offset + removedLength, len(insertedText) - removedLength))
     
-    def SubFrom(self, other: Object) -> Object:
-        match other:
-            case Number():
-                return Number(self.value - other.value).SetContext(self.context)
-            case _:
-                raise RuntimeError(self.startPosition, self.endPosition, f"Cannot use the '-' operator on objects of type 'Number' and '{type(other).__name__}'")
+    def Compact(self, positions:Iterable[DocumentPosition]) -> None:
+        # Brings the given positions up to date and forgets the log; any other position
+        # still waiting on the log keeps the offset it had
+        for position in positions:
+            position.index
+        self.editBase = self.version
+        self.edits = []
+
+class DocumentPosition(LazyPosition):
+    __slots__ = ('offset', 'version')
+
+    def __init__(self, index:int, source:DocumentSource) -> None:
+        self.source = source
+        self.offset = index
+        self.version = source.version
     
-    def MultiplyBy(self, other: Object) -> Object:
-        match other:
-            case Number():
-                return Number(self.value * other.value).SetContext(self.context)
-            case _:
-                raise RuntimeError(self.startPosition, self.endPosition, f"Cannot use the '*' operator on objects of type 'Number' and '{type(other).__name__}'")
+    @property
+    def index(self) -> int:
+        source = self.source
+        if self.version != source.version:
+            offset = self.offset
+            for threshold, shift in source.edits[max(self.version - source.editBase, 0):]:
+                if offset >= threshold:
+                    offset += shift
+            self.offset = offset
+            self.version = source.version
+        return self.offset
     
-    def DivideBy(self, other: Object) -> Object:
-        match other:
-            case Number():
-                if other.value == 0:
-                    raise RuntimeError(other.startPosition, other.endPosition, "Cannot divide by zero")
-                return Number(self.value * other.value).SetContext(self.context)
-            case _:
-                raise RuntimeError(self.startPosition, self.endPosition, f"Cannot use the '/' operator on objects of type 'Number' and '{type(other).__name__}'")
+    @index.setter
+    def index(self, index:int) -> None:
+        self.offset = index
+        self.version = self.source.version
     
-    def ToPowerOf(self, other: Object) -> Object:
-        match other:
-            case Number():
-                return Number(self.value ** other.value).SetContext(self.context)
-            case _:
-                raise RuntimeError(self.startPosition, self.endPosition, f"Cannot use the '^' operator on objects of type 'Number' and '{type(other).__name__}'")
+    def Copy(self) -> Position:
+        return DocumentPosition(self.index, self.source)
 
-###############
-### CONTEXT ###
-###############
+class IncrementalLexer(TableLexer):
+    positionType = DocumentPosition
 
-class Context:
-    def __init__(self, displayName, symbolTable:SymbolTable=None, parent=None, parentEntryPosition=None):
-        self.displayName = displayName
-        self.parent = parent
-        self.parentEntryPosition = parentEntryPosition
-        self.symbolTable:SymbolTable = None
+    def __init__(self, source:DocumentSource) -> None:
+        self.text:str = source.text
+        self.source:DocumentSource = source
 
-####################
-### SYMBOL TABLE ###
-####################
+class IncrementalParser(IterativeParser):
+    def __init__(self, tokens:list[Token], groups:dict[Token, tuple], editStart:int = 0, editEnd:int = 0,
+                 owners:dict[Token, NodeBase] = None) -> None:
+        self.tokenList = tokens
+        # Every group parsed so far: opening token -> (tree, closing token, token count)
+        self.groups = groups
+        # The node each operator, and each assigned name, was reduced into
+        self.owners = owners if owners != None else {}
+        # Tokens in [editStart, editEnd) are new; a group overlapping them is parsed again
+        self.editStart = editStart
+        self.editEnd = editEnd
+        self.openIndexes:dict[Token, int] = {}
+        self.reusedGroups = 0
+        super().__init__(tokens)
+    
+    def Advance(self) -> Token:
+        if self.tokenIndex + 1 < len(self.tokenList):
+            self.tokenIndex += 1
+            self.currentToken = self.tokenList[self.tokenIndex]
+            self.currentType = self.currentToken.tokenType
+        return self.currentToken
+    
+    def ReuseGroup(self, openToken:Token) -> NodeBase:
+        index = self.tokenIndex
+        group = self.groups.get(openToken)
+        if group != None:
+            node, closeToken, count = group
+            last = index + count - 1
+            if last >= len(self.tokenList) or self.tokenList[last] is not closeToken:
+                # Edits patched into the group in place may have changed how many tokens it holds
+                last = bisect_left(self.tokenList, closeToken.startPosition.index, index, len(self.tokenList) - 1,
+                                   key=lambda token: token.startPosition.index)
+            if (last < self.editStart or index >= self.editEnd) and self.tokenList[last] is closeToken:
+                self.reusedGroups += 1
+                self.tokenIndex = last
+                self.Advance()
+                return node
+        self.openIndexes[openToken] = index
+        return None
+    
+    def CloseGroup(self, openToken:Token, closeToken:Token, node:NodeBase) -> None:
+        self.groups[openToken] = (node, closeToken, self.tokenIndex - self.openIndexes.pop(openToken) + 1)
+    
+    def Reduce(self, operator:tuple[str, Token, int], operands:list[NodeBase]) -> None:
+        super().Reduce(operator, operands)
+        self.owners[operator[1]] = operands[-1]
 
-class SymbolTable:
-    def __init__(self) -> None:
-        self.symbols = {}
-        self.parent:SymbolTable = None
+class IncrementalDocument:
+    def __init__(self, text:str, filename:str) -> None:
+        self.source = DocumentSource(filename, text)
+        self.tokens:list[Token] = None
+        self.groups:dict[Token, tuple] = {}
+        self.owners:dict[Token, NodeBase] = {}
+        self.tree:NodeBase = None
+        self.error:ShorkError = None
+        # Token range edited since the last successful parse; a failed parse stops early, so
+        # groups around earlier edits may not have been parsed again yet
+        self.dirty = False
+        self.dirtyStart = 0
+        self.dirtyEnd = 0
+        # Work done by the last analysis, for checking that edits stay cheap
+        self.relexedTokens = 0
+        self.reparsedTokens = 0
+        self.reusedGroups = 0
     
-    def Get(self, name):
-        value = self.symbols.get(name, None)
-        if value == None and self.parent:
-            return self.parent.Get(name)
-        return value
+    @property
+    def text(self) -> str:
+        return self.source.text
     
-    def Set(self, name, value):
-        self.symbols[name] = value
+    def Analyze(self) -> NodeBase:
+        # Lexes and parses the whole text from scratch
+        self.groups = {}
+        self.owners = {}
+        self.tokens = None
+        try:
+            self.tokens = IncrementalLexer(self.source).MakeTokens()
+        except ShorkError as error:
+            return self.Failed(error)
+        self.relexedTokens = len(self.tokens)
+        self.dirtyStart, self.dirtyEnd = 0, len(self.tokens)
+        return self.Reparse()
+    
+    def Edit(self, offset:int, removedLength:int, insertedText:str) -> NodeBase:
+        # Replaces text[offset:offset + removedLength] with insertedText and returns the new tree.
+        # Only the tokens around the edit are lexed again. An edit that stays inside one operand,
+        # such as a number or the operator of a small subexpression, has just that operand parsed
+        # again and patched into the tree in place, so a tree returned earlier sees the edit too.
+        # Any other edit parses the whole text again, except for untouched parenthesized groups.
+        if offset < 0 or removedLength < 0 or offset + removedLength > len(self.source.text):
+            raise ValueError(f"Edit {offset}+{removedLength} is outside the document")
+        if self.tokens == None:
+            self.source.Replace(offset, removedLength, insertedText)
+            return self.Analyze()
+        
+        tokens = self.tokens
+        editEnd = offset + removedLength
+        # The first token the edit touches, or that it could run into
+        first = bisect_left(tokens, offset, 0, len(tokens) - 1, key=lambda token: token.endPosition.index)
+        # The first token wholly after the edit, which the lexer may be able to resynchronise on
+        after = bisect_left(tokens, editEnd, first, len(tokens) - 1, key=lambda token: token.startPosition.index)
+        scanStart = tokens[first - 1].endPosition.index if first > 0 else 0
 
-    def Remove(self, name):
-        del self.symbols[name]
+        self.source.Replace(offset, removedLength, insertedText)
+        newEditEnd = offset + len(insertedText)
 
-###################
-### INTERPRETER ###
-###################
+        fresh = []
+        resume = None
+        try:
+            for token in IncrementalLexer(self.source).ScanTokens(self.source.text, scanStart, self.source):
+                start = token.startPosition.index
+                if start >= newEditEnd:
+                    # Old tokens have shifted with the edit, so they line up with new ones
+                    while after < len(tokens) - 1 and tokens[after].startPosition.index < start:
+                        after += 1
+                    old = tokens[after]
+                    if after < len(tokens) - 1 and old.startPosition.index == start and \
+                       old.tokenType == token.tokenType and old.value == token.value:
+                        resume = after
+                        break
+                fresh.append(token)
+        except ShorkError as error:
+            self.tokens = None
+            return self.Failed(error)
+        
+        if resume == None:
+            resume = len(tokens) - 1
+        # A token ending where the edit starts is lexed again in case the edit runs into it, but
+        # usually comes back the same, and the old one is kept with its group
+        kept = 0
+        while kept < len(fresh) and first + kept < resume and tokens[first + kept].Matches(fresh[kept].tokenType, fresh[kept].value) and \
+              tokens[first + kept].startPosition.index == fresh[kept].startPosition.index and \
+              tokens[first + kept].endPosition.index == fresh[kept].endPosition.index:
+            kept += 1
+        first += kept
+        fresh = fresh[kept:]
+        removed = tokens[first:resume]
+        for token in removed:
+            if token.tokenType == TokenType.LPAREN:
+                self.groups.pop(token, None)
+        tokens[first:resume] = fresh
+        self.relexedTokens = len(fresh)
 
-class Interpreter:
-    @staticmethod
-    def Interpret(rootNode:NodeBase, context:Context) -> Object:
-        return Interpreter().Visit(rootNode, context).value
+        tree = None
+        if not self.dirty and self.tree != None:
+            # An edit to spacing leaves every token, and so the tree, as it was
+            tree = self.Patch(first, removed, len(fresh)) if removed or fresh else self.tree
+            if not removed and not fresh:
+                self.reparsedTokens = self.reusedGroups = 0
+        for token in removed:
+            self.owners.pop(token, None)
+        if tree == None:
+            self.MarkDirty(first, resume, len(fresh))
 
-    def Visit(self, node:NodeBase, context:Context):
-        if not isinstance(node, NodeBase):
-            raise TypeError(f"Expected 'NodeBase', recieved '{type(node).__name__}'")
+        if len(self.source.edits) > len(tokens):
+            self.source.Compact(position for token in tokens for position in (token.startPosition, token.endPosition))
+        return tree if tree != None else self.Reparse()
+    
+    def OperatorKind(self, token:Token) -> tuple[str, int]:
+        # What a token next to an operand does to it, and how tightly an operator there binds
+        if token == None: return 'start', 0
+        tokenType = token.tokenType
+        if tokenType == TokenType.LPAREN: return 'paren', 0
+        if tokenType == TokenType.RPAREN: return 'close', 0
+        if tokenType == TokenType.EQUALS: return 'var', 0
+        if tokenType in (TokenType.EOF, TokenType.SEMICOLON): return 'end', 0
+        owner = self.owners.get(token)
+        if isinstance(owner, BinOpNode) and owner.opToken is token:
+            return 'binary', IterativeParser.BINARY_PRECEDENCE[tokenType]
+        if isinstance(owner, UnaryOpNode) and owner.opToken is token:
+            return 'unary', IterativeParser.UNARY_PRECEDENCE
+        return None, 0
+    
+    def Patch(self, first:int, removed:list[Token], freshCount:int) -> NodeBase:
+        # The edit replaced the single token removed with tokens[first:first + freshCount]. Parses
+        # the operand that token belonged to on its own and puts it into the tree where the old
+        # operand was. Returns None, having changed nothing the full parse depends on, when the
+        # edit may reach past that operand or the new operand would bind differently.
+        if len(removed) != 1:
+            return None
+        tokens = self.tokens
+        token = removed[0]
+        shift = freshCount - 1
+        if token.tokenType in (TokenType.INT, TokenType.FLOAT) or \
+           (token.tokenType == TokenType.IDENTIFIER and token not in self.owners):
+            startPosition, endPosition = token.startPosition, token.endPosition
+        elif token.tokenType in IterativeParser.BINARY_PRECEDENCE and token in self.owners:
+            startPosition, endPosition = self.owners[token].startPosition, self.owners[token].endPosition
+        else:
+            return None
+        
+        def Old(index:int) -> Token:
+            # The token list as it was before the edit
+            if index < first: return tokens[index]
+            if index == first: return token
+            return tokens[index + shift]
+        def OldIndex(position:DocumentPosition, end:bool) -> int:
+            if position is (token.endPosition if end else token.startPosition):
+                return first
+            key = (lambda token: token.endPosition.index) if end else (lambda token: token.startPosition.index)
+            index = bisect_left(tokens, position.index, 0, len(tokens) - 1, key=key)
+            found = tokens[index].endPosition if end else tokens[index].startPosition
+            if found is not position or first <= index < first + freshCount:
+                return None
+            return index if index < first else index - shift
+        
+        # The operand's tokens before the edit, with the parentheses around it
+        contentStart, contentEnd = OldIndex(startPosition, False), OldIndex(endPosition, True)
+        if contentStart == None or contentEnd == None:
+            return None
+        depth = lowest = 0
+        for index in range(contentStart, contentEnd + 1):
+            tokenType = Old(index).tokenType
+            if tokenType == TokenType.LPAREN: depth += 1
+            elif tokenType == TokenType.RPAREN: depth -= 1
+            lowest = min(lowest, depth)
+        start, end = contentStart + lowest, contentEnd + depth - lowest
+        if start < 0 or any(Old(index).tokenType != TokenType.LPAREN for index in range(start, contentStart)) or \
+           any(Old(index).tokenType != TokenType.RPAREN for index in range(contentEnd + 1, end + 1)):
+            return None
+        while start > 0 and Old(start - 1).tokenType == TokenType.LPAREN and Old(end + 1).tokenType == TokenType.RPAREN:
+            start, end = start - 1, end + 1
+        
+        # The node holding the operand, found as the parser would from the tokens either side
+        left = tokens[start - 1] if start > 0 else None
+        right = tokens[end + 1 + shift]
+        leftKind, leftPrecedence = self.OperatorKind(left)
+        rightKind, rightPrecedence = self.OperatorKind(right)
+        def BindsLeft(precedence:int, tokenType:TokenType) -> bool:
+            # Whether the operator on the left takes the operand before an operator on its right does
+            return precedence > leftPrecedence or (precedence == leftPrecedence and tokenType == TokenType.POWER)
+        if leftKind in ('binary', 'unary') and (rightKind != 'binary' or not BindsLeft(rightPrecedence, right.tokenType)):
+            parent, attribute = self.owners[left], 'rightNode' if leftKind == 'binary' else 'node'
+        elif rightKind == 'binary' and leftKind != None:
+            parent, attribute = self.owners[right], 'leftNode'
+        elif leftKind == 'var' and rightKind in ('close', 'end'):
+            parent, attribute = self.owners.get(tokens[start - 2]), 'valueNode'
+        elif leftKind == 'start' and rightKind == 'end':
+            parent, attribute = self, 'tree'
+        else:
+            return None
+        old = getattr(parent, attribute, None)
+        if old == None or old.startPosition is not startPosition or old.endPosition is not endPosition:
+            return None
+        
+        # Ancestors sharing the operand's first or last position see the new one through the same
+        # object, which has to belong to a token still in the list so Compact keeps it current
+        end += shift
+        contentStart, contentEnd = start, end
+        while contentStart < end and tokens[contentStart].tokenType == TokenType.LPAREN: contentStart += 1
+        while contentEnd > start and tokens[contentEnd].tokenType == TokenType.RPAREN: contentEnd -= 1
+        if contentStart > contentEnd or tokens[contentStart].tokenType == TokenType.KEYWORD:
+            return None
+        for index, edge, position in ((contentStart, 'startPosition', startPosition), (contentEnd, 'endPosition', endPosition)):
+            if getattr(tokens[index], edge) is position:
+                continue
+            if position is not getattr(token, edge) or not first <= index < first + freshCount:
+                return None
+            position.index = getattr(tokens[index], edge).index
+            setattr(tokens[index], edge, position)
+        
+        run = tokens[start:end + 1]
+        run.append(tokens[-1])
+        parser = IncrementalParser(run, self.groups, first - start, first - start + freshCount, self.owners)
+        try:
+            node = parser.DoParse().node
+        except ShorkError:
+            return None
+        # Every operator outside the run's groups has to bind the way it would in the whole text
+        depth = 0
+        for runToken in run[:-1]:
+            tokenType = runToken.tokenType
+            if tokenType == TokenType.LPAREN: depth += 1
+            elif tokenType == TokenType.RPAREN: depth -= 1
+            elif depth == 0 and tokenType in IterativeParser.BINARY_PRECEDENCE:
+                kind, precedence = self.OperatorKind(runToken)
+                if kind == 'binary' and leftKind in ('binary', 'unary') and not BindsLeft(precedence, tokenType):
+                    return None
+                if rightKind == 'binary' and not (precedence > rightPrecedence or
+                                                  (precedence == rightPrecedence and right.tokenType != TokenType.POWER)):
+                    return None
+        
+        setattr(parent, attribute, node)
+        self.reparsedTokens = len(run) - 1
+        self.reusedGroups = parser.reusedGroups
+        self.error = None
+        return self.tree
+    
+    def MarkDirty(self, first:int, resume:int, freshCount:int) -> None:
+        # Tokens [first, resume) were replaced by freshCount new ones
+        def Moved(index:int, inside:int) -> int:
+            if index < first: return index
+            if index >= resume: return index + freshCount - (resume - first)
+            return inside
+        if self.dirty:
+            self.dirtyStart = min(Moved(self.dirtyStart, first), first)
+            self.dirtyEnd = max(Moved(self.dirtyEnd, first + freshCount), first + freshCount)
+        else:
+            self.dirtyStart, self.dirtyEnd = first, first + freshCount
+        self.dirty = True
+    
+    def Reparse(self) -> NodeBase:
+        parser = IncrementalParser(self.tokens, self.groups, self.dirtyStart, self.dirtyEnd, self.owners)
+        self.reparsedTokens = len(self.tokens) - 1
+        # As in TableLexer.MakeTokens, the cyclic collector only slows down building the tree
+        gcWasEnabled = gc.isenabled()
+        gc.disable()
+        try:
+            self.tree = parser.DoParse().node
+        except ShorkError as error:
+            return self.Failed(error)
+        finally:
+            if gcWasEnabled: gc.enable()
+            self.reusedGroups = parser.reusedGroups
+        self.error = None
+        self.dirty = False
+        return self.tree
+    
+    def Failed(self, error:ShorkError) -> None:
+        self.tree = None
+        self.error = error.Release()
+        raise error
+
+#################
+### OPTIMIZER ###
+#################
+
+# NONE leaves the tree alone, FOLD evaluates constant subtrees and SIMPLIFY also applies
+# the identities x*1, 1*x, x-0, x^1, +x and --x, which give back x exactly.  x+0 is left alone,
+# as -0.0 + 0 is 0.0 and dropping the addition would keep -0.0.
+OptimizationLevel = IntEnum('OptimizationLevel', [
+    'NONE',
+    'FOLD',
+    'SIMPLIFY'
+], start=0)
+
+# Powers with results wider than this are left for the interpreter to compute
+MAX_FOLDED_POWER_BITS = 4096
+
+class Optimizer:
+    @staticmethod
+    def Optimize(rootNode:NodeBase, level:OptimizationLevel = OptimizationLevel.SIMPLIFY) -> NodeBase:
+        return Optimizer(level).DoOptimize(rootNode)
+
+    def __init__(self, level:OptimizationLevel = OptimizationLevel.SIMPLIFY) -> None:
+        self.level = level
+        self.removedNodes = 0
+    
+    def DoOptimize(self, rootNode:NodeBase) -> NodeBase:
+        if self.level == OptimizationLevel.NONE:
+            return rootNode
+        
+        before = self.CountNodes(rootNode)
+        # Children are optimized first and handed to their parent from a stack of results
+        results:list[NodeBase] = []
+        for node in PostOrder(rootNode):
+            count = len(ChildNodes(node))
+            children = results[len(results) - count:]
+            del results[len(results) - count:]
+            results.append(self.Visit(node, children))
+        optimized = results[-1]
+        self.removedNodes += before - self.CountNodes(optimized)
+        return optimized
+    
+    def CountNodes(self, node:NodeBase) -> int:
+        return sum(1 for _ in PostOrder(node))
+    
+    def Visit(self, node:NodeBase, children:list[NodeBase]) -> NodeBase:
+        methodName = f'Optimize{type(node).__name__}'
+        method = getattr(self, methodName, None)
+        return method(node, *children) if method else node
+    
+    def OptimizeBinOpNode(self, node:BinOpNode, left:NodeBase, right:NodeBase) -> NodeBase:
+        opType = node.opToken.tokenType
+
+        if isinstance(left, NumberNode) and isinstance(right, NumberNode):
+            value = self.Fold(opType, left.numberToken.value, right.numberToken.value)
+            if value != None:
+                return self.MakeNumber(value, node)
+        
+        if self.level >= OptimizationLevel.SIMPLIFY:
+            if opType == TokenType.MULTIPLY and self.IsConstant(right, 1): return self.Respan(left, node)
+            if opType == TokenType.MULTIPLY and self.IsConstant(left, 1): return self.Respan(right, node)
+            if opType == TokenType.MINUS and self.IsConstant(right, 0): return self.Respan(left, node)
+            if opType == TokenType.POWER and self.IsConstant(right, 1): return self.Respan(left, node)
+        
+        if left is node.leftNode and right is node.rightNode:
+            return node
+        return self.Respan(BinOpNode(left, node.opToken, right), node)
+    
+    def OptimizeUnaryOpNode(self, node:UnaryOpNode, operand:NodeBase) -> NodeBase:
+        negate = node.opToken.tokenType == TokenType.MINUS
+
+        if isinstance(operand, NumberNode):
+            value = operand.numberToken.value
+            return self.MakeNumber(-value if negate else value, node)
+        
+        if self.level >= OptimizationLevel.SIMPLIFY:
+            if not negate:
+                return self.Respan(operand, node)
+            if isinstance(operand, UnaryOpNode) and operand.opToken.tokenType == TokenType.MINUS:
+                return self.Respan(operand.node, node)
+        
+        if operand is node.node:
+            return node
+        return self.Respan(UnaryOpNode(node.opToken, operand), node)
+    
+    def OptimizeVarAssignNode(self, node:VarAssignNode, value:NodeBase) -> NodeBase:
+        if value is node.valueNode:
+            return node
+        return self.Respan(VarAssignNode(node.varNameToken, value), node)
+    
+    def Fold(self, opType:TokenType, left:int|float, right:int|float) -> int|float:
+        # Returns None whenever evaluating at runtime could behave differently, so errors
+        # are still raised by the interpreter with the usual spans
+        try:
+            match opType:
+                case TokenType.PLUS: value = left + right
+                case TokenType.MINUS: value = left - right
+                case TokenType.MULTIPLY: value = left * right
+                case TokenType.DIVIDE:
+                    if right == 0: return None
+                    value = left / right
+                case TokenType.POWER:
+                    if isinstance(left, int) and isinstance(right, int) and right > 0 \
+                            and left.bit_length() * right > MAX_FOLDED_POWER_BITS:
+                        return None
+                    value = left ** right
+                case _:
+                    return None
+        except ArithmeticError:
+            return None
+        
+        return value if isinstance(value, (int, float)) else None
+    
+    def IsConstant(self, node:NodeBase, value:int) -> bool:
+        # Only integer constants, as x*1.0 or x-0.0 would turn an int into a float
+        return isinstance(node, NumberNode) and type(node.numberToken.value) is int and node.numberToken.value == value
+    
+    def MakeNumber(self, value:int|float, original:NodeBase) -> NumberNode:
+        tokenType = TokenType.INT if isinstance(value, int) else TokenType.FLOAT
+        return NumberNode(Token.FromPositions(tokenType, value, original.startPosition, original.endPosition))
+    
+    def Respan(self, node:NodeBase, original:NodeBase) -> NodeBase:
+        # A rebuilt node, or an operand left behind by an identity, takes the span of the node
+        # it stands in for, so runtime errors still point at the original source. Undefined
+        # variables are reported at their name token, which keeps its own span.
+        if node.startPosition is original.startPosition and node.endPosition is original.endPosition:
+            return node
+        node = copy.copy(node)
+        node.startPosition = original.startPosition
+        node.endPosition = original.endPosition
+        return node
+
+class OptimizerStats:
+    def __init__(self) -> None:
+        self.programs = 0
+        # Summed over every program run, whether it was optimized now or loaded from a cache
+        self.removedNodes = 0
+    
+    def Clear(self) -> None:
+        self.programs = 0
+        self.removedNodes = 0
+    
+    def Record(self, program:Program) -> None:
+        self.programs += 1
+        self.removedNodes += program.removedNodes
+    
+    def Stats(self) -> dict[str, int]:
+        return {'programs': self.programs, 'removedNodes': self.removedNodes}
+    
+    def Report(self, file:TextIO = None) -> None:
+        file = file or sys.stdout
+        print(f"optimizer removed {self.removedNodes} node(s) from {self.programs} program(s)", file=file)
+
+OPTIMIZER_STATS = OptimizerStats()
+
+################
+### RESOLVER ###
+################
+
+class Resolver:
+    @staticmethod
+    def Resolve(rootNode:NodeBase) -> bool:
+        return Resolver().DoResolve(rootNode)
+
+    def __init__(self) -> None:
+        self.slotMap:SlotMap = SYMBOL_SLOTS
+        # Names declared in each scope, innermost last; the first one is the global scope
+        self.scopes:list[set[str]] = [set()]
+        self.changed = False
+    
+    def DoResolve(self, rootNode:NodeBase) -> bool:
+        # Gives every variable node a (depth, slot) address; returns whether any address
+        # differs from the one the node already had
+        for node in PostOrder(rootNode):
+            self.Visit(node)
+        return self.changed
+    
+    def Visit(self, node:NodeBase) -> None:
+        # Children have already been visited
+        match node:
+            case VarAssignNode():
+                self.scopes[-1].add(node.varNameToken.value)
+                self.Address(node)
+            case VarAccessNode():
+                self.Address(node)
+    
+    def Address(self, node:VarAssignNode|VarAccessNode) -> None:
+        name = node.varNameToken.value
+        # Names not declared in any enclosing scope are looked up from the global scope
+        depth = len(self.scopes) - 1
+        for index, scope in enumerate(reversed(self.scopes)):
+            if name in scope:
+                depth = index
+                break
+        
+        slot = self.slotMap.Slot(name)
+        if node.depth != depth or node.slot != slot:
+            self.changed = True
+        node.depth = depth
+        node.slot = slot
+
+####################
+### HASH CONSING ###
+####################
+
+class HashConser:
+    @staticmethod
+    def Share(rootNode:NodeBase) -> NodeBase:
+        return HashConser().DoShare(rootNode)
+
+    def __init__(self) -> None:
+        # Structure -> the one node with that structure; children are keyed by identity, which
+        # is enough because they have already been shared
+        self.nodes:dict[tuple, NodeBase] = {}
+        # Parents of each node, counted once per distinct parent
+        self.parents:Counter = Counter()
+        # Copies replaced by a node seen earlier
+        self.sharedNodes = 0
+    
+    def DoShare(self, rootNode:NodeBase) -> NodeBase:
+        # Returns the tree as a DAG in which structurally identical subtrees are one node. A shared
+        # node keeps the span of its first copy, so an error in a later copy is reported there.
+        results:list[NodeBase] = []
+        for node in PostOrder(rootNode):
+            count = len(ChildNodes(node))
+            children = results[len(results) - count:]
+            del results[len(results) - count:]
+            results.append(self.Intern(node, children))
+        self.MarkShared()
+        return results[-1]
+    
+    def Key(self, node:NodeBase, children:list[NodeBase]) -> tuple:
+        match node:
+            case NumberNode():
+                value = node.numberToken.value
+                # 0.0 and -0.0 are equal but print differently
+                return (NumberNode, type(value), value.hex() if type(value) is float else value)
+            case VarAccessNode():
+                return (VarAccessNode, node.varNameToken.value)
+            case VarAssignNode():
+                return (VarAssignNode, node.varNameToken.value, id(children[0]))
+            case BinOpNode() | UnaryOpNode():
+                return (type(node), node.opToken.tokenType, *map(id, children))
+        return None
+    
+    def Intern(self, node:NodeBase, children:list[NodeBase]) -> NodeBase:
+        key = self.Key(node, children)
+        if key == None:
+            return node
+        shared = self.nodes.get(key)
+        if shared != None:
+            self.sharedNodes += 1
+            return shared
+        
+        if any(child is not original for child, original in zip(children, ChildNodes(node))):
+            node = copy.copy(node)
+            match node:
+                case BinOpNode(): node.leftNode, node.rightNode = children
+                case UnaryOpNode(): node.node, = children
+                case VarAssignNode(): node.valueNode, = children
+        # A child used twice by one node, as in E * E, counts as two parents
+        for child in children:
+            self.parents[child] += 1
+        self.nodes[key] = node
+        return node
+    
+    def MarkShared(self) -> None:
+        # Nodes were interned children first, so the names read below a shared node are known by
+        # the time its parents need them. Shared leaves are left alone; looking one up costs as
+        # much as evaluating it.
+        reads:dict[NodeBase, frozenset] = {}
+        for node in self.nodes.values():
+            if node.memoReads != None:
+                node.memoReads = None
+            if self.parents[node] < 2 or not ChildNodes(node):
+                continue
+            names = set()
+            pure = not isinstance(node, VarAssignNode)
+            stack = list(ChildNodes(node))
+            while stack and pure:
+                child = stack.pop()
+                if child in reads:
+                    if reads[child] == None: pure = False
+                    else: names |= reads[child]
+                    continue
+                if isinstance(child, VarAssignNode): pure = False
+                elif isinstance(child, VarAccessNode): names.add(child.varNameToken.value)
+                stack.extend(ChildNodes(child))
+            reads[node] = node.memoReads = frozenset(names) if pure else None
+
+######################
+### RUNTIME RESULT ###
+######################
+
+class RuntimeResult:
+    def __init__(self) -> None:
+        self.value:Object = None
+    
+    def Register(self, result:RuntimeResult) -> Object:
+        return result.value
+    
+    def Success(self, value:Object) -> RuntimeResult:
+        self.value = value
+        return self
+    
+    def Failure(self, error:ShorkError) -> None:
+        raise error
+
+##############
+### VALUES ###
+##############
+
+class Object:
+    # Values carry no position or context; errors take their span from the node being evaluated
+    __slots__ = ('value',)
+
+    # Counts every boxed value created, so allocations per evaluation can be compared
+    allocations = 0
+
+    def __init__(self, value:any) -> None:
+        self.value = value
+        Object.allocations += 1
+
+    def __repr__(self) -> str:
+        return f'{self.value}'
+    
+    def AddTo(self, other:Object) -> Object:
+        raise NotImplementedError(None, None, f"{type(self).__name__}.AddTo")
+    
+    def SubFrom(self, other:Object) -> Object:
+        raise NotImplementedError(None, None, f"{type(self).__name__}.SubFrom")
+    
+    def MultiplyBy(self, other:Object) -> Object:
+        raise NotImplementedError(None, None, f"{type(self).__name__}.MultiplyBy")
+    
+    def DivideBy(self, other:Object) -> Object:
+        raise NotImplementedError(None, None, f"{type(self).__name__}.DivideBy")
+    
+    def ToPowerOf(self, other:Object) -> Object:
+        raise NotImplementedError(None, None, f"{type(self).__name__}.ToPowerOf")
+    
+    def Negate(self) -> Object:
+        raise NotImplementedError(None, None, f"{type(self).__name__}.Negate")
+
+# Raw values the interpreters compute with directly, without boxing them.  Complex numbers
+# come from raising a negative number to a fractional power.
+NUMERIC_TYPES = (int, float, complex)
+
+class Number(Object):
+    __slots__ = ()
+
+    @staticmethod
+    def Of(value:int|float) -> Number:
+        # Small ints are interned, the way CPython interns them
+        if type(value) is int and -5 <= value <= 256:
+            return SMALL_NUMBERS[value + 5]
+        return Number(value)
+
+    def __init__(self, value: int|float) -> None:
+        super().__init__(value)
+    
+    # These are the boxed API; errors raised here have no span until an interpreter adds one
+    def AddTo(self, other: Object) -> Object:
+        match other:
+            case Number():
+                return Number.Of(self.value + other.value)
+            case _:
+                raise RuntimeError(None, None, f"Cannot use the '+' operator on objects of type 'Number' and '{type(other).__name__}'", None)
+    
+    def SubFrom(self, other: Object) -> Object:
+        match other:
+            case Number():
+                return Number.Of(self.value - other.value)
+            case _:
+                raise RuntimeError(None, None, f"Cannot use the '-' operator on objects of type 'Number' and '{type(other).__name__}'", None)
+    
+    def MultiplyBy(self, other: Object) -> Object:
+        match other:
+            case Number():
+                return Number.Of(self.value * other.value)
+            case _:
+                raise RuntimeError(None, None, f"Cannot use the '*' operator on objects of type 'Number' and '{type(other).__name__}'", None)
+    
+    def DivideBy(self, other: Object) -> Object:
+        match other:
+            case Number():
+                if other.value == 0:
+                    raise RuntimeError(None, None, "Cannot divide by zero", None)
+                return Number.Of(self.value / other.value)
+            case _:
+                raise RuntimeError(None, None, f"Cannot use the '/' operator on objects of type 'Number' and '{type(other).__name__}'", None)
+    
+    def ToPowerOf(self, other: Object) -> Object:
+        match other:
+            case Number():
+                try:
+                    return Number.Of(self.value ** other.value)
+                except (ZeroDivisionError, OverflowError) as error:
+                    raise ArithmeticFailure(error, None, None, None) from None
+            case _:
+                raise RuntimeError(None, None, f"Cannot use the '^' operator on objects of type 'Number' and '{type(other).__name__}'", None)
+    
+    def Negate(self) -> Object:
+        return Number.Of(-self.value)
+
+SMALL_NUMBERS = [Number(value) for value in range(-5, 257)]
+
+def Box(value) -> Object:
+    return value if isinstance(value, Object) else Number.Of(value)
+
+def Unbox(value):
+    return value.value if isinstance(value, Number) else value
+
+def CountAllocations(function:Callable, *args, **kwargs) -> tuple[any, int]:
+    # Returns the function's result and how many boxed values it created
+    before = Object.allocations
+    result = function(*args, **kwargs)
+    return result, Object.allocations - before
+
+###############
+### CONTEXT ###
+###############
+
+class Context:
+    def __init__(self, displayName, symbolTable:SymbolTable=None, parent=None, parentEntryPosition=None):
+        self.displayName = displayName
+        self.parent = parent
+        self.parentEntryPosition = parentEntryPosition
+        self.symbolTable:SymbolTable = symbolTable
+
+####################
+### SYMBOL TABLE ###
+####################
+
+# Marks a slot that has no value in a table
+UNDEFINED = object()
+
+class SlotMap:
+    def __init__(self) -> None:
+        self.slots:dict[str, int] = {}
+        self.names:list[str] = []
+        # Only taken to hand out a new slot; threads resolving known names never wait on it
+        self.lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self.names)
+    
+    def Slot(self, name:str) -> int:
+        slot = self.slots.get(name)
+        if slot == None:
+            with self.lock:
+                slot = self.slots.get(name)
+                if slot == None:
+                    # The name goes in first, so a slot is never visible before its name
+                    self.names.append(name)
+                    slot = self.slots[name] = len(self.names) - 1
+        return slot
+    
+    def Find(self, name:str) -> int:
+        return self.slots.get(name)
+
+# Every table shares one name-to-slot layout, so code resolved once runs against any table
+SYMBOL_SLOTS = SlotMap()
+
+# Tables hold raw values; boxed Objects only appear at API boundaries. Each holds only the slots
+# set in it, so a table costs what it holds however many names the process has seen.
+class SymbolTable:
+    def __init__(self, parent:SymbolTable = None) -> None:
+        self.slotMap:SlotMap = SYMBOL_SLOTS
+        self.values:dict[int, any] = {}
+        self.parent:SymbolTable = parent
+    
+    @property
+    def symbols(self) -> dict:
+        names, values = self.slotMap.names, self.values
+        return {names[slot]: values[slot] for slot in sorted(values)}
+    
+    def Reserve(self) -> dict:
+        # The values, for code that reads and writes slots directly; an unset slot is missing
+        return self.values
+    
+    def Get(self, name):
+        slot = self.slotMap.Find(name)
+        if slot == None:
+            return None
+        return self.GetSlot(0, slot)
+    
+    def GetSlot(self, depth:int, slot:int):
+        table = self
+        for _ in range(depth):
+            table = table.parent
+        
+        while table != None:
+            value = table.values.get(slot, UNDEFINED)
+            if value is not UNDEFINED:
+                return value
+            table = table.parent
+        return None
+    
+    def Set(self, name, value):
+        self.SetSlot(self.slotMap.Slot(name), value)
+    
+    def SetSlot(self, slot:int, value):
+        self.values[slot] = value
+
+    def Remove(self, name):
+        slot = self.slotMap.Find(name)
+        if slot == None or slot not in self.values:
+            raise KeyError(name)
+        del self.values[slot]
+
+class CommitConflictError(Exception):
+    def __init__(self, names:list[str]) -> None:
+        super().__init__(f"Changed since the overlay's snapshot: {', '.join(names)}")
+        self.names = names
+
+# A table that never changes once made, so any number of threads can read it without locking
+class SymbolSnapshot(SymbolTable):
+    def __init__(self, values:dict[int, any] = None, versions:dict[int, int] = None, version:int = 0) -> None:
+        self.slotMap:SlotMap = SYMBOL_SLOTS
+        # Never changed once the snapshot is made
+        self.values:dict[int, any] = values if values != None else {}
+        # The commit that last wrote each slot, and the commit that made this snapshot
+        self.versions:dict[int, int] = versions if versions != None else {}
+        self.version = version
+        self.parent:SymbolTable = None
+    
+    def Reserve(self) -> list:
+        raise TypeError("Symbol snapshots are read-only; run against an overlay of them instead")
+    
+    def SetSlot(self, slot:int, value):
+        raise TypeError("Symbol snapshots are read-only; run against an overlay of them instead")
+    
+    def Remove(self, name):
+        raise TypeError("Symbol snapshots are read-only; run against an overlay of them instead")
+
+# A table shared between threads. Readers see whichever snapshot was current when they looked;
+# writers copy it, change the copy and publish it as the next snapshot.
+class SharedSymbolTable(SymbolTable):
+    def __init__(self) -> None:
+        self.slotMap:SlotMap = SYMBOL_SLOTS
+        self.parent:SymbolTable = None
+        self.snapshot = SymbolSnapshot()
+        # Serializes writers only
+        self.lock = threading.Lock()
+    
+    @property
+    def values(self) -> dict:
+        return self.snapshot.values
+    
+    def Snapshot(self) -> SymbolSnapshot:
+        return self.snapshot
+    
+    def Overlay(self) -> SymbolTable:
+        # A private table for one evaluation. It reads through to the snapshot current now, not
+        # to later commits, and none of its writes are shared until it is committed.
+        return SymbolTable(self.snapshot)
+    
+    def Commit(self, overlay:SymbolTable, merge:bool = True) -> SymbolSnapshot:
+        # Publishes every value the overlay holds. Anything committed since the overlay was made
+        # is kept unless the overlay wrote the same name, in which case the overlay wins. Without
+        # merge, such a name raises CommitConflictError and nothing is published.
+        written = list(overlay.values.items())
+        base = overlay.parent
+        with self.lock:
+            current = self.snapshot
+            if not merge and isinstance(base, SymbolSnapshot) and base is not current:
+                versions = current.versions
+                conflicts = [self.slotMap.names[slot] for slot, _ in written if versions.get(slot, 0) > base.version]
+                if conflicts:
+                    raise CommitConflictError(conflicts)
+            return self.Publish(written)
+    
+    def SetSlot(self, slot:int, value):
+        with self.lock:
+            self.Publish([(slot, value)])
+    
+    def Remove(self, name):
+        slot = self.slotMap.Find(name)
+        with self.lock:
+            if slot == None or slot not in self.snapshot.values:
+                raise KeyError(name)
+            self.Publish([(slot, UNDEFINED)])
+    
+    def Reserve(self) -> list:
+        raise TypeError("Shared symbol tables cannot be written in place; run against an Overlay() and Commit() it")
+    
+    def Publish(self, writes:list[tuple[int, any]]) -> SymbolSnapshot:
+        # Called with the lock held; writing UNDEFINED removes the name
+        current = self.snapshot
+        if not writes:
+            return current
+        version = current.version + 1
+        values, versions = dict(current.values), dict(current.versions)
+        for slot, value in writes:
+            if value is UNDEFINED:
+                values.pop(slot, None)
+            else:
+                values[slot] = value
+            versions[slot] = version
+        # Swapping the attribute is the only step readers can observe
+        self.snapshot = SymbolSnapshot(values, versions, version)
+        return self.snapshot
+
+###############
+### BUDGETS ###
+###############
+
+# Steps between two looks at the clock
+BUDGET_CHECK_INTERVAL = 256
+
+class ExecutionLimits:
+    def __init__(self, maxSteps:int = None, timeout:float = None, maxIntegerBits:int = None) -> None:
+        # Nodes a tree walker may evaluate, or instructions the VM may execute, in one run
+        self.maxSteps = maxSteps
+        # Seconds one run may take
+        self.timeout = timeout
+        # Widest integer an arithmetic operation may produce
+        self.maxIntegerBits = maxIntegerBits
+
+class ExecutionBudget:
+    # What one run has used of its limits; every run gets a budget of its own
+    def __init__(self, limits:ExecutionLimits) -> None:
+        self.limits = limits
+        self.maxSteps = limits.maxSteps if limits.maxSteps != None else sys.maxsize
+        self.maxIntegerBits = limits.maxIntegerBits
+        self.deadline = time.monotonic() + limits.timeout if limits.timeout != None else None
+        self.steps = 0
+
+    def Step(self, node:NodeBase, context:Context) -> None:
+        # Charged by the tree walkers for every node they evaluate
+        self.steps += 1
+        if self.steps > self.maxSteps:
+            raise LimitExceededError(node.startPosition, node.endPosition, f"Evaluation took more than {self.maxSteps} steps", context)
+        if self.deadline != None and self.steps % BUDGET_CHECK_INTERVAL == 0:
+            self.CheckTime(node.startPosition, node.endPosition, context)
+
+    def Segment(self, code:CodeObject, pc:int, end:int, context:Context) -> int:
+        # Charged by the VM for a run of instructions at a time, so its loop only stops to consult
+        # the budget every so often; returns where the run ends
+        startPosition, endPosition = code.spans[pc // 2]
+        if self.steps >= self.maxSteps:
+            raise LimitExceededError(startPosition, endPosition, f"Evaluation took more than {self.maxSteps} steps", context)
+        if self.deadline != None:
+            self.CheckTime(startPosition, endPosition, context)
+        count = min((end - pc) // 2, self.maxSteps - self.steps, BUDGET_CHECK_INTERVAL if self.deadline != None else sys.maxsize)
+        self.steps += count
+        return pc + 2 * count
+
+    def CheckTime(self, startPosition:Position, endPosition:Position, context:Context) -> None:
+        if time.monotonic() > self.deadline:
+            raise LimitExceededError(startPosition, endPosition, f"Evaluation took longer than {self.limits.timeout} seconds", context)
+
+    def Operate(self, opType:TokenType, left, right, startPosition:Position, endPosition:Position, context:Context):
+        # Computes '+', '-', '*' or '^' on raw numbers, refusing integer results wider than the
+        # limit. Powers and products are refused from the operands' widths before any work is done.
+        maxBits = self.maxIntegerBits
+        integers = maxBits != None and type(left) is int and type(right) is int
+        match opType:
+            case TokenType.PLUS:
+                value = left + right
+            case TokenType.MINUS:
+                value = left - right
+            case TokenType.MULTIPLY:
+                if integers and left.bit_length() + right.bit_length() - 1 > maxBits:
+                    raise self.TooWide(startPosition, endPosition, context)
+                value = left * right
+            case TokenType.POWER:
+                if self.deadline != None:
+                    self.CheckTime(startPosition, endPosition, context)
+                # A base of n bits raised to e has at least (n - 1) * e + 1 bits
+                if integers and right > 1 and abs(left) > 1 and (left.bit_length() - 1) * right + 1 > maxBits:
+                    raise self.TooWide(startPosition, endPosition, context)
+                value = left ** right
+        if integers and type(value) is int and value.bit_length() > maxBits:
+            raise self.TooWide(startPosition, endPosition, context)
+        return value
+
+    def TooWide(self, startPosition:Position, endPosition:Position, context:Context) -> LimitExceededError:
+        return LimitExceededError(startPosition, endPosition, f"Result is wider than {self.maxIntegerBits} bits", context)
+
+###################
+### INTERPRETER ###
+###################
+
+class Interpreter:
+    @staticmethod
+    def Interpret(rootNode:NodeBase, context:Context, hooks:list[InterpreterHook] = None, budget:ExecutionBudget = None) -> Object:
+        # Evaluation works on raw numbers; only the final result is boxed
+        return Box(Interpreter(hooks, budget).Visit(rootNode, context).value)
+
+    def __init__(self, hooks:list[InterpreterHook] = None, budget:ExecutionBudget = None) -> None:
+        self.hooks:list[InterpreterHook] = list(hooks or [])
+        self.budget:ExecutionBudget = budget
+        # Only an instrumented interpreter pays for the hooks; the plain Visit is left untouched
+        if self.hooks:
+            self.Visit = self.HookedVisit
+        # The same goes for a budget, which is charged before any hook sees the node
+        if budget != None:
+            self.UnbudgetedVisit = self.Visit
+            self.Visit = self.BudgetedVisit
+
+    def BudgetedVisit(self, node:NodeBase, context:Context):
+        self.budget.Step(node, context)
+        return self.UnbudgetedVisit(node, context)
+
+    def HookedVisit(self, node:NodeBase, context:Context):
+        for hook in self.hooks:
+            hook.Enter(node, context)
+        try:
+            result = Interpreter.Visit(self, node, context)
+        except BaseException as error:
+            for hook in reversed(self.hooks):
+                hook.Exit(node, context, None, error)
+            raise
+        for hook in reversed(self.hooks):
+            hook.Exit(node, context, result.value, None)
+        return result
+
+    def Visit(self, node:NodeBase, context:Context):
+        if not isinstance(node, NodeBase):
+            raise TypeError(f"Expected 'NodeBase', recieved '{type(node).__name__}'")
+
+        methodName = f'Visit{type(node).__name__}'
+        method = getattr(self, methodName, self.NoVisit)
+        return method(node, context)
+    
+    def NoVisit(self, node:NodeBase, context:Context):
+        raise NotImplementedError(node.startPosition, node.endPosition,
+                                  f'Interpreter.Visit{type(node).__name__}')
+    
+    def VisitNumberNode(self, node:NumberNode, context:Context):
+        return RuntimeResult().Success(node.numberToken.value)
+
+    def VisitBinOpNode(self, node:BinOpNode, context:Context):
+        result = RuntimeResult()
+        left = result.Register(self.Visit(node.leftNode, context))
+        right = result.Register(self.Visit(node.rightNode, context))
+
+        if type(left) in NUMERIC_TYPES and type(right) in NUMERIC_TYPES:
+            try:
+                if self.budget != None and node.opToken.tokenType != TokenType.DIVIDE:
+                    return result.Success(self.budget.Operate(node.opToken.tokenType, left, right, *OperatorSpan(node), context))
+                match node.opToken.tokenType:
+                    case TokenType.PLUS:
+                        return result.Success(left + right)
+                    case TokenType.MINUS:
+                        return result.Success(left - right)
+                    case TokenType.MULTIPLY:
+                        return result.Success(left * right)
+                    case TokenType.DIVIDE:
+                        if right == 0:
+                            result.Failure(RuntimeError(node.rightNode.startPosition, node.rightNode.endPosition, "Cannot divide by zero", context))
+                        return result.Success(left / right)
+                    case TokenType.POWER:
+                        return result.Success(left ** right)
+            except (ZeroDivisionError, OverflowError) as error:
+                raise ArithmeticFailure(error, *OperatorSpan(node), context) from None
+        
+        # Anything that is not a plain number goes through the boxed Object methods
+        try:
+            match node.opToken.tokenType:
+                case TokenType.PLUS:
+                    return result.Success(Unbox(Box(left).AddTo(Box(right))))
+                case TokenType.MINUS:
+                    return result.Success(Unbox(Box(left).SubFrom(Box(right))))
+                case TokenType.MULTIPLY:
+                    return result.Success(Unbox(Box(left).MultiplyBy(Box(right))))
+                case TokenType.DIVIDE:
+                    return result.Success(Unbox(Box(left).DivideBy(Box(right))))
+                case TokenType.POWER:
+                    return result.Success(Unbox(Box(left).ToPowerOf(Box(right))))
+        except RuntimeError as error:
+            if error.startPosition == None:
+                error.startPosition, error.endPosition, error.context = node.startPosition, node.endPosition, context
+            raise
+    
+    def VisitUnaryOpNode(self, node:UnaryOpNode, context:Context):
+        result = RuntimeResult()
+        value = result.Register(self.Visit(node.node, context))
+
+        if type(value) in NUMERIC_TYPES:
+            if node.opToken.tokenType == TokenType.MINUS:
+                return result.Success(-value)
+            return result.Success(value)
+        
+        raise RuntimeError(node.startPosition, node.endPosition,
+                           f"Unary operation '{node.opToken.tokenType}' not defined for objects of type {type(value).__name__}", context)
+    
+    def VisitVarAssignNode(self, node:VarAssignNode, context:Context):
+        result = RuntimeResult()
+        varName = node.varNameToken.value
+        value = result.Register(self.Visit(node.valueNode, context))
+        if node.slot != None and node.depth == 0:
+            context.symbolTable.SetSlot(node.slot, value)
+        else:
+            context.symbolTable.Set(varName, value)
+        return result.Success(value)
+    
+    def VisitVarAccessNode(self, node:VarAccessNode, context:Context):
+        result = RuntimeResult()
+        varName = node.varNameToken.value
+        if node.slot != None:
+            value = context.symbolTable.GetSlot(node.depth, node.slot)
+        else:
+            value = context.symbolTable.Get(varName)
+
+        if value == None:
+            result.Failure(RuntimeError(node.varNameToken.startPosition, node.varNameToken.endPosition, f"'{varName}' is not defined", context))
+        
+        return result.Success(value)
+
+class IterativeInterpreter(Interpreter):
+    @staticmethod
+    def Interpret(rootNode:NodeBase, context:Context, budget:ExecutionBudget = None) -> Object:
+        return Box(IterativeInterpreter(budget).Evaluate(rootNode, context).value)
+
+    def __init__(self, budget:ExecutionBudget = None) -> None:
+        # Visit answers from the stack of results, so the budget is charged by Evaluate instead
+        super().__init__()
+        self.budget = budget
+
+    def Evaluate(self, rootNode:NodeBase, context:Context) -> RuntimeResult:
+        # Nodes are visited children first with an explicit stack of results. The Interpreter's
+        # Visit methods are reused as they are; their calls to Visit for a child are answered
+        # from that stack instead of recursing, so both evaluators share one set of semantics.
+        results:list[RuntimeResult] = []
+        budget = self.budget
+        for node in PostOrder(rootNode):
+            if not isinstance(node, NodeBase):
+                raise TypeError(f"Expected 'NodeBase', recieved '{type(node).__name__}'")
+            if budget != None:
+                budget.Step(node, context)
+            count = len(ChildNodes(node))
+            if count:
+                self.childResults = iter(results[-count:])
+                del results[-count:]
+            method = getattr(self, f'Visit{type(node).__name__}', self.NoVisit)
+            results.append(method(node, context))
+        return results[-1]
+
+    def Visit(self, node:NodeBase, context:Context):
+        # Only ever asked for a child that has already been evaluated
+        return next(self.childResults)
+
+class MemoInterpreter(IterativeInterpreter):
+    @staticmethod
+    def Interpret(rootNode:NodeBase, context:Context, budget:ExecutionBudget = None, tree:NodeBase = None) -> Object:
+        # A runtime error in a shared node carries the span of its first copy. Given the tree the
+        # DAG was made from, a failed run is repeated on that tree from the symbols it started
+        # with, so the error is reported where the other backends report it. The repeat keeps the
+        # run's deadline and integer width, as the tree can repeat a wide power the DAG computed
+        # once, but not its step limit, as its steps were charged to the run that failed.
+        symbolTable = context.symbolTable
+        saved = dict(symbolTable.values) if tree != None else None
+        try:
+            return Box(MemoInterpreter(budget).Evaluate(rootNode, context).value)
+        except RuntimeError:
+            if tree == None: raise
+        values = symbolTable.values
+        for slot in list(values):
+            if slot not in saved:
+                symbolTable.Remove(SYMBOL_SLOTS.names[slot])
+            elif values[slot] is not saved[slot]:
+                symbolTable.SetSlot(slot, saved[slot])
+        if budget != None:
+            budget = copy.copy(budget)
+            budget.maxSteps = sys.maxsize
+        return IterativeInterpreter.Interpret(tree, context, budget)
+
+    def __init__(self, budget:ExecutionBudget = None) -> None:
+        super().__init__(budget)
+        # Results of the nodes the HashConser marked, kept for one evaluation, and the marked
+        # nodes holding a result for each name they read
+        self.memo:dict[NodeBase, RuntimeResult] = {}
+        self.readers:dict[str, list[NodeBase]] = {}
+        self.hits = 0
+
+    def Evaluate(self, rootNode:NodeBase, context:Context) -> RuntimeResult:
+        # Walks a DAG from the HashConser as IterativeInterpreter walks a tree, except that a marked
+        # node holding a result is answered from the memo instead of being visited again. Assigning
+        # a name drops the result of every marked node reading it.
+        results:list[RuntimeResult] = []
+        budget = self.budget
+        memo, readers = self.memo, self.readers
+        stack = [(rootNode, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if not expanded:
+                if not isinstance(node, NodeBase):
+                    raise TypeError(f"Expected 'NodeBase', recieved '{type(node).__name__}'")
+                if node.memoReads != None and node in memo:
+                    self.hits += 1
+                    results.append(memo[node])
+                    continue
+                stack.append((node, True))
+                for child in reversed(ChildNodes(node)):
+                    stack.append((child, False))
+                continue
+            
+            if budget != None:
+                budget.Step(node, context)
+            count = len(ChildNodes(node))
+            if count:
+                self.childResults = iter(results[-count:])
+                del results[-count:]
+            method = getattr(self, f'Visit{type(node).__name__}', self.NoVisit)
+            result = method(node, context)
+            results.append(result)
+            if node.memoReads != None:
+                memo[node] = result
+                for name in node.memoReads:
+                    readers.setdefault(name, []).append(node)
+            elif isinstance(node, VarAssignNode):
+                for reader in readers.pop(node.varNameToken.value, ()):
+                    memo.pop(reader, None)
+        return results[-1]
+
+############################
+### ADAPTIVE INTERPRETER ###
+############################
+
+# Generic executions before a BinOpNode tries to specialize, misses before a specialization is
+# given up, and executions a node then waits before trying again
+ADAPTIVE_WARMUP = 8
+ADAPTIVE_MISS_LIMIT = 8
+ADAPTIVE_BACKOFF = 64
+
+class Specialization:
+    # A form of BinOpNode that skips the dispatch on operator and operand types for as long as its
+    # guard holds: both operands are exactly operandType. An operand that is a resolved variable
+    # or a constant can also be read in place (shape 'VAR' or 'CONST') instead of being visited.
+    __slots__ = ('name', 'operation', 'operandType', 'leftShape', 'rightShape')
+
+    def __init__(self, name:str, operation:Callable, operandType:type, leftShape:str = None, rightShape:str = None) -> None:
+        self.name = name
+        self.operation = operation
+        self.operandType = operandType
+        self.leftShape = leftShape
+        self.rightShape = rightShape
+
+    def __repr__(self) -> str:
+        return self.name
+
+# Like CPython's specializing interpreter, only the operations whose result type follows from the
+# operand types; division and powers can fail or change type, so they stay generic
+SPECIALIZED_OPERATIONS = {
+    TokenType.PLUS: ('ADD', operator.add),
+    TokenType.MINUS: ('SUBTRACT', operator.sub),
+    TokenType.MULTIPLY: ('MULTIPLY', operator.mul)
+}
+SPECIALIZED_TYPES = {int: 'INT', float: 'FLOAT'}
+
+def MakeSpecializations() -> dict[tuple, Specialization]:
+    # (operator, operand type, left shape, right shape) -> Specialization; operands are either
+    # both read in place or both visited
+    specializations = {}
+    for opType, (opName, operation) in SPECIALIZED_OPERATIONS.items():
+        for operandType, typeName in SPECIALIZED_TYPES.items():
+            for leftShape, rightShape in ((None, None), ('VAR', 'VAR'), ('VAR', 'CONST'), ('CONST', 'VAR'), ('CONST', 'CONST')):
+                name = f'{opName}_{typeName}' + (f'_{leftShape}_{rightShape}' if leftShape else '')
+                specializations[(opType, operandType, leftShape, rightShape)] = Specialization(name, operation, operandType, leftShape, rightShape)
+    return specializations
+
+SPECIALIZATIONS = MakeSpecializations()
+
+def LeafShape(node:NodeBase) -> str:
+    if isinstance(node, VarAccessNode) and node.slot != None and node.depth == 0:
+        return 'VAR'
+    if isinstance(node, NumberNode):
+        return 'CONST'
+    return None
+
+def SpecializationCoverage(rootNode:NodeBase) -> dict[str, int]:
+    # How many BinOpNodes of a tree currently run each specialized form, GENERIC counting the rest
+    coverage = Counter()
+    for node in PostOrder(rootNode):
+        if isinstance(node, BinOpNode):
+            coverage[node.specialization.name if node.specialization != None else 'GENERIC'] += 1
+    return dict(coverage)
+
+class SpecializationStats:
+    def __init__(self) -> None:
+        # Keyed by specialization name
+        self.specialized:Counter[str] = Counter()
+        self.hits:Counter[str] = Counter()
+        self.misses:Counter[str] = Counter()
+        self.deopts:Counter[str] = Counter()
+        # Attempts that found nothing to specialize, keyed by the reason
+        self.failures:Counter[str] = Counter()
+
+    def Clear(self) -> None:
+        for counter in (self.specialized, self.hits, self.misses, self.deopts, self.failures):
+            counter.clear()
+
+    def Stats(self) -> dict[str, int]:
+        return {
+            'specialized': self.specialized.total(),
+            'hits': self.hits.total(),
+            'misses': self.misses.total(),
+            'deopts': self.deopts.total(),
+            'failures': self.failures.total()
+        }
+
+    def Report(self, file:TextIO = None) -> None:
+        file = file or sys.stdout
+        print(f"{'specialization':<28}{'nodes':>8}{'hits':>10}{'misses':>10}{'deopts':>8}", file=file)
+        names = set(self.specialized) | set(self.hits) | set(self.misses)
+        for name in sorted(names, key=lambda name: self.hits[name], reverse=True):
+            print(f"{name:<28}{self.specialized[name]:>8}{self.hits[name]:>10}{self.misses[name]:>10}{self.deopts[name]:>8}", file=file)
+        for reason, count in self.failures.most_common():
+            print(f"not specialized: {reason} x{count}", file=file)
+
+SPECIALIZATION_STATS = SpecializationStats()
+
+class AdaptiveInterpreter(IterativeInterpreter):
+    @staticmethod
+    def Interpret(rootNode:NodeBase, context:Context, stats:SpecializationStats = None, budget:ExecutionBudget = None) -> Object:
+        return Box(AdaptiveInterpreter(stats, budget=budget).Evaluate(rootNode, context).value)
+
+    def __init__(self, stats:SpecializationStats = None, warmup:int = ADAPTIVE_WARMUP,
+                 missLimit:int = ADAPTIVE_MISS_LIMIT, backoff:int = ADAPTIVE_BACKOFF, budget:ExecutionBudget = None) -> None:
+        super().__init__(budget)
+        self.stats = stats if stats != None else SPECIALIZATION_STATS
+        self.warmup = warmup
+        self.missLimit = missLimit
+        self.backoff = backoff
+
+    def Evaluate(self, rootNode:NodeBase, context:Context) -> RuntimeResult:
+        # Walks the tree like IterativeInterpreter, except that a node specialized to read its
+        # operands in place is answered before its children are pushed. The specializations live
+        # on the nodes, so a tree kept by the program cache stays warm from one run to the next.
+        # Threads sharing a tree may race on the counters, which only delays a specialization.
+        results:list[RuntimeResult] = []
+        stack = [(rootNode, False)]
+        hits = self.stats.hits
+        budget = self.budget
+        while stack:
+            node, expanded = stack.pop()
+            # Nodes are charged children first, as in IterativeInterpreter; operands read in
+            # place are never reached, so they cost nothing
+            if budget != None and expanded:
+                budget.Step(node, context)
+            if type(node) is BinOpNode:
+                specialization = node.specialization
+                if specialization != None:
+                    if specialization.leftShape != None:
+                        if not expanded:
+                            value = self.RunInPlace(node, specialization, context)
+                            if value is not UNDEFINED:
+                                if budget != None:
+                                    budget.Step(node, context)
+                                results.append(RuntimeResult().Success(value))
+                                continue
+                    elif expanded:
+                        # The guard is checked here rather than in VisitBinOpNode, and the left
+                        # operand's result is reused for the value
+                        leftResult = results[-2]
+                        left, right = leftResult.value, results[-1].value
+                        operandType = specialization.operandType
+                        if type(left) is operandType and type(right) is operandType:
+                            hits[specialization.name] += 1
+                            if budget != None:
+                                leftResult.value = budget.Operate(node.opToken.tokenType, left, right, node.startPosition, node.endPosition, context)
+                            else:
+                                leftResult.value = specialization.operation(left, right)
+                            del results[-1]
+                            continue
+            elif not isinstance(node, NodeBase):
+                raise TypeError(f"Expected 'NodeBase', recieved '{type(node).__name__}'")
+
+            if not expanded:
+                stack.append((node, True))
+                for child in reversed(ChildNodes(node)):
+                    stack.append((child, False))
+                continue
+
+            count = len(ChildNodes(node))
+            if count:
+                self.childResults = iter(results[-count:])
+                del results[-count:]
+            method = getattr(self, f'Visit{type(node).__name__}', self.NoVisit)
+            results.append(method(node, context))
+        return results[-1]
+
+    def RunInPlace(self, node:BinOpNode, specialization:Specialization, context:Context):
+        # Returns UNDEFINED when the guard fails; the node is then evaluated the generic way,
+        # which also reports an undefined variable with its span
+        operandType = specialization.operandType
+        symbolTable = context.symbolTable
+        values = symbolTable.values
+        # A name not set in this table may still be inherited, as from an overlay's snapshot
+        if specialization.leftShape == 'VAR':
+            slot = node.leftNode.slot
+            left = values.get(slot, UNDEFINED)
+            if left is UNDEFINED:
+                left = symbolTable.GetSlot(0, slot)
+        else:
+            left = node.leftNode.numberToken.value
+        if specialization.rightShape == 'VAR':
+            slot = node.rightNode.slot
+            right = values.get(slot, UNDEFINED)
+            if right is UNDEFINED:
+                right = symbolTable.GetSlot(0, slot)
+        else:
+            right = node.rightNode.numberToken.value
+
+        if type(left) is operandType and type(right) is operandType:
+            self.stats.hits[specialization.name] += 1
+            if self.budget != None:
+                return self.budget.Operate(node.opToken.tokenType, left, right, node.startPosition, node.endPosition, context)
+            return specialization.operation(left, right)
+        self.Miss(node, specialization)
+        return UNDEFINED
+
+    def VisitBinOpNode(self, node:BinOpNode, context:Context):
+        leftResult, rightResult = next(self.childResults), next(self.childResults)
+        left, right = leftResult.value, rightResult.value
+
+        specialization = node.specialization
+        if specialization == None:
+            node.counter += 1
+            if node.counter >= self.warmup:
+                self.Specialize(node, left, right)
+        elif specialization.leftShape == None:
+            # Evaluate only gets here when the guard failed
+            self.Miss(node, specialization)
+        # An in-place specialization that gets here has already missed
+
+        self.childResults = iter((leftResult, rightResult))
+        return Interpreter.VisitBinOpNode(self, node, context)
+
+    def Specialize(self, node:BinOpNode, left, right) -> None:
+        # Picks the form matching the operands just seen
+        opType = node.opToken.tokenType
+        if opType not in SPECIALIZED_OPERATIONS:
+            reason = 'OPERATOR'
+        elif type(left) not in SPECIALIZED_TYPES:
+            reason = 'OPERAND_TYPE'
+        elif type(right) is not type(left):
+            reason = 'MIXED_TYPES'
+        else:
+            leftShape, rightShape = LeafShape(node.leftNode), LeafShape(node.rightNode)
+            if leftShape == None or rightShape == None:
+                leftShape = rightShape = None
+            specialization = SPECIALIZATIONS[(opType, type(left), leftShape, rightShape)]
+            node.specialization = specialization
+            node.counter = 0
+            self.stats.specialized[specialization.name] += 1
+            return
+        self.stats.failures[reason] += 1
+        node.counter = -self.backoff
+
+    def Miss(self, node:BinOpNode, specialization:Specialization) -> None:
+        self.stats.misses[specialization.name] += 1
+        node.counter += 1
+        if node.counter >= self.missLimit:
+            self.stats.deopts[specialization.name] += 1
+            node.specialization = None
+            node.counter = -self.backoff
+
+#################
+### PROFILING ###
+#################
+
+class InterpreterHook:
+    # Called around every node the Interpreter visits; error is set when the node raised
+    def Enter(self, node:NodeBase, context:Context) -> None:
+        pass
+
+    def Exit(self, node:NodeBase, context:Context, value:any, error:BaseException) -> None:
+        pass
+
+class ProfileEntry:
+    __slots__ = ('calls', 'totalTime', 'selfTime', 'allocations', 'startPosition', 'endPosition')
+
+    def __init__(self, startPosition:Position = None, endPosition:Position = None) -> None:
+        self.calls = 0
+        # Nanoseconds; totalTime includes the children, selfTime does not
+        self.totalTime = 0
+        self.selfTime = 0
+        # Boxed values created while the node was being evaluated
+        self.allocations = 0
+        self.startPosition = startPosition
+        self.endPosition = endPosition
+
+    def __repr__(self) -> str:
+        return f'<{self.calls} calls, {self.totalTime / 1e6:.3f}ms total, {self.selfTime / 1e6:.3f}ms self, {self.allocations} allocations>'
+
+class Profiler(InterpreterHook):
+    def __init__(self) -> None:
+        self.byType:dict[str, ProfileEntry] = {}
+        self.bySpan:dict[tuple, ProfileEntry] = {}
+        # One [start, childTime, allocations] frame per node being evaluated
+        self.frames:list[list] = []
+        # Nested nodes of one type only count once towards that type's total time
+        self.activeTypes:dict[str, int] = {}
+
+    def Enter(self, node:NodeBase, context:Context) -> None:
+        typeName = type(node).__name__
+        self.activeTypes[typeName] = self.activeTypes.get(typeName, 0) + 1
+        self.frames.append([time.perf_counter_ns(), 0, Object.allocations])
+
+    def Exit(self, node:NodeBase, context:Context, value:any, error:BaseException) -> None:
+        start, childTime, allocations = self.frames.pop()
+        elapsed = time.perf_counter_ns() - start
+        allocations = Object.allocations - allocations
+        if self.frames:
+            self.frames[-1][1] += elapsed
+
+        typeName = type(node).__name__
+        self.activeTypes[typeName] -= 1
+        entry = self.byType.get(typeName)
+        if entry == None:
+            entry = self.byType[typeName] = ProfileEntry()
+        entry.calls += 1
+        if self.activeTypes[typeName] == 0:
+            entry.totalTime += elapsed
+        entry.selfTime += elapsed - childTime
+        entry.allocations += allocations
+
+        key = self.SpanKey(node)
+        entry = self.bySpan.get(key)
+        if entry == None:
+            entry = self.bySpan[key] = ProfileEntry(node.startPosition, node.endPosition)
+        entry.calls += 1
+        entry.totalTime += elapsed
+        entry.selfTime += elapsed - childTime
+        entry.allocations += allocations
+
+    def SpanKey(self, node:NodeBase) -> tuple:
+        if node.startPosition == None:
+            return (None, id(node), type(node).__name__)
+        return (node.startPosition.filename, node.startPosition.index, node.endPosition.index, type(node).__name__)
+
+    def Clear(self) -> None:
+        self.byType.clear()
+        self.bySpan.clear()
+
+    def Hottest(self, limit:int = 10) -> list[ProfileEntry]:
+        return sorted(self.bySpan.values(), key=lambda entry: entry.selfTime, reverse=True)[:limit]
+
+    def Report(self, limit:int = 10, file:TextIO = None) -> None:
+        file = file or sys.stdout
+        print(f"{'node':<16}{'calls':>8}{'total ms':>12}{'self ms':>12}{'allocs':>8}", file=file)
+        for typeName, entry in sorted(self.byType.items(), key=lambda item: item[1].selfTime, reverse=True):
+            print(f"{typeName:<16}{entry.calls:>8}{entry.totalTime / 1e6:>12.3f}{entry.selfTime / 1e6:>12.3f}{entry.allocations:>8}", file=file)
+
+        print(f"\n{'source range':<24}{'calls':>8}{'total ms':>12}{'self ms':>12}{'allocs':>8}  text", file=file)
+        for entry in self.Hottest(limit):
+            print(f"{self.FormatSpan(entry):<24}{entry.calls:>8}{entry.totalTime / 1e6:>12.3f}{entry.selfTime / 1e6:>12.3f}{entry.allocations:>8}  {self.Excerpt(entry)}", file=file)
+
+    def FormatSpan(self, entry:ProfileEntry) -> str:
+        if entry.startPosition == None:
+            return '<unknown>'
+        start, end = entry.startPosition, entry.endPosition
+        # Lines and columns count from one and the range includes its last column
+        return f"{start.filename}:{start.line + 1}:{start.column + 1}-{end.line + 1}:{end.column}"
+
+    def Excerpt(self, entry:ProfileEntry, width:int = 40) -> str:
+        if entry.startPosition == None or entry.startPosition.filetext == None:
+            return ''
+        # A streamed position only has the text of its own chunk
+        base = entry.startPosition.source.baseIndex if isinstance(entry.startPosition, LazyPosition) else 0
+        text = entry.startPosition.filetext[entry.startPosition.index - base:entry.endPosition.index - base]
+        text = ' '.join(text.split())
+        return text if len(text) <= width else text[:width - 3] + '...'
+
+class Tracer(InterpreterHook):
+    def __init__(self, file:TextIO = None) -> None:
+        self.file = file or sys.stderr
+        self.depth = 0
+
+    def Enter(self, node:NodeBase, context:Context) -> None:
+        print(f"{'  ' * self.depth}> {type(node).__name__} {self.Where(node)}", file=self.file)
+        self.depth += 1
+
+    def Exit(self, node:NodeBase, context:Context, value:any, error:BaseException) -> None:
+        self.depth -= 1
+        outcome = f"raised {error}" if error != None else f"= {value}"
+        print(f"{'  ' * self.depth}< {type(node).__name__} {outcome}", file=self.file)
+
+    def Where(self, node:NodeBase) -> str:
+        if node.startPosition == None:
+            return ''
+        return f"at {node.startPosition.line + 1}:{node.startPosition.column + 1}"
+
+################
+### BYTECODE ###
+################
+
+OpCode = IntEnum('OpCode', [
+    'LOAD_CONST',
+    'LOAD_NAME',
+    'STORE_NAME',
+    'LOAD_SLOT',
+    'STORE_SLOT',
+
+    'ADD',
+    'SUBTRACT',
+    'MULTIPLY',
+    'DIVIDE',
+    'POWER',
+    'NEGATE'
+])
+
+class CodeObject:
+    def __init__(self, code:list[int], constants:list, names:list[str], spans:list[tuple[Position, Position]],
+                 startPosition:Position, endPosition:Position) -> None:
+        # Instructions are stored as flat (opcode, argument) pairs
+        self.code = code
+        self.constants = constants
+        self.names = names
+        self.spans = spans
+        self.startPosition = startPosition
+        self.endPosition = endPosition
+    
+    def __repr__(self) -> str:
+        lines = []
+        for pc in range(0, len(self.code), 2):
+            op, arg = OpCode(self.code[pc]), self.code[pc + 1]
+            match op:
+                case OpCode.LOAD_CONST: lines.append(f'{pc:>4} {op.name:<12} {arg} ({self.constants[arg]})')
+                case OpCode.LOAD_NAME | OpCode.STORE_NAME: lines.append(f'{pc:>4} {op.name:<12} {arg} ({self.names[arg]})')
+                case OpCode.LOAD_SLOT | OpCode.STORE_SLOT: lines.append(f'{pc:>4} {op.name:<12} {arg} ({SYMBOL_SLOTS.names[arg]})')
+                case _: lines.append(f'{pc:>4} {op.name}')
+        return '\n'.join(lines)
+
+################
+### COMPILER ###
+################
+
+class Compiler:
+    @staticmethod
+    def Compile(rootNode:NodeBase) -> CodeObject:
+        return Compiler().DoCompile(rootNode)
+
+    def __init__(self) -> None:
+        self.code:list[int] = []
+        self.constants:list = []
+        self.constantIndexes:dict = {}
+        self.names:list[str] = []
+        self.nameIndexes:dict[str, int] = {}
+        self.spans:list[tuple[Position, Position]] = []
+    
+    def DoCompile(self, rootNode:NodeBase) -> CodeObject:
+        # Every node's code follows its children's, so the tree is compiled in post-order
+        for node in PostOrder(rootNode):
+            self.Visit(node)
+        return CodeObject(self.code, self.constants, self.names, self.spans, rootNode.startPosition, rootNode.endPosition)
+    
+    def Emit(self, op:OpCode, arg:int = 0, startPosition:Position = None, endPosition:Position = None) -> None:
+        self.code.append(op.value)
+        self.code.append(arg)
+        self.spans.append((startPosition, endPosition))
+    
+    def AddConstant(self, value:int|float) -> int:
+        # 1 and 1.0 compare equal but must stay distinct constants
+        key = (type(value), value)
+        if key not in self.constantIndexes:
+            self.constantIndexes[key] = len(self.constants)
+            self.constants.append(value)
+        return self.constantIndexes[key]
+    
+    def AddName(self, name:str) -> int:
+        if name not in self.nameIndexes:
+            self.nameIndexes[name] = len(self.names)
+            self.names.append(name)
+        return self.nameIndexes[name]
+
+    def Visit(self, node:NodeBase) -> None:
+        if not isinstance(node, NodeBase):
+            raise TypeError(f"Expected 'NodeBase', recieved '{type(node).__name__}'")
+
+        methodName = f'Compile{type(node).__name__}'
+        method = getattr(self, methodName, self.NoCompile)
+        method(node)
+    
+    def NoCompile(self, node:NodeBase) -> None:
+        raise NotImplementedError(node.startPosition, node.endPosition,
+                                  f'Compiler.Compile{type(node).__name__}')
+    
+    # Every instruction carries the span of its node, which is where an execution budget
+    # that runs out on it is reported
+    def CompileNumberNode(self, node:NumberNode) -> None:
+        self.Emit(OpCode.LOAD_CONST, self.AddConstant(node.numberToken.value), node.startPosition, node.endPosition)
+    
+    def CompileBinOpNode(self, node:BinOpNode) -> None:
+        startPosition, endPosition = OperatorSpan(node)
+        match node.opToken.tokenType:
+            case TokenType.PLUS:
+                self.Emit(OpCode.ADD, 0, startPosition, endPosition)
+            case TokenType.MINUS:
+                self.Emit(OpCode.SUBTRACT, 0, startPosition, endPosition)
+            case TokenType.MULTIPLY:
+                self.Emit(OpCode.MULTIPLY, 0, startPosition, endPosition)
+            case TokenType.DIVIDE:
+                self.Emit(OpCode.DIVIDE, 0, startPosition, endPosition)
+            case TokenType.POWER:
+                self.Emit(OpCode.POWER, 0, startPosition, endPosition)
+    
+    def CompileUnaryOpNode(self, node:UnaryOpNode) -> None:
+        if node.opToken.tokenType == TokenType.MINUS:
+            self.Emit(OpCode.NEGATE, 0, node.startPosition, node.endPosition)
+    
+    def CompileVarAssignNode(self, node:VarAssignNode) -> None:
+        if node.slot != None and node.depth == 0:
+            self.Emit(OpCode.STORE_SLOT, node.slot, node.startPosition, node.endPosition)
+        else:
+            self.Emit(OpCode.STORE_NAME, self.AddName(node.varNameToken.value), node.startPosition, node.endPosition)
+    
+    def CompileVarAccessNode(self, node:VarAccessNode) -> None:
+        # Unresolved trees, and addresses outside the current table, fall back to name lookups
+        if node.slot != None and node.depth == 0:
+            self.Emit(OpCode.LOAD_SLOT, node.slot, node.varNameToken.startPosition, node.varNameToken.endPosition)
+        else:
+            self.Emit(OpCode.LOAD_NAME, self.AddName(node.varNameToken.value), node.varNameToken.startPosition, node.varNameToken.endPosition)
+
+#######################
+### VIRTUAL MACHINE ###
+#######################
+
+class VirtualMachine:
+    @staticmethod
+    def Execute(code:CodeObject, context:Context, budget:ExecutionBudget = None) -> Object:
+        return VirtualMachine().Run(code, context, budget)
+    
+    def Run(self, code:CodeObject, context:Context, budget:ExecutionBudget = None) -> Object:
+        LOAD_CONST, LOAD_NAME, STORE_NAME = OpCode.LOAD_CONST.value, OpCode.LOAD_NAME.value, OpCode.STORE_NAME.value
+        LOAD_SLOT, STORE_SLOT = OpCode.LOAD_SLOT.value, OpCode.STORE_SLOT.value
+        ADD, SUBTRACT, MULTIPLY = OpCode.ADD.value, OpCode.SUBTRACT.value, OpCode.MULTIPLY.value
+        DIVIDE, POWER, NEGATE = OpCode.DIVIDE.value, OpCode.POWER.value, OpCode.NEGATE.value
+
+        instructions = code.code
+        constants = code.constants
+        names = code.names
+        symbolTable = context.symbolTable
+        values = symbolTable.Reserve()
+
+        # The stack and the symbol table hold raw Python numbers; only the result is boxed
+        stack = []
+        push = stack.append
+        pop = stack.pop
+
+        # A budget is consulted between runs of instructions rather than on every one; without
+        # one the whole program is a single run and arithmetic goes unchecked
+        checked = budget != None
+
+        pc = 0
+        end = len(instructions)
+        try:
+            while pc < end:
+                stop = budget.Segment(code, pc, end, context) if checked else end
+                while pc < stop:
+                    op = instructions[pc]
+                    arg = instructions[pc + 1]
+                    pc += 2
+
+                    if op == LOAD_CONST:
+                        push(constants[arg])
+                    elif op == LOAD_SLOT:
+                        value = values.get(arg, UNDEFINED)
+                        if value is UNDEFINED:
+                            # Not set in this table; it may still be inherited from a parent
+                            value = symbolTable.GetSlot(0, arg)
+                            if value == None:
+                                raise self.Error(code, pc, f"'{SYMBOL_SLOTS.names[arg]}' is not defined", context)
+                        push(value)
+                    elif op == LOAD_NAME:
+                        value = symbolTable.Get(names[arg])
+                        if value is None:
+                            raise self.Error(code, pc, f"'{names[arg]}' is not defined", context)
+                        push(value)
+                    elif op == ADD:
+                        right = pop()
+                        if checked: stack[-1] = self.Checked(budget, TokenType.PLUS, stack[-1], right, code, pc, context)
+                        else: stack[-1] = stack[-1] + right
+                    elif op == MULTIPLY:
+                        right = pop()
+                        if checked: stack[-1] = self.Checked(budget, TokenType.MULTIPLY, stack[-1], right, code, pc, context)
+                        else: stack[-1] = stack[-1] * right
+                    elif op == SUBTRACT:
+                        right = pop()
+                        if checked: stack[-1] = self.Checked(budget, TokenType.MINUS, stack[-1], right, code, pc, context)
+                        else: stack[-1] = stack[-1] - right
+                    elif op == DIVIDE:
+                        right = pop()
+                        if right == 0:
+                            raise self.Error(code, pc, "Cannot divide by zero", context)
+                        stack[-1] = stack[-1] / right
+                    elif op == POWER:
+                        right = pop()
+                        if checked: stack[-1] = self.Checked(budget, TokenType.POWER, stack[-1], right, code, pc, context)
+                        else: stack[-1] = stack[-1] ** right
+                    elif op == NEGATE:
+                        stack[-1] = -stack[-1]
+                    elif op == STORE_SLOT:
+                        values[arg] = stack[-1]
+                    elif op == STORE_NAME:
+                        symbolTable.Set(names[arg], stack[-1])
+                    else:
+                        raise NotImplementedError(code.startPosition, code.endPosition, f'VirtualMachine opcode {op}')
+        except (ZeroDivisionError, OverflowError) as error:
+            # pc has already moved past the instruction that raised it
+            startPosition, endPosition = code.spans[pc // 2 - 1]
+            raise ArithmeticFailure(error, startPosition, endPosition, context) from None
+        
+        return Box(stack[-1])
+    
+    def Checked(self, budget:ExecutionBudget, opType:TokenType, left, right, code:CodeObject, pc:int, context:Context):
+        # pc has already moved past the instruction
+        startPosition, endPosition = code.spans[pc // 2 - 1]
+        return budget.Operate(opType, left, right, startPosition, endPosition, context)
+    
+    def Error(self, code:CodeObject, pc:int, details:str, context:Context) -> RuntimeError:
+        # pc has already moved past the failing instruction
+        startPosition, endPosition = code.spans[pc // 2 - 1]
+        return RuntimeError(startPosition, endPosition, details, context)
+
+########################
+### BATCH EVALUATION ###
+########################
+
+class BatchResult:
+    def __init__(self, values, errors:dict[int, ShorkError]) -> None:
+        # Rows listed in errors hold no meaningful value (NaN for float results)
+        self.values = values
+        self.errors = errors
+    
+    def __repr__(self) -> str:
+        return f'<BatchResult rows={len(self.values)} failed={len(self.errors)}>'
+    
+    @property
+    def failedRows(self) -> list[int]:
+        return list(self.errors)
+
+class BatchEvaluator:
+    @staticmethod
+    def Evaluate(rootNode:NodeBase, columns:dict, context:Context = None) -> BatchResult:
+        return BatchEvaluator(columns, context).DoEvaluate(rootNode)
+
+    def __init__(self, columns:dict, context:Context = None) -> None:
+        # NumPy is only needed by this evaluator, so it is imported here rather than at startup
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError("BatchEvaluator requires NumPy") from None
+        self.numpy = numpy
+
+        self.columns = {name: numpy.asarray(column) for name, column in columns.items()}
+        if any(column.ndim > 1 for column in self.columns.values()):
+            raise ValueError("Batch columns must be one-dimensional")
+        lengths = {column.shape[0] for column in self.columns.values() if column.ndim == 1}
+        if len(lengths) > 1:
+            raise ValueError(f"Batch columns have different lengths: {sorted(lengths)}")
+        self.length = lengths.pop() if lengths else 1
+
+        self.context = context if context != None else Context("<batch>", symbolTable=GLOBAL_SYMBOL_TABLE)
+        self.failed = numpy.zeros(self.length, dtype=bool)
+        self.errors:dict[int, ShorkError] = {}
+    
+    def DoEvaluate(self, rootNode:NodeBase) -> BatchResult:
+        numpy = self.numpy
+        with numpy.errstate(all='ignore'):
+            values = self.Visit(rootNode)
+        
+        values = numpy.broadcast_to(values, (self.length,)).copy()
+        if self.errors and values.dtype.kind == 'f':
+            values[self.failed] = numpy.nan
+        return BatchResult(values, dict(sorted(self.errors.items())))
+    
+    def Fail(self, rows, startPosition:Position, endPosition:Position, details:str) -> None:
+        # Only the first error of a row is kept, as a sequential run would stop there
+        rows = self.numpy.broadcast_to(rows, (self.length,))
+        for index in self.numpy.flatnonzero(rows & ~self.failed):
+            self.errors[int(index)] = RuntimeError(startPosition, endPosition, details, self.context)
+        self.failed |= rows
+    
+    def IsInteger(self, *values) -> bool:
+        return all(value.dtype.kind in 'iu' for value in values)
+    
+    def Visit(self, node:NodeBase):
+        if not isinstance(node, NodeBase):
+            raise TypeError(f"Expected 'NodeBase', recieved '{type(node).__name__}'")
 
         methodName = f'Visit{type(node).__name__}'
         method = getattr(self, methodName, self.NoVisit)
-        return method(node, context)
+        return method(node)
     
-    def NoVisit(self, node:NodeBase, context:Context):
+    def NoVisit(self, node:NodeBase):
         raise NotImplementedError(node.startPosition, node.endPosition,
-                                  f'Interpreter.Visit{type(node).__name__}')
+                                  f'BatchEvaluator.Visit{type(node).__name__}')
     
-    def VisitNumberNode(self, node:NumberNode, context:Context):
-        return RuntimeResult().Success(Number(node.numberToken.value).SetContext(context).SetPosition(node.startPosition, node.endPosition))
-
-    def VisitBinOpNode(self, node:BinOpNode, context:Context):
-        result = RuntimeResult()
-        left:Object = result.Register(self.Visit(node.leftNode, context))
-        right:Object = result.Register(self.Visit(node.rightNode, context))
+    def VisitNumberNode(self, node:NumberNode):
+        return self.numpy.asarray(node.numberToken.value)
+    
+    def VisitBinOpNode(self, node:BinOpNode):
+        numpy = self.numpy
+        left = self.Visit(node.leftNode)
+        right = self.Visit(node.rightNode)
 
         match node.opToken.tokenType:
             case TokenType.PLUS:
-                return result.Success(left.AddTo(right).SetPosition(node.startPosition, node.endPosition))
+                return self.CheckedInteger(numpy.add, left, right, node)
             case TokenType.MINUS:
-                return result.Success(left.SubFrom(right).SetPosition(node.startPosition, node.endPosition))
+                return self.CheckedInteger(numpy.subtract, left, right, node)
             case TokenType.MULTIPLY:
-                return result.Success(left.MultiplyBy(right).SetPosition(node.startPosition, node.endPosition))
+                return self.CheckedInteger(numpy.multiply, left, right, node)
             case TokenType.DIVIDE:
-                return result.Success(left.DivideBy(right).SetPosition(node.startPosition, node.endPosition))
+                # Matches Number.DivideBy: reported against the divisor
+                zero = right == 0
+                if zero.any():
+                    self.Fail(zero, node.rightNode.startPosition, node.rightNode.endPosition, "Cannot divide by zero")
+                    right = numpy.where(zero, 1, right)
+                return numpy.true_divide(left, right)
             case TokenType.POWER:
-                return result.Success(left.ToPowerOf(right).SetPosition(node.startPosition, node.endPosition))
+                return self.Power(left, right, node)
     
-    def VisitUnaryOpNode(self, node:UnaryOpNode, context:Context):
-        result = RuntimeResult()
-        object:Object = result.Register(self.Visit(node.node, context))
+    def CheckedInteger(self, operation, left, right, node:NodeBase):
+        # Python ints never overflow but int64 columns wrap, so those rows are reported instead
+        result = operation(left, right)
+        if self.IsInteger(left, right):
+            numpy = self.numpy
+            approximate = operation(left.astype(numpy.float64), right.astype(numpy.float64))
+            overflow = numpy.abs(approximate) >= 2.0 ** 63
+            if overflow.any():
+                self.Fail(overflow, *OperatorSpan(node), "Integer result out of range for batch evaluation")
+        elif 'O' in (left.dtype.kind, right.dtype.kind):
+            # Python ints in a mixed column are held to the range of an int64 column
+            self.FailWideIntegers(result, node)
+        return result
+    
+    def FailWideIntegers(self, values, node:NodeBase) -> None:
+        values = self.numpy.broadcast_to(values, (self.length,)).tolist()
+        overflow = self.numpy.array([type(value) is int and abs(value) >= 2 ** 63 for value in values], dtype=bool)
+        if overflow.any():
+            self.Fail(overflow, *OperatorSpan(node), "Integer result out of range for batch evaluation")
+    
+    def Power(self, left, right, node:BinOpNode):
+        # Rows Python would reject or turn complex are reported instead of producing NaN
+        numpy = self.numpy
+        if 'O' in (left.dtype.kind, right.dtype.kind):
+            return self.MixedPower(left, right, node)
+        negative = right < 0
 
-        match object:
-            case Number():
-                if node.opToken.tokenType == TokenType.MINUS:
-                    return result.Success(object.MultiplyBy(Number(-1)).SetPosition(node.startPosition, node.endPosition))
-            case _:
-                raise RuntimeError(node.startPosition, node.endPosition,
-                                   f"Unary operation '{node.opToken.tokenType}' not defined for objects of type {type(object).__name__}")
+        zeroBase = (left == 0) & negative
+        if zeroBase.any():
+            self.Fail(zeroBase, *OperatorSpan(node), "Cannot raise zero to a negative power")
+            left = numpy.where(zeroBase, 1, left)
+        
+        if self.IsInteger(left, right):
+            if not negative.any():
+                return self.CheckedInteger(numpy.power, left, right, node)
+            # int ** negative int is a float in Python, and NumPy refuses it for integer arrays. Only
+            # those rows are raised in floating point; the others stay exact, as they would one at a
+            # time, so the column holds both kinds of number.
+            exact = self.CheckedInteger(numpy.power, left, numpy.where(negative, 0, right), node)
+            approximate = self.FloatPower(left, numpy.where(negative, right, 0), node)
+            result = numpy.broadcast_to(exact, (self.length,)).astype(object)
+            negative = numpy.broadcast_to(negative, (self.length,))
+            result[negative] = numpy.broadcast_to(approximate, (self.length,))[negative]
+            return result
+        return self.FloatPower(left, right, node)
     
-    def VisitVarAssignNode(self, node:VarAssignNode, context:Context):
-        result = RuntimeResult()
+    def FloatPower(self, left, right, node:BinOpNode):
+        numpy = self.numpy
+        left = left.astype(numpy.float64)
+        right = right.astype(numpy.float64)
+
+        complexResult = (left < 0) & (right != numpy.floor(right))
+        if complexResult.any():
+            self.Fail(complexResult, *OperatorSpan(node), "Result is not a real number")
+        
+        result = numpy.power(left, right)
+        overflow = numpy.isinf(result) & numpy.isfinite(left) & numpy.isfinite(right)
+        if overflow.any():
+            self.Fail(overflow, *OperatorSpan(node), "Numerical result out of range")
+        return result
+    
+    def MixedPower(self, left, right, node:BinOpNode):
+        # A column holding both ints and floats is raised a row at a time with Python's own power
+        numpy = self.numpy
+        left = numpy.broadcast_to(left, (self.length,)).tolist()
+        right = numpy.broadcast_to(right, (self.length,)).tolist()
+        result = numpy.empty(self.length, dtype=object)
+        failures = {}
+        for index, (base, exponent) in enumerate(zip(left, right)):
+            value, error = 0, None
+            if base == 0 and exponent < 0:
+                error = "Cannot raise zero to a negative power"
+            elif type(base) is int and type(exponent) is int and exponent > 0 and abs(base) > 1 and \
+                 (abs(base).bit_length() - 1) * exponent >= 63:
+                # Checked before raising, as the result could be too wide to compute at all
+                error = "Integer result out of range for batch evaluation"
+            else:
+                try:
+                    value = base ** exponent
+                except OverflowError:
+                    value, error = math.nan, "Numerical result out of range"
+                if isinstance(value, complex):
+                    value, error = math.nan, "Result is not a real number"
+                elif type(value) is float and math.isinf(value) and math.isfinite(base) and math.isfinite(exponent):
+                    value, error = math.nan, "Numerical result out of range"
+            result[index] = value
+            if error != None:
+                failures.setdefault(error, []).append(index)
+        for details, rows in failures.items():
+            failed = numpy.zeros(self.length, dtype=bool)
+            failed[rows] = True
+            self.Fail(failed, *OperatorSpan(node), details)
+        self.FailWideIntegers(result, node)
+        return result
+    
+    def VisitUnaryOpNode(self, node:UnaryOpNode):
+        value = self.Visit(node.node)
+        if node.opToken.tokenType == TokenType.MINUS:
+            return self.numpy.negative(value)
+        return value
+    
+    def VisitVarAssignNode(self, node:VarAssignNode):
+        value = self.Visit(node.valueNode)
+        self.columns[node.varNameToken.value] = value
+        return value
+    
+    def VisitVarAccessNode(self, node:VarAccessNode):
         varName = node.varNameToken.value
-        value = result.Register(self.Visit(node.valueNode, context))
-        context.symbolTable.Set(varName, value)
-        return result.Success(value)
+        column = self.columns.get(varName)
+        if column is not None:
+            return column
+        
+        # Names without a column fall back to the context and apply to every row
+        value = self.context.symbolTable.Get(varName)
+        if value == None:
+            raise RuntimeError(node.varNameToken.startPosition, node.varNameToken.endPosition, f"'{varName}' is not defined", self.context)
+        return self.numpy.asarray(value)
+
+########################
+### CLOSURE COMPILER ###
+########################
+
+class ClosureCompiler:
+    @staticmethod
+    def Compile(rootNode:NodeBase, generateSource:bool = False, context:Context = None) -> Callable[[dict], int|float]:
+        return ClosureCompiler(context).DoCompile(rootNode, generateSource)
+
+    def __init__(self, context:Context = None) -> None:
+        # Errors raised by the compiled callable report this context
+        self.context = context if context != None else Context("<closure>")
     
-    def VisitVarAccessNode(self, node:VarAccessNode, context:Context):
-        result = RuntimeResult()
+    def DoCompile(self, rootNode:NodeBase, generateSource:bool = False) -> Callable[[dict], int|float]:
+        # The callable takes a mapping of variable names to raw numbers, returns a raw number
+        # and writes assignments back into the mapping
+        if generateSource:
+            try:
+                return self.CompileSource(rootNode)
+            except (SyntaxError, RecursionError, MemoryError):
+                # Too deeply nested for Python's own compiler; closures have no such limit
+                pass
+        return self.Visit(rootNode)
+
+    def Visit(self, node:NodeBase) -> Callable:
+        if not isinstance(node, NodeBase):
+            raise TypeError(f"Expected 'NodeBase', recieved '{type(node).__name__}'")
+
+        methodName = f'Compile{type(node).__name__}'
+        method = getattr(self, methodName, self.NoCompile)
+        return method(node)
+    
+    def NoCompile(self, node:NodeBase) -> Callable:
+        raise NotImplementedError(node.startPosition, node.endPosition,
+                                  f'ClosureCompiler.Compile{type(node).__name__}')
+    
+    def CompileNumberNode(self, node:NumberNode) -> Callable:
+        value = node.numberToken.value
+        return lambda variables: value
+    
+    def CompileBinOpNode(self, node:BinOpNode) -> Callable:
+        left = self.Visit(node.leftNode)
+        right = self.Visit(node.rightNode)
+
+        match node.opToken.tokenType:
+            case TokenType.PLUS:
+                return lambda variables: left(variables) + right(variables)
+            case TokenType.MINUS:
+                return lambda variables: left(variables) - right(variables)
+            case TokenType.MULTIPLY:
+                return lambda variables: left(variables) * right(variables)
+            case TokenType.POWER:
+                context = self.context
+                def power(variables):
+                    base = left(variables)
+                    exponent = right(variables)
+                    try:
+                        return base ** exponent
+                    except (ZeroDivisionError, OverflowError) as error:
+                        raise ArithmeticFailure(error, *OperatorSpan(node), context) from None
+                return power
+            case TokenType.DIVIDE:
+                rightNode, context = node.rightNode, self.context
+                def divide(variables):
+                    dividend = left(variables)
+                    divisor = right(variables)
+                    if divisor == 0:
+                        raise RuntimeError(rightNode.startPosition, rightNode.endPosition, "Cannot divide by zero", context)
+                    try:
+                        return dividend / divisor
+                    except OverflowError as error:
+                        raise ArithmeticFailure(error, *OperatorSpan(node), context) from None
+                return divide
+    
+    def CompileUnaryOpNode(self, node:UnaryOpNode) -> Callable:
+        operand = self.Visit(node.node)
+        if node.opToken.tokenType == TokenType.MINUS:
+            return lambda variables: -operand(variables)
+        return operand
+    
+    def CompileVarAssignNode(self, node:VarAssignNode) -> Callable:
         varName = node.varNameToken.value
-        value = context.symbolTable.Get(varName)
+        valueFunction = self.Visit(node.valueNode)
+        def assign(variables):
+            value = valueFunction(variables)
+            variables[varName] = value
+            return value
+        return assign
+    
+    def CompileVarAccessNode(self, node:VarAccessNode) -> Callable:
+        varName = node.varNameToken.value
+        context = self.context
+        def access(variables):
+            try:
+                return variables[varName]
+            except KeyError:
+                raise RuntimeError(node.varNameToken.startPosition, node.varNameToken.endPosition, f"'{varName}' is not defined", context) from None
+        return access
+    
+    def CompileSource(self, rootNode:NodeBase) -> Callable[[dict], int|float]:
+        # Generates one Python expression for the whole tree.  Division, powers and assignment go
+        # through small helpers; a missing variable surfaces as a KeyError, which is mapped
+        # back to the first access of that name in evaluation order.
+        constants:list = []
+        divisorSpans:list[NodeBase] = []
+        powerSpans:list[NodeBase] = []
+        accesses:dict[str, NodeBase] = {}
+        context = self.context
+
+        def Emit(node:NodeBase) -> str:
+            match node:
+                case NumberNode():
+                    constants.append(node.numberToken.value)
+                    return f'_c[{len(constants) - 1}]'
+                case BinOpNode():
+                    left, right = Emit(node.leftNode), Emit(node.rightNode)
+                    match node.opToken.tokenType:
+                        case TokenType.PLUS: return f'({left} + {right})'
+                        case TokenType.MINUS: return f'({left} - {right})'
+                        case TokenType.MULTIPLY: return f'({left} * {right})'
+                        case TokenType.POWER:
+                            powerSpans.append(node)
+                            return f'_power({left}, {right}, {len(powerSpans) - 1})'
+                        case TokenType.DIVIDE:
+                            divisorSpans.append(node.rightNode)
+                            return f'_divide({left}, {right}, {len(divisorSpans) - 1})'
+                case UnaryOpNode():
+                    operand = Emit(node.node)
+                    return f'(-{operand})' if node.opToken.tokenType == TokenType.MINUS else operand
+                case VarAssignNode():
+                    return f'_assign(_v, {node.varNameToken.value!r}, {Emit(node.valueNode)})'
+                case VarAccessNode():
+                    accesses.setdefault(node.varNameToken.value, node)
+                    return f'_v[{node.varNameToken.value!r}]'
+            raise NotImplementedError(node.startPosition, node.endPosition,
+                                      f'ClosureCompiler.CompileSource for {type(node).__name__}')
+        
+        def divide(dividend, divisor, spanIndex):
+            if divisor == 0:
+                span = divisorSpans[spanIndex]
+                raise RuntimeError(span.startPosition, span.endPosition, "Cannot divide by zero", context)
+            return dividend / divisor
+        
+        def power(base, exponent, spanIndex):
+            try:
+                return base ** exponent
+            except (ZeroDivisionError, OverflowError) as error:
+                raise ArithmeticFailure(error, *OperatorSpan(powerSpans[spanIndex]), context) from None
+        
+        def assign(variables, varName, value):
+            variables[varName] = value
+            return value
+        
+        source = f'lambda _v: {Emit(rootNode)}'
+        evaluate = eval(compile(source, f'<shork {rootNode.startPosition.filename}>', 'eval'),
+                        {'_c': constants, '_divide': divide, '_power': power, '_assign': assign})
+        
+        def run(variables):
+            try:
+                return evaluate(variables)
+            except KeyError as error:
+                node = accesses.get(error.args[0]) if error.args else None
+                if node == None: raise
+                raise RuntimeError(node.varNameToken.startPosition, node.varNameToken.endPosition, f"'{error.args[0]}' is not defined", context) from None
+        
+        run.source = source
+        return run
+
+###############
+### PROGRAM ###
+###############
+
+class Program:
+    @staticmethod
+    def Parse(tokens:Iterable[Token], optimizationLevel:OptimizationLevel = OptimizationLevel.NONE) -> Program:
+        try:
+            if isinstance(tokens, TokenBuffer):
+                tree = BufferParser.Parse(tokens)
+            else:
+                tree = IterativeParser.Parse(tokens)
+        except ShorkError as error:
+            # Otherwise the parser's frames, and with them the tokens and the half-built tree,
+            # live as long as the error does; this frame stays on it, so it lets go of them too
+            del tokens
+            raise error.Release()
+        return Program.FromTree(tree, optimizationLevel)
+
+    @staticmethod
+    def FromTree(tree:NodeBase, optimizationLevel:OptimizationLevel = OptimizationLevel.NONE) -> Program:
+        optimizer = Optimizer(optimizationLevel)
+        tree = optimizer.DoOptimize(tree)
+        Resolver.Resolve(tree)
+        return Program(tree, removedNodes=optimizer.removedNodes)
+
+    def __init__(self, tree:NodeBase, code:CodeObject = None, removedNodes:int = 0) -> None:
+        self.tree = tree
+        self.code = code
+        # Nodes the optimizer took out of the parsed tree
+        self.removedNodes = removedNodes
+        # The tree with repeated subtrees shared, for the MemoInterpreter
+        self.dag:NodeBase = None
+    
+    def Compile(self) -> CodeObject:
+        if self.code == None:
+            self.code = Compiler.Compile(self.tree)
+        return self.code
+    
+    def Share(self) -> NodeBase:
+        if self.dag == None:
+            self.dag = HashConser.Share(self.tree)
+        return self.dag
+    
+    def Relink(self) -> None:
+        # Slots are handed out per process, so a program loaded from disk is resolved again
+        # and its code rebuilt if any address moved
+        if Resolver.Resolve(self.tree):
+            self.code = None
+            self.dag = None
+
+#####################
+### PROGRAM CACHE ###
+#####################
+
+# Bump whenever nodes, tokens or code objects change shape, so stale cache files are ignored
+CACHE_FORMAT_VERSION = 8
+
+class ProgramCache:
+    def __init__(self, maxEntries:int = 256, directory:str = None) -> None:
+        self.maxEntries = maxEntries
+        self.directory = directory
+        self.entries:OrderedDict[tuple, Program] = OrderedDict()
+        # Held over each lookup and insertion, as moving and evicting entries is not atomic, but
+        # not while a program is read, parsed or written
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.diskHits = 0
+        self.diskWrites = 0
+    
+    def Key(self, text:str, filename:str, optimizationLevel:OptimizationLevel) -> tuple:
+        # Hashing and temporary files are only needed once something is cached, so neither is
+        # imported at startup
+        import hashlib
+        digest = hashlib.sha256(text.encode('utf-8', 'surrogatepass')).hexdigest()
+        return (digest, filename, int(optimizationLevel))
+    
+    def Load(self, text:str, filename:str, optimizationLevel:OptimizationLevel = OptimizationLevel.NONE) -> Program:
+        key = self.Key(text, filename, optimizationLevel)
 
-        if not value:
-            result.Failure(RuntimeError(node.startPosition, node.endPosition, f"'{varName}' is not defined", context))
+        with self.lock:
+            program = self.entries.get(key)
+            if program != None:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return program
+            self.misses += 1
+        
+        program = self.ReadFile(key)
+        if program == None:
+            program = Program.Parse(TableLexer.Stream(text, filename), optimizationLevel)
+            if self.directory != None:
+                # Compile up front so the stored program is ready for the VM
+                program.Compile()
+                self.WriteFile(key, program)
+        
+        with self.lock:
+            # Another thread may have loaded the same program meanwhile; every caller gets the
+            # one that was cached first
+            cached = self.entries.setdefault(key, program)
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.maxEntries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+        return cached
+    
+    def Clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+    
+    def Stats(self) -> dict[str, int]:
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'maxEntries': self.maxEntries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'diskHits': self.diskHits,
+                'diskWrites': self.diskWrites
+            }
+    
+    def FilePath(self, key:tuple) -> str:
+        # Keyed like __pycache__: the same source under another filename or level is another file
+        import hashlib
+        digest = hashlib.sha256(repr(key).encode('utf-8', 'surrogatepass')).hexdigest()
+        return os.path.join(self.directory, f'{digest[:32]}.{sys.implementation.cache_tag}.shorkc')
+    
+    def ReadFile(self, key:tuple) -> Program:
+        if self.directory == None:
+            return None
+        try:
+            with open(self.FilePath(key), 'rb') as file:
+                version, storedKey, program = pickle.load(file)
+        except (OSError, EOFError, ValueError, pickle.UnpicklingError, AttributeError, ImportError):
+            return None
+        
+        if version != CACHE_FORMAT_VERSION or storedKey != key:
+            return None
+        with self.lock:
+            self.diskHits += 1
+        program.Relink()
+        return program
+    
+    def WriteFile(self, key:tuple, program:Program) -> None:
+        import tempfile
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            data = pickle.dumps((CACHE_FORMAT_VERSION, key, program), pickle.HIGHEST_PROTOCOL)
+            # Written to a temporary file and renamed, so readers never see a partial entry
+            fd, temporaryPath = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as file:
+                file.write(data)
+            os.replace(temporaryPath, self.FilePath(key))
+        except (OSError, RecursionError, pickle.PicklingError):
+            # A program that cannot be stored is still cached in memory
+            return
+        with self.lock:
+            self.diskWrites += 1
 
 ######################
 ### GLOBAL SYMBOLS ###
 ######################
 
-GLOBAL_SYMBOL_TABLE = SymbolTable()
-GLOBAL_SYMBOL_TABLE.Set("null", Number(0))
+GLOBAL_SYMBOL_TABLE = SharedSymbolTable()
+GLOBAL_SYMBOL_TABLE.Set("null", 0)
+
+PROGRAM_CACHE = ProgramCache()
 
 ###########
 ### RUN ###
 ###########
 
-def Run(text:str, filename:str) -> None:
+Backend = Enum('Backend', [
+    'VM',
+    'TREE',
+    'ADAPTIVE',
+    'MEMO'
+])
+
+def Run(text:str, filename:str, backend:Backend = Backend.VM,
+        optimizationLevel:OptimizationLevel = OptimizationLevel.NONE, cache:ProgramCache = PROGRAM_CACHE,
+        hooks:list[InterpreterHook] = None, limits:ExecutionLimits = None) -> None:
     try:
-        tokens = Lexer.Lex(text, filename)
+        if cache != None:
+            program = cache.Load(text, filename, optimizationLevel)
+        else:
+            program = Program.Parse(TableLexer.Stream(text, filename), optimizationLevel)
+        print(RunProgram(program, backend, hooks, limits=limits))
+    except ShorkError as e:
+        print(e)
 
-        nodes = Parser.Parse(tokens)
-        
-        context = Context("<program>", symbolTable=GLOBAL_SYMBOL_TABLE)
-        result = Interpreter.Interpret(nodes, context)
-        
-        print(result)
+def RunStream(stream:TextIO, filename:str, backend:Backend = Backend.VM,
+              optimizationLevel:OptimizationLevel = OptimizationLevel.NONE, hooks:list[InterpreterHook] = None,
+              limits:ExecutionLimits = None) -> None:
+    try:
+        program = Program.Parse(StreamLexer.Stream(stream, filename), optimizationLevel)
+        print(RunProgram(program, backend, hooks, limits=limits))
     except ShorkError as e:
         print(e)
 
+def RunProgram(program:Program, backend:Backend = Backend.VM, hooks:list[InterpreterHook] = None,
+               context:Context = None, limits:ExecutionLimits = None) -> Object:
+    if context == None:
+        # Without a context of its own the program writes to a private overlay of the global
+        # symbol table, committed once it finishes or fails, so threads running at once never see
+        # each other's half-done work
+        overlay = GLOBAL_SYMBOL_TABLE.Overlay()
+        try:
+            return RunProgram(program, backend, hooks, Context("<program>", symbolTable=overlay), limits)
+        except ShorkError as error:
+            del program
+            raise error.Release()
+        finally:
+            GLOBAL_SYMBOL_TABLE.Commit(overlay)
+    OPTIMIZER_STATS.Record(program)
+    # The clock starts here, so compiling counts towards the run's time
+    budget = ExecutionBudget(limits) if limits != None else None
+    try:
+        if hooks:
+            # Hooks see every node, which only the tree walker visits
+            return Interpreter.Interpret(program.tree, context, hooks, budget)
+        if backend == Backend.TREE:
+            # Same semantics as the recursive Interpreter, which is kept as the reference
+            # implementation for differential testing, but without a depth limit
+            return IterativeInterpreter.Interpret(program.tree, context, budget)
+        if backend == Backend.ADAPTIVE:
+            return AdaptiveInterpreter.Interpret(program.tree, context, budget=budget)
+        if backend == Backend.MEMO:
+            # Repeated subexpressions are evaluated once each until a name they read is assigned
+            return MemoInterpreter.Interpret(program.Share(), context, budget, program.tree)
+        return VirtualMachine.Execute(program.Compile(), context, budget)
+    except ShorkError as error:
+        # As in Program.Parse, the error outlives the interpreter's frames, and the program they
+        # ran, rather than keeping them
+        del program
+        raise error.Release()
+
+def RunFile(path:str, backend:Backend = Backend.VM, optimizationLevel:OptimizationLevel = OptimizationLevel.NONE,
+            hooks:list[InterpreterHook] = None, context:Context = None, limits:ExecutionLimits = None) -> int:
+    # Runs a ';' separated file a statement at a time, printing each result or error as it goes.
+    # The file is memory-mapped and lexed from the mapping, and each statement is dropped once
+    # it has run, so memory does not grow with the length of the file. Returns how many
+    # statements failed. Limits apply to each statement on its own. Without a context, each
+    # statement commits to the global symbol table as it finishes.
+    with open(path, 'rb') as file:
+        size = os.fstat(file.fileno()).st_size
+        # An empty file cannot be mapped
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        try:
+            return RunStatements(MappedLexer(buffer, path), backend, optimizationLevel, hooks, context, limits)
+        finally:
+            if size: buffer.close()
+
+def RunStatements(lexer:MappedLexer, backend:Backend = Backend.VM, optimizationLevel:OptimizationLevel = OptimizationLevel.NONE,
+                  hooks:list[InterpreterHook] = None, context:Context = None, limits:ExecutionLimits = None) -> int:
+    failures = 0
+    parser = StatementParser(())
+    # Recovery steps still owed after an error; they can fail again on the next bad character
+    restart = True
+    skip = False
+    while True:
+        try:
+            if restart:
+                restart = False
+                # The lexer carries on just past the last character it rejected
+                parser.Resume(lexer.IterTokens())
+            if skip:
+                skip = False
+                parser.SkipStatement()
+            tree = parser.NextStatement()
+            if tree == None:
+                return failures
+            print(RunProgram(Program.FromTree(tree, optimizationLevel), backend, hooks, context, limits))
+        except IllegalCharacterError as error:
+            print(error)
+            failures += 1
+            restart = skip = True
+        except InvalidSyntaxError as error:
+            print(error)
+            failures += 1
+            skip = True
+        except ShorkError as error:
+            print(error)
+            failures += 1
+
+######################
+### REACTIVE TABLE ###
+######################
+
+class Formula:
+    def __init__(self, name:str, program:Program, reads:dict[str, VarAccessNode], writes:list[str], sequence:int) -> None:
+        self.name = name
+        self.program = program
+        # Every name read from outside the formula, with the first node reading it
+        self.reads = reads
+        # The name the formula defines, then any it assigns along the way
+        self.writes = writes
+        # Order of definition, which breaks ties between formulas that are ready at once
+        self.sequence = sequence
+
+class ReactiveTable:
+    # Keeps 'VAR name = ...' formulas up to date as the values they read change, like the cells of
+    # a spreadsheet. A change recomputes only the formulas downstream of it, each once and after
+    # everything it reads, and stops early wherever a formula comes out the same as before.
+    def __init__(self, backend:Backend = Backend.VM, symbolTable:SymbolTable = None) -> None:
+        self.backend = backend
+        self.context = Context("<reactive>", symbolTable=symbolTable if symbolTable != None else SymbolTable(GLOBAL_SYMBOL_TABLE))
+        self.formulas:dict[str, Formula] = {}
+        # Name -> formula assigning it, and name -> formulas reading it
+        self.owners:dict[str, str] = {}
+        self.readers:dict[str, set[str]] = {}
+        # Formula -> error from its last run, if it failed
+        self.errors:dict[str, ShorkError] = {}
+        self.subscribers:dict[str, list[Callable]] = {}
+        self.sequence = 0
+        # Formulas run by the last change, for checking that updates stay local
+        self.recomputed = 0
+    
+    def Get(self, name:str):
+        return self.context.symbolTable.Get(name)
+    
+    def Define(self, text:str, filename:str = "<formula>", optimizationLevel:OptimizationLevel = OptimizationLevel.NONE):
+        # Adds or replaces the formula for the name text assigns and returns its value, or None if
+        # it failed; the error is kept in errors. A formula reading anything that depends on it
+        # raises CircularDependencyError and leaves the table as it was.
+        program = Program.Parse(TableLexer.Stream(text, filename), optimizationLevel)
+        tree = program.tree
+        if not isinstance(tree, VarAssignNode):
+            raise InvalidSyntaxError(tree.startPosition, tree.endPosition, "Expected a formula: 'VAR' identifier '=' expression")
+        
+        name = tree.varNameToken.value
+        reads, writes = {}, [name]
+        for node in PostOrder(tree.valueNode):
+            if isinstance(node, VarAccessNode):
+                reads.setdefault(node.varNameToken.value, node)
+            elif isinstance(node, VarAssignNode) and node.varNameToken.value not in writes:
+                writes.append(node.varNameToken.value)
+        if name in reads:
+            node = reads[name]
+            raise CircularDependencyError(node.startPosition, node.endPosition, f"'{name}' reads itself")
+        # A name assigned inside the formula is read from that assignment, not from elsewhere
+        for written in writes[1:]:
+            reads.pop(written, None)
+        for written in writes:
+            owner = self.owners.get(written, name)
+            if owner != name:
+                raise ValueError(f"'{written}' is already assigned by the formula for '{owner}'")
+        
+        previous = self.formulas.get(name)
+        if previous != None:
+            self.Detach(previous)
+        formula = Formula(name, program, reads, writes, previous.sequence if previous != None else self.sequence)
+        self.sequence += previous == None
+        node = self.FindCycle(formula)
+        if node != None:
+            if previous != None:
+                self.Attach(previous)
+            raise CircularDependencyError(node.startPosition, node.endPosition,
+                                          f"'{node.varNameToken.value}' depends on '{name}'")
+        
+        self.Attach(formula)
+        # Names the old formula assigned and the new one does not are no longer defined
+        dropped = [written for written in previous.writes if written not in writes] if previous != None else []
+        for written in dropped:
+            self.Discard(written)
+        self.Propagate(set(dropped), [name])
+        return self.Get(name)
+    
+    def Set(self, name:str, value) -> None:
+        # Sets an input and brings everything downstream of it up to date
+        if name in self.owners:
+            raise ValueError(f"'{name}' is assigned by the formula for '{self.owners[name]}'; remove it first")
+        old = self.Get(name)
+        self.context.symbolTable.Set(name, value)
+        changed = set()
+        if not Unchanged(old, value):
+            changed.add(name)
+            self.Notify(name, value, None)
+        self.Propagate(changed)
+    
+    def Remove(self, name:str) -> None:
+        # Drops a formula or an input; whatever read it fails until it is defined again
+        if name in self.formulas:
+            formula = self.formulas.pop(name)
+            self.Detach(formula)
+            self.errors.pop(name, None)
+            changed = {written for written in formula.writes if self.Discard(written)}
+        elif name in self.owners:
+            raise ValueError(f"'{name}' is assigned by the formula for '{self.owners[name]}'")
+        elif self.Discard(name):
+            changed = {name}
+        else:
+            raise KeyError(name)
+        self.Propagate(changed)
+    
+    def Subscribe(self, name:str, callback:Callable[[str, any, ShorkError], None]) -> None:
+        # The callback is given the name, its new value and the error that left it undefined, if any
+        self.subscribers.setdefault(name, []).append(callback)
+    
+    def Unsubscribe(self, name:str, callback:Callable[[str, any, ShorkError], None]) -> None:
+        self.subscribers[name].remove(callback)
+    
+    def Attach(self, formula:Formula) -> None:
+        self.formulas[formula.name] = formula
+        for written in formula.writes:
+            self.owners[written] = formula.name
+        for read in formula.reads:
+            self.readers.setdefault(read, set()).add(formula.name)
+    
+    def Detach(self, formula:Formula) -> None:
+        for written in formula.writes:
+            del self.owners[written]
+        for read in formula.reads:
+            readers = self.readers[read]
+            readers.discard(formula.name)
+            if not readers: del self.readers[read]
+    
+    def Downstream(self, names:Iterable[str], formulas:Iterable[str] = ()) -> set[str]:
+        # The formulas reading any of the names, directly or through other formulas
+        found = set()
+        stack = list(formulas)
+        for name in names:
+            stack.extend(self.readers.get(name, ()))
+        while stack:
+            current = stack.pop()
+            if current in found: continue
+            found.add(current)
+            for written in self.formulas[current].writes:
+                stack.extend(self.readers.get(written, ()))
+        return found
+    
+    def FindCycle(self, formula:Formula) -> VarAccessNode:
+        # Returns the node reading a name that depends on the formula, which is not attached yet
+        downstream = self.Downstream(formula.writes)
+        for read, node in formula.reads.items():
+            if self.owners.get(read) in downstream:
+                return node
+        return None
+    
+    def Propagate(self, changed:set[str], formulas:list[str] = ()) -> None:
+        # Runs the given formulas and any formula reading a changed name, in dependency order.
+        # A formula whose inputs all came out unchanged is skipped, and so is what it feeds.
+        affected = self.Downstream(changed, formulas)
+        owners, readers = self.owners, self.readers
+        waiting = {}
+        for name in affected:
+            waiting[name] = len({owners[read] for read in self.formulas[name].reads if owners.get(read) in affected})
+        ready = [(self.formulas[name].sequence, name) for name, count in waiting.items() if count == 0]
+        heapq.heapify(ready)
+        
+        self.recomputed = 0
+        changed = set(changed)
+        while ready:
+            _, name = heapq.heappop(ready)
+            formula = self.formulas[name]
+            if name in formulas or not changed.isdisjoint(formula.reads):
+                changed.update(self.Recompute(formula))
+            released = set()
+            for written in formula.writes:
+                released.update(reader for reader in readers.get(written, ()) if reader in waiting)
+            for reader in released:
+                waiting[reader] -= 1
+                if waiting[reader] == 0:
+                    heapq.heappush(ready, (self.formulas[reader].sequence, reader))
+    
+    def Recompute(self, formula:Formula) -> list[str]:
+        # Runs the formula and returns the names it changed
+        self.recomputed += 1
+        before = [self.Get(written) for written in formula.writes]
+        hadError = formula.name in self.errors
+        error = None
+        try:
+            RunProgram(formula.program, self.backend, context=self.context)
+            self.errors.pop(formula.name, None)
+        except ShorkError as e:
+            # Nothing it assigns keeps a value, so a failure shows up downstream too
+            error = self.errors[formula.name] = e.Release()
+            for written in formula.writes:
+                self.Discard(written, False)
+        
+        changed = []
+        for written, old in zip(formula.writes, before):
+            value = self.Get(written)
+            if not Unchanged(old, value) or (written == formula.name and hadError != (error != None)):
+                changed.append(written)
+                self.Notify(written, value, error)
+        return changed
+    
+    def Discard(self, name:str, notify:bool = True) -> bool:
+        # Returns whether the name had a value
+        try:
+            self.context.symbolTable.Remove(name)
+        except KeyError:
+            return False
+        if notify:
+            self.Notify(name, None, None)
+        return True
+    
+    def Notify(self, name:str, value, error:ShorkError) -> None:
+        for callback in list(self.subscribers.get(name, ())):
+            callback(name, value, error)
+
+def Unchanged(old, new) -> bool:
+    # NaN is not equal to itself but has not changed, and -0.0 equals 0.0 but has
+    if type(old) is not type(new):
+        return False
+    if old != old and new != new:
+        return True
+    return old == new and (type(old) is not float or math.copysign(1, old) == math.copysign(1, new))
+
 def __SignalHandler(sig, frame):
     sys.exit(0)
 
 if __name__ == "__main__":
     signal.signal(signal.SIGINT, __SignalHandler)
+    backend = Backend.TREE if '--tree' in sys.argv[1:] else Backend.VM
+    # --adaptive runs on the tree walker that specializes hot operators, and
+    # --specialization-stats shows how well it covered them after each run
+    if '--adaptive' in sys.argv[1:]: backend = Backend.ADAPTIVE
+    # --memo shares repeated subexpressions and evaluates each of them once
+    if '--memo' in sys.argv[1:]: backend = Backend.MEMO
+    specializationStats = '--specialization-stats' in sys.argv[1:]
+    # --optimizer-stats shows how many nodes the optimizer has taken out so far
+    optimizerStats = '--optimizer-stats' in sys.argv[1:]
+    optimizationLevel = OptimizationLevel.NONE
+    for arg in sys.argv[1:]:
+        # -O1 folds constants, -O2 (or plain -O) also simplifies
+        if arg.startswith('-O'): optimizationLevel = OptimizationLevel(int(arg[2:] or 2))
+        # Keeps parsed and compiled programs on disk between sessions
+        if arg.startswith('--cache-dir='): PROGRAM_CACHE.directory = arg[len('--cache-dir='):]
+    # --max-steps=N, --timeout=SECONDS and --max-int-bits=N limit every run
+    limits = ExecutionLimits()
+    for arg in sys.argv[1:]:
+        if arg.startswith('--max-steps='): limits.maxSteps = int(arg[len('--max-steps='):])
+        if arg.startswith('--timeout='): limits.timeout = float(arg[len('--timeout='):])
+        if arg.startswith('--max-int-bits='): limits.maxIntegerBits = int(arg[len('--max-int-bits='):])
+    if limits.maxSteps == None and limits.timeout == None and limits.maxIntegerBits == None:
+        limits = None
+    # --profile prints the hottest source ranges after each run, --trace logs every node to stderr
+    profiler = Profiler() if '--profile' in sys.argv[1:] else None
+    hooks = [hook for hook in [profiler, Tracer() if '--trace' in sys.argv[1:] else None] if hook != None]
+    # A path runs that file, one statement at a time
+    paths = [arg for arg in sys.argv[1:] if not arg.startswith('-')]
+    if paths:
+        failures = sum(RunFile(path, backend, optimizationLevel, hooks, limits=limits) for path in paths)
+        if profiler != None: profiler.Report()
+        if specializationStats: SPECIALIZATION_STATS.Report()
+        if optimizerStats: OPTIMIZER_STATS.Report()
+        sys.exit(1 if failures else 0)
+    if '--stdin' in sys.argv[1:]:
+        # The whole of stdin is one program, lexed and parsed as it is read
+        RunStream(sys.stdin, "<STDIN>", backend, optimizationLevel, hooks, limits)
+        if profiler != None: profiler.Report()
+        if specializationStats: SPECIALIZATION_STATS.Report()
+        if optimizerStats: OPTIMIZER_STATS.Report()
+        sys.exit(0)
     while True:
-        text = input("🦈> ")
-        Run(text, "<STDIN>")
\ No newline at end of file
+        try:
+            text = input("🦈> ")
+        except EOFError:
+            break
+        Run(text, "<STDIN>", backend, optimizationLevel, hooks=hooks, limits=limits)
+        if profiler != None:
+            profiler.Report()
+            profiler.Clear()
+        if specializationStats:
+            SPECIALIZATION_STATS.Report()
+        if optimizerStats:
+            OPTIMIZER_STATS.Report()
\ No newline at end of file
@@ -0,0 +1,171 @@
+###############
+### IMPORTS ###
+###############
+
+from __future__ import annotations
+import sys, os, json, math, signal, argparse
+from typing import Iterable, Iterator
+
+import ShorkBasic as Shork
+
+################
+### PROGRAMS ###
+################
+
+class BatchProgram:
+    def __init__(self, index:int, name:str, text:str, error:dict = None) -> None:
+        self.index = index
+        self.name = name
+        self.text = text
+        # Set for an input that could not be read, which is reported instead of run
+        self.error = error
+
+def ReadDirectory(path:str, suffix:str = '.shk') -> Iterator[BatchProgram]:
+    # Files run in name order, so the input order is the same on every machine
+    names = sorted(name for name in os.listdir(path) if name.endswith(suffix) and os.path.isfile(os.path.join(path, name)))
+    for index, name in enumerate(names):
+        with open(os.path.join(path, name), encoding='utf-8') as file:
+            yield BatchProgram(index, name, file.read())
+
+def ReadJsonLines(lines:Iterable[str]) -> Iterator[BatchProgram]:
+    # One object per line: {"source": "...", "name": "..."}, the name being optional
+    index = 0
+    for lineNumber, line in enumerate(lines, 1):
+        if not line.strip(): continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        if isinstance(record, str):
+            record = {'source': record}
+        if isinstance(record, dict) and isinstance(record.get('source'), str):
+            yield BatchProgram(index, str(record.get('name', f'<line {lineNumber}>')), record['source'])
+        else:
+            # A bad line fails on its own, like a program that does not parse
+            yield BatchProgram(index, f'<line {lineNumber}>', None,
+                               {'name': "Invalid Request", 'details': "Expected a JSON object with a 'source' string, or a string"})
+        index += 1
+
+###############
+### RECORDS ###
+###############
+
+def ValueRecord(value) -> int|float|str:
+    # JSON has no complex numbers or infinities, so those are written as text
+    if type(value) is int or (type(value) is float and math.isfinite(value)):
+        return value
+    return str(value)
+
+def ErrorRecord(error:Shork.ShorkError) -> dict:
+    record = {'name': error.errorName, 'details': error.details}
+    if error.startPosition != None:
+        # Lines and columns count from one
+        record['file'] = error.startPosition.filename
+        record['line'] = error.startPosition.line + 1
+        record['column'] = error.startPosition.column + 1
+    return record
+
+###############
+### WORKERS ###
+###############
+
+class BatchOptions:
+    def __init__(self, backend:Shork.Backend = Shork.Backend.VM,
+                 optimizationLevel:Shork.OptimizationLevel = Shork.OptimizationLevel.NONE,
+                 limits:Shork.ExecutionLimits = None) -> None:
+        self.backend = backend
+        self.optimizationLevel = optimizationLevel
+        # Applied to each program on its own
+        self.limits = limits
+
+def InitializeWorker() -> None:
+    # Imported here rather than at the top, so tools that only use the records start quickly
+    import multiprocessing
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 10000))
+    # ^C is handled by the parent, which tears the pool down
+    if multiprocessing.current_process().name != 'MainProcess':
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+def RunOne(program:BatchProgram, options:BatchOptions) -> dict:
+    record = {'index': program.index, 'name': program.name}
+    if program.error != None:
+        record['ok'] = False
+        record['error'] = program.error
+        return record
+    # Every program gets a table of its own; globals such as null are still visible through the parent
+    context = Shork.Context(program.name, symbolTable=Shork.SymbolTable(Shork.GLOBAL_SYMBOL_TABLE))
+    try:
+        parsed = Shork.Program.Parse(Shork.TableLexer.Stream(program.text, program.name), options.optimizationLevel)
+        value = Shork.RunProgram(parsed, options.backend, context=context, limits=options.limits)
+        record['ok'] = True
+        record['value'] = ValueRecord(Shork.Unbox(value))
+    except Shork.ShorkError as error:
+        record['ok'] = False
+        record['error'] = ErrorRecord(error)
+    except (RecursionError, MemoryError, ValueError, OverflowError) as error:
+        # Limits of the host rather than errors in the program
+        record['ok'] = False
+        record['error'] = {'name': type(error).__name__, 'details': str(error)}
+    return record
+
+def RunTask(task:tuple[BatchProgram, BatchOptions]) -> dict:
+    return RunOne(*task)
+
+def RunBatch(programs:Iterable[BatchProgram], options:BatchOptions = None, jobs:int = None,
+             ordered:bool = True, chunkSize:int = 1) -> Iterator[dict]:
+    # Yields one record per program, in input order unless ordered is False
+    options = options or BatchOptions()
+    jobs = jobs or os.cpu_count() or 1
+    tasks = ((program, options) for program in programs)
+
+    if jobs == 1:
+        InitializeWorker()
+        yield from map(RunTask, tasks)
+        return
+
+    import multiprocessing
+    with multiprocessing.Pool(jobs, initializer=InitializeWorker) as pool:
+        mapper = pool.imap if ordered else pool.imap_unordered
+        yield from mapper(RunTask, tasks, chunkSize)
+
+############
+### MAIN ###
+############
+
+def Main(arguments:list[str]) -> int:
+    parser = argparse.ArgumentParser(description="Runs many ShorkBasic programs across a process pool.")
+    parser.add_argument('input', help="a directory of programs, a JSONL file of programs, or - for JSONL on stdin")
+    parser.add_argument('--jobs', '-j', type=int, default=None, help="worker processes, all cores by default")
+    parser.add_argument('--unordered', action='store_true', help="write records as programs finish instead of in input order")
+    parser.add_argument('--suffix', default='.shk', help="file suffix of the programs in a directory")
+    parser.add_argument('--chunk-size', type=int, default=1, help="programs sent to a worker at a time")
+    parser.add_argument('--tree', action='store_true', help="run on the tree walker instead of the VM")
+    parser.add_argument('-O', dest='level', type=int, nargs='?', const=2, default=0, choices=[0, 1, 2], help="optimization level")
+    parser.add_argument('--max-steps', type=int, default=None, help="evaluation steps per program")
+    parser.add_argument('--timeout', type=float, default=None, help="seconds per program")
+    parser.add_argument('--max-int-bits', type=int, default=None, help="widest integer a program may compute")
+    options = parser.parse_args(arguments)
+
+    limits = None
+    if options.max_steps != None or options.timeout != None or options.max_int_bits != None:
+        limits = Shork.ExecutionLimits(options.max_steps, options.timeout, options.max_int_bits)
+    batchOptions = BatchOptions(Shork.Backend.TREE if options.tree else Shork.Backend.VM,
+                                Shork.OptimizationLevel(options.level), limits)
+
+    if options.input == '-':
+        programs = ReadJsonLines(sys.stdin)
+    elif os.path.isdir(options.input):
+        programs = ReadDirectory(options.input, options.suffix)
+    else:
+        programs = ReadJsonLines(open(options.input, encoding='utf-8'))
+
+    # Results are written in full, however many digits they have
+    sys.set_int_max_str_digits(0)
+    failed = 0
+    for record in RunBatch(programs, batchOptions, options.jobs, not options.unordered, options.chunk_size):
+        failed += not record['ok']
+        print(json.dumps(record), flush=True)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(Main(sys.argv[1:]))
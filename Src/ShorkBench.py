@@ -0,0 +1,269 @@
+###############
+### IMPORTS ###
+###############
+
+from __future__ import annotations
+import sys, os, io, json, random, argparse, platform, timeit, tracemalloc, contextlib, subprocess, resource, time
+from typing import Callable
+
+import ShorkBasic as Shork
+
+#################
+### CONSTANTS ###
+#################
+
+STAGES = [
+    'lex',
+    'table-lex',
+    'columnar-lex',
+    'parallel-lex',
+    'parse',
+    'columnar-parse',
+    'interpret',
+    'adaptive',
+    'memo',
+    'compile',
+    'vm',
+    'run',
+    'run-cached'
+]
+
+# Each sample is timed over enough loops to take at least this long
+MIN_SAMPLE_SECONDS = 0.05
+
+# What a cold start of the one-shot runner evaluates; small enough that starting up is all it measures
+STARTUP_COMMAND = [os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ShorkRun.py'), '-e', '1 + 1', '--json', '--startup-time']
+
+#################
+### WORKLOADS ###
+#################
+
+class Workload:
+    def __init__(self, name:str, text:str, variables:dict[str, int|float] = None) -> None:
+        self.name = name
+        self.text = text
+        # Defined in the symbol table before anything is evaluated
+        self.variables = variables or {}
+
+def GenerateDeepNesting(rng:random.Random, depth:int) -> Workload:
+    # Kept well inside the recursive parser's reach of Python's recursion limit
+    text = '1'
+    for _ in range(depth):
+        text = f'({rng.randint(1, 9)} {rng.choice("+-*")} {text})'
+    return Workload(f'deep-nesting-{depth}', text)
+
+def GenerateFlatSum(rng:random.Random, terms:int) -> Workload:
+    text = ' + '.join(str(rng.randint(0, 999)) for _ in range(terms))
+    return Workload(f'flat-sum-{terms}', text)
+
+def GenerateManyVariables(rng:random.Random, count:int) -> Workload:
+    variables = {f'v{index}': rng.randint(1, 99) for index in range(count)}
+    text = ' + '.join(f'v{rng.randrange(count)} * {rng.randint(1, 9)}' for _ in range(count))
+    return Workload(f'many-variables-{count}', text, variables)
+
+def GenerateBigLiterals(rng:random.Random, count:int, digits:int) -> Workload:
+    literals = [''.join(rng.choice('0123456789') for _ in range(digits)).lstrip('0') or '0' for _ in range(count)]
+    # Summed rather than multiplied, so the result stays printable
+    text = ' + '.join(literals)
+    return Workload(f'big-literals-{count}x{digits}', text)
+
+def GenerateRepeatedFormulas(rng:random.Random, count:int) -> Workload:
+    # Generated formulas that keep reusing a handful of subexpressions
+    variables = {f'v{index}': rng.randint(1, 99) for index in range(8)}
+    pool = [f'(v{rng.randrange(8)} * {rng.randint(2, 9)} + v{rng.randrange(8)}) * (v{rng.randrange(8)} - {rng.randint(1, 9)})'
+            for _ in range(10)]
+    text = ' + '.join(rng.choice(pool) for _ in range(count))
+    return Workload(f'repeated-formulas-{count}', text, variables)
+
+def GenerateWorkloads(seed:int, scale:int = 1) -> list[Workload]:
+    rng = random.Random(seed)
+    return [
+        GenerateDeepNesting(rng, 100),
+        GenerateFlatSum(rng, 2000 * scale),
+        GenerateManyVariables(rng, 500 * scale),
+        GenerateBigLiterals(rng, 50 * scale, 200),
+        GenerateRepeatedFormulas(rng, 500 * scale)
+    ]
+
+#################
+### MEASURING ###
+#################
+
+def MakeContext(workload:Workload) -> Shork.Context:
+    symbolTable = Shork.SymbolTable(Shork.GLOBAL_SYMBOL_TABLE)
+    for name, value in workload.variables.items():
+        symbolTable.Set(name, value)
+    return Shork.Context("<bench>", symbolTable=symbolTable)
+
+def StageFunction(workload:Workload, stage:str) -> Callable[[], any]:
+    # Everything a stage does not measure is prepared up front
+    text = workload.text
+    tokens = Shork.TableLexer.Lex(text, '<bench>')
+    buffer = Shork.ColumnarLexer.Lex(text, '<bench>')
+    program = Shork.Program.Parse(tokens)
+    code = program.Compile()
+    context = MakeContext(workload)
+
+    match stage:
+        case 'lex':
+            return lambda: Shork.Lexer.Lex(text, '<bench>')
+        case 'table-lex':
+            return lambda: Shork.TableLexer.Lex(text, '<bench>')
+        case 'columnar-lex':
+            return lambda: Shork.ColumnarLexer.Lex(text, '<bench>')
+        case 'parallel-lex':
+            # Sources under a chunk are lexed in this process, so small workloads measure only the splitting
+            return lambda: Shork.ParallelLexer.Buffer(text, '<bench>')
+        case 'parse':
+            return lambda: Shork.IterativeParser.Parse(tokens)
+        case 'columnar-parse':
+            return lambda: Shork.BufferParser.Parse(buffer)
+        case 'interpret':
+            return lambda: Shork.Interpreter.Interpret(program.tree, context)
+        case 'adaptive':
+            # Specializations build up on the tree over the warm-up loops, as they would on a cached program
+            stats = Shork.SpecializationStats()
+            return lambda: Shork.AdaptiveInterpreter.Interpret(program.tree, context, stats)
+        case 'memo':
+            # Sharing is done once, as Program.Share does for a cached program
+            dag = Shork.HashConser.Share(program.tree)
+            return lambda: Shork.MemoInterpreter.Interpret(dag, context)
+        case 'compile':
+            return lambda: Shork.Compiler.Compile(program.tree)
+        case 'vm':
+            return lambda: Shork.VirtualMachine.Execute(code, context)
+        case 'run' | 'run-cached':
+            for name, value in workload.variables.items():
+                Shork.GLOBAL_SYMBOL_TABLE.Set(name, value)
+            cache = Shork.ProgramCache() if stage == 'run-cached' else None
+            def Run():
+                with contextlib.redirect_stdout(io.StringIO()):
+                    Shork.Run(text, '<bench>', cache=cache)
+            return Run
+    raise ValueError(f"Unknown stage '{stage}'")
+
+def Measure(function:Callable[[], any], repeat:int) -> dict:
+    timer = timeit.Timer(function)
+    loops, _ = timer.autorange()
+    while loops > 1 and timer.timeit(loops) > MIN_SAMPLE_SECONDS * 4:
+        loops //= 2
+    samples = sorted(timer.timeit(loops) / loops for _ in range(repeat))
+
+    tracemalloc.start()
+    try:
+        _, boxedValues = Shork.CountAllocations(function)
+        peakBytes = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'seconds': samples[len(samples) // 2],
+        'best': samples[0],
+        'perSecond': 1 / samples[len(samples) // 2],
+        'peakBytes': peakBytes,
+        'boxedValues': boxedValues
+    }
+
+def RunBenchmarks(workloads:list[Workload], stages:list[str], repeat:int) -> dict[str, dict]:
+    results = {}
+    for workload in workloads:
+        for stage in stages:
+            key = f'{workload.name}/{stage}'
+            result = Measure(StageFunction(workload, stage), repeat)
+            result['bytesPerSecond'] = len(workload.text) * result['perSecond']
+            results[key] = result
+            print(f"{key:<40} {result['seconds'] * 1e3:>10.3f} ms {result['peakBytes'] / 1024:>10.1f} KiB", file=sys.stderr)
+    return results
+
+def MeasureStartup(repeat:int) -> dict:
+    # Whole processes are started, so this also counts the Python interpreter starting and the
+    # modules being loaded, which no in-process timer sees
+    command = [sys.executable] + STARTUP_COMMAND
+    samples, readySamples = [], []
+    for _ in range(repeat + 1):
+        started = time.perf_counter()
+        output = subprocess.run(command, check=True, capture_output=True).stdout
+        samples.append(time.perf_counter() - started)
+        readySamples.append(json.loads(output)['startupSeconds'])
+    # The first start may still be writing bytecode caches
+    samples, readySamples = sorted(samples[1:]), sorted(readySamples[1:])
+
+    result = {
+        'seconds': samples[len(samples) // 2],
+        'best': samples[0],
+        'perSecond': 1 / samples[len(samples) // 2],
+        # From importing the interpreter to being ready to run the program
+        'readySeconds': readySamples[len(readySamples) // 2],
+        # The largest of any process started so far, which is the runner's unless a stage started one
+        'peakBytes': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024,
+        'boxedValues': 0
+    }
+    print(f"{'startup/one-shot':<40} {result['seconds'] * 1e3:>10.3f} ms {result['peakBytes'] / 1024:>10.1f} KiB", file=sys.stderr)
+    return result
+
+#################
+### BASELINES ###
+#################
+
+def Compare(results:dict[str, dict], baseline:dict[str, dict], threshold:float) -> list[str]:
+    # Returns a line for every benchmark that slowed down by more than the threshold
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline: continue
+        ratio = result['seconds'] / baseline[key]['seconds']
+        memoryRatio = result['peakBytes'] / max(baseline[key]['peakBytes'], 1)
+        line = f"{key:<40} time x{ratio:.2f} memory x{memoryRatio:.2f}"
+        print(line, file=sys.stderr)
+        if ratio > 1 + threshold:
+            regressions.append(line)
+    return regressions
+
+############
+### MAIN ###
+############
+
+def Main(arguments:list[str]) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks the ShorkBasic lexer, parser and backends.")
+    parser.add_argument('--seed', type=int, default=1, help="seed for the workload generators")
+    parser.add_argument('--scale', type=int, default=1, help="multiplies the size of the generated workloads")
+    parser.add_argument('--repeat', type=int, default=5, help="timed samples per benchmark")
+    parser.add_argument('--stage', action='append', choices=STAGES, help="only run these stages")
+    parser.add_argument('--startup', action='store_true', help="also time cold starts of the one-shot runner")
+    parser.add_argument('--output', help="write the results as JSON to this file")
+    parser.add_argument('--baseline', help="compare against results saved with --output")
+    parser.add_argument('--threshold', type=float, default=0.10, help="allowed slowdown against the baseline, as a fraction")
+    options = parser.parse_args(arguments)
+
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 10000))
+    workloads = GenerateWorkloads(options.seed, options.scale)
+    results = RunBenchmarks(workloads, options.stage or STAGES, options.repeat)
+    if options.startup:
+        results['startup/one-shot'] = MeasureStartup(options.repeat)
+
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'machine': platform.machine(),
+            'seed': options.seed,
+            'scale': options.scale
+        },
+        'results': results
+    }
+    if options.output:
+        with open(options.output, 'w') as file:
+            json.dump(report, file, indent=2)
+
+    if options.baseline:
+        with open(options.baseline) as file:
+            baseline = json.load(file)
+        regressions = Compare(results, baseline['results'], options.threshold)
+        if regressions:
+            print(f"{len(regressions)} benchmark(s) slowed down by more than {options.threshold:.0%}:", file=sys.stderr)
+            for line in regressions:
+                print(f"  {line}", file=sys.stderr)
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(Main(sys.argv[1:]))
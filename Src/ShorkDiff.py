@@ -0,0 +1,1226 @@
+###############
+### IMPORTS ###
+###############
+
+from __future__ import annotations
+import sys, io, os, json, random, asyncio, argparse, tempfile, threading, graphlib, subprocess
+from typing import Callable
+from concurrent.futures import Executor, ProcessPoolExecutor
+
+import ShorkBasic as Shork
+
+#################
+### CONSTANTS ###
+#################
+
+# Defined in every symbol table a generated program runs against
+VARIABLES = {'null': 0, 'a': 3, 'b': 0.5}
+
+# Generated expressions stay well inside the recursive reference's reach of Python's recursion limit
+MAX_DEPTH = 6
+
+ATOMS = ['0', '1', '7', '2.5', '0.0', '3.', 'a', 'b', 'null', 'missing']
+
+# Variables, and programs run against them, where x+0 gives 0.0 but x alone would give -0.0
+SIGNED_ZERO = {**VARIABLES, 'b': -0.0}
+SIGNED_ZERO_PROGRAMS = ['b + 0', '0 + b', 'b - 0', 'b * 1', '1 * b', 'b ^ 1', '+b', '--b', 'a * (b + 0)']
+
+# Fragments of source, valid or not, for the lexers
+PIECES = ['1', '2.5', '3.', '12345678901234567890', 'x', 'y_1', 'VAR', 'var', '+', '-', '*', '/', '^',
+          '(', ')', '=', ';', ' ', '  ', '\t', '\n', '\r\n', '(x + 1)']
+ILLEGAL = ['$', '.', 'é', '\x0b']
+
+# Entries the cache under test holds, well below the programs loaded through it
+CACHE_ENTRIES = 4
+
+# Rows in each batch and the values their columns take
+BATCH_ROWS = 20
+BATCH_COLUMNS = {'a': [-3, -2, -1, 0, 1, 2, 3], 'b': [0.5, -1.5, 0.0, 2.0]}
+
+# Globals a program run by the batch runner sees; anything else has to be assigned first
+RUNNER_VARIABLES = {'null': 0}
+
+# Sessions served at once by the server suite, each sending its share of the programs
+SERVER_SESSIONS = 3
+
+# Definitions in each prelude of the one-shot suite
+PRELUDE_NAMES = ['p', 'q', 'r']
+
+# Far past Python's recursion limit, which the recursive Parser and Interpreter are bound by
+DEEP_NESTING = 20001
+
+# Chunk sizes the parallel lexer splits generated sources into, and cases of the lexers suite that
+# also go through a real process pool
+PARALLEL_CHUNKS = [1, 8]
+PARALLEL_POOL_CASES = 20
+
+# Edits each incrementally analysed document takes
+EDITS = 20
+# Parenthesized groups in the document that one edit must leave alone
+GROUPS = 50
+
+# Statements in each file run by the statements suite, and statements that cannot parse or lex
+STATEMENTS = 10
+BAD_STATEMENTS = ['1 +', ')', '(1', 'VAR = 2', '1 + $', 'é']
+
+# Runs of each program in the adaptive suite, the values its variables take from run to run, and
+# thresholds low enough that its operators specialize, miss and give up within those runs
+ADAPTIVE_RUNS = 12
+ADAPTIVE_VALUES = {'a': [3, 3, 3, 2.5, -1], 'b': [0.5, 0.5, 2, 0.0]}
+ADAPTIVE_THRESHOLDS = {'warmup': 2, 'missLimit': 2, 'backoff': 3}
+
+# Widest integer the limits suite allows, and terms long enough for a zero timeout to be noticed
+LIMIT_BITS = 256
+LIMIT_TERMS = 2000
+
+# Threads evaluating against one shared symbol table at once, and new names each of them resolves
+SHARED_THREADS = 4
+SHARED_NAMES = 200
+
+# Inputs and formulas of each table in the reactive suite, and the changes made to it
+REACTIVE_INPUTS = 4
+REACTIVE_FORMULAS = 8
+REACTIVE_CHANGES = 20
+
+# Subexpressions each program of the memo suite is built from, and how many of them it uses
+MEMO_POOL = 4
+MEMO_TERMS = 12
+
+# Mismatches printed before the rest are only counted
+MAX_REPORTED = 10
+
+##################
+### GENERATORS ###
+##################
+
+def GenerateExpression(rng:random.Random, depth:int = 0) -> str:
+    choice = rng.random()
+    if depth >= MAX_DEPTH or choice < 0.3:
+        return rng.choice(ATOMS)
+    if choice < 0.45:
+        return rng.choice('+-') + GenerateExpression(rng, depth + 1)
+    if choice < 0.55:
+        return f'({GenerateExpression(rng, depth + 1)})'
+    if choice < 0.6:
+        return f'VAR {rng.choice("ab")} = {GenerateExpression(rng, depth + 1)}'
+    return f'{GenerateExpression(rng, depth + 1)} {rng.choice("+-*/^")} {GenerateExpression(rng, depth + 1)}'
+
+def GenerateSource(rng:random.Random, pieces:int) -> str:
+    parts = [rng.choice(PIECES) for _ in range(rng.randint(0, pieces))]
+    for _ in range(rng.choice([0, 0, 1, 2])):
+        parts.insert(rng.randint(0, len(parts)), rng.choice(ILLEGAL))
+    return ''.join(parts)
+
+################
+### OUTCOMES ###
+################
+
+def ErrorOutcome(error:Shork.ShorkError) -> tuple:
+    start, end = error.startPosition, error.endPosition
+    return ('error', error.errorName, error.details, start.index, start.line, start.column, end.index)
+
+def Outcome(function:Callable[[], any], describe:Callable[[any], any] = None) -> tuple:
+    # Anything but a ShorkError escaping is a mismatch unless the reference fails the same way
+    try:
+        result = function()
+        return ('ok', describe(result) if describe != None else result)
+    except Shork.ShorkError as error:
+        return ErrorOutcome(error)
+    except Exception as error:
+        return ('crash', type(error).__name__, str(error))
+
+def DescribeTokens(tokens) -> list[tuple]:
+    return [(token.tokenType, type(token.value), token.value,
+             token.startPosition.index, token.startPosition.line, token.startPosition.column,
+             token.endPosition.index, token.endPosition.line, token.endPosition.column,
+             token.startPosition.filename) for token in tokens]
+
+def Raw(value) -> any:
+    # Values are boxed in an Object by some backends and raw numbers in others
+    return getattr(value, 'value', value)
+
+def MakeContext(variables:dict = VARIABLES) -> Shork.Context:
+    symbolTable = Shork.SymbolTable()
+    for name, value in variables.items():
+        symbolTable.Set(name, value)
+    return Shork.Context("<diff>", symbolTable=symbolTable)
+
+def DescribeRun(run:Callable[[Shork.Context], any], variables:dict = VARIABLES) -> Callable[[], tuple]:
+    # A run is described by its raw result and the variables it leaves behind
+    def function():
+        context = MakeContext(variables)
+        value = Raw(run(context))
+        left = {name: Raw(value) for name, value in context.symbolTable.symbols.items()}
+        return (type(value), repr(value), left)
+    return function
+
+def DescribeClosure(text:str, generateSource:bool, variables:dict = VARIABLES) -> Callable[[], tuple]:
+    # Closures take and update a plain mapping of raw numbers
+    def function():
+        values = dict(variables)
+        value = Shork.ClosureCompiler.Compile(Parse(text), generateSource, Shork.Context("<diff>"))(values)
+        return (type(value), repr(value), values)
+    return function
+
+def ParseReference(text:str) -> Shork.NodeBase:
+    return Shork.Parser.Parse(Shork.Lexer.Lex(text, "<diff>"))
+
+def Parse(text:str) -> Shork.NodeBase:
+    # The way Run parses
+    return Shork.Parser.Parse(Shork.TableLexer.Stream(text, "<diff>"))
+
+def Execute(program:Shork.Program, context:Shork.Context) -> Shork.Object:
+    return Shork.VirtualMachine.Execute(program.Compile(), context)
+
+def RunMemo(program:Shork.Program, context:Shork.Context) -> Shork.Object:
+    return Shork.MemoInterpreter.Interpret(program.Share(), context, tree=program.tree)
+
+################
+### BACKENDS ###
+################
+
+def ProgramRuns(text:str, variables:dict = VARIABLES) -> dict[str, Callable[[], tuple]]:
+    # The tree walker and the VM at every optimization level, on programs from Program.Parse
+    runs = {}
+    for level in Shork.OptimizationLevel:
+        parse = lambda level=level: Shork.Program.Parse(Shork.TableLexer.Stream(text, "<diff>"), level)
+        runs[f'tree-O{level.value}'] = DescribeRun(lambda context, parse=parse: Shork.IterativeInterpreter.Interpret(parse().tree, context), variables)
+        runs[f'vm-O{level.value}'] = DescribeRun(lambda context, parse=parse: Execute(parse(), context), variables)
+        runs[f'memo-O{level.value}'] = DescribeRun(lambda context, parse=parse: RunMemo(parse(), context), variables)
+    return runs
+
+def BackendRuns(text:str, variables:dict = VARIABLES) -> dict[str, Callable[[], tuple]]:
+    # Every backend at every optimization level, checked against the recursive Interpreter on
+    # the unoptimized tree from the original Lexer and Parser
+    runs = {'reference': DescribeRun(lambda context: Shork.Interpreter.Interpret(ParseReference(text), context), variables)}
+    runs.update(ProgramRuns(text, variables))
+    # Without the resolver the compiler emits name lookups instead of slots
+    runs['vm-unresolved'] = DescribeRun(lambda context: Shork.VirtualMachine.Execute(Shork.Compiler.Compile(Parse(text)), context), variables)
+    runs['closure'] = DescribeClosure(text, False, variables)
+    runs['closure-source'] = DescribeClosure(text, True, variables)
+    # Trees parsed from a TokenBuffer hold TokenViews in place of Tokens
+    runs['vm-columnar'] = DescribeRun(lambda context: Execute(Shork.Program.Parse(Shork.ColumnarLexer.Lex(text, "<diff>")), context), variables)
+    return runs
+
+def CheckBackends(rng:random.Random, options:argparse.Namespace, report:Callable[..., None]) -> None:
+    # The generated programs, then the identities the optimizer must keep or drop with b = -0.0,
+    # which equals 0.0 but prints differently
+    cases = [(GenerateExpression(rng), VARIABLES) for _ in range(options.cases)]
+    cases += [(text, SIGNED_ZERO) for text in SIGNED_ZERO_PROGRAMS]
+    for text, variables in cases:
+        outcomes = {name: Outcome(run) for name, run in BackendRuns(text, variables).items()}
+        expected = outcomes.pop('reference')
+        for name, outcome in outcomes.items():
+            if outcome != expected:
+                report(name, text, expected, outcome)
+        
+        # A program counts the nodes its optimizer took out
+        try:
+            tree = Parse(text)
+        except Shork.ShorkError:
+            continue
+        before = sum(1 for _ in Shork.PostOrder(tree))
+        for level in Shork.OptimizationLevel:
+            program = Shork.Program.FromTree(tree, level)
+            removed = before - sum(1 for _ in Shork.PostOrder(program.tree))
+            if program.removedNodes != removed:
+                report(f'removed-O{level.value}', text, removed, program.removedNodes)
+
+##############
+### LEXERS ###
+##############
+
+def LexerRuns(text:str, executor:Executor = None) -> dict[str, Callable[[], list]]:
+    # Every lexer, checked against the original Lexer
+    runs = {
+        'reference': lambda: Shork.Lexer.Lex(text, "<diff>"),
+        'table': lambda: Shork.TableLexer.Lex(text, "<diff>"),
+        'table-stream': lambda: list(Shork.TableLexer.Stream(text, "<diff>")),
+        # Numbers and identifiers that touch the end of a chunk are carried into the next
+        'stream-1': lambda: Shork.StreamLexer.Lex(io.StringIO(text), "<diff>", 1),
+        'stream-2': lambda: Shork.StreamLexer.Lex(io.StringIO(text), "<diff>", 2),
+        'stream-7': lambda: Shork.StreamLexer.Lex(io.StringIO(text), "<diff>", 7),
+        'columnar': lambda: list(Shork.ColumnarLexer.Lex(text, "<diff>"))
+    }
+    for chunkSize in PARALLEL_CHUNKS:
+        # Chunks are lexed in this process, but split and stitched as the pool's would be
+        runs[f'parallel-{chunkSize}'] = lambda chunkSize=chunkSize: Shork.ParallelLexer.Lex(text, "<diff>", 1, chunkSize)
+    if executor != None:
+        runs['parallel-pool'] = lambda: Shork.ParallelLexer.Lex(text, "<diff>", 2, PARALLEL_CHUNKS[-1], executor)
+    if text.isascii():
+        # Byte offsets only match character offsets up to the first character outside ASCII
+        runs['mapped'] = lambda: list(Shork.MappedLexer.Stream(text.encode('ascii'), "<diff>"))
+    return runs
+
+def CheckLexers(rng:random.Random, options:argparse.Namespace, report:Callable[..., None]) -> None:
+    with ProcessPoolExecutor(2) as executor:
+        for case in range(options.cases):
+            text = GenerateSource(rng, 60)
+            runs = LexerRuns(text, executor if case < PARALLEL_POOL_CASES else None)
+            outcomes = {name: Outcome(lexer, DescribeTokens) for name, lexer in runs.items()}
+            expected = outcomes.pop('reference')
+            for name, outcome in outcomes.items():
+                if outcome != expected:
+                    report(name, text, expected, outcome)
+
+###############
+### PARSERS ###
+###############
+
+def DescribeTree(tree:Shork.NodeBase) -> list[tuple]:
+    # Every node with its token and span, children first
+    describe = []
+    for node in Shork.PostOrder(tree):
+        token = getattr(node, 'numberToken', None) or getattr(node, 'opToken', None) or getattr(node, 'varNameToken', None)
+        describe.append((type(node).__name__, repr(token), node.startPosition.index, node.endPosition.index))
+    return describe
+
+def CheckParsers(rng:random.Random, options:argparse.Namespace, report:Callable[..., None]) -> None:
+    # The iterative Parser must build the recursive Parser's trees and raise its errors, on valid
+    # programs and on arbitrary token soup
+    for case in range(options.cases):
+        text = GenerateExpression(rng) if case % 2 else GenerateSource(rng, 20)
+        expected = Outcome(lambda: Shork.Parser.Parse(Shork.Lexer.Lex(text, "<diff>")), DescribeTree)
+        outcome = Outcome(lambda: Shork.IterativeParser.Parse(Shork.Lexer.Lex(text, "<diff>")), DescribeTree)
+        if outcome != expected:
+            report('iterative-parser', text, expected, outcome)
+        outcome = Outcome(lambda: Shork.BufferParser.Parse(Shork.ColumnarLexer.Lex(text, "<diff>")), DescribeTree)
+        if outcome != expected:
+            report('buffer-parser', text, expected, outcome)
+
+############
+### DEEP ###
+############
+
+def DeepPrograms(depth:int) -> list[tuple[str, tuple]]:
+    # Programs nested far deeper than any recursive walk could follow, with the outcome each must have
+    variables = {name: Raw(value) for name, value in MakeContext().symbolTable.symbols.items()}
+    missing = '(' * depth + 'missing' + ')' * depth
+    return [
+        ('-' * depth + '1', ('ok', (int, repr(-1 if depth % 2 else 1), variables))),
+        ('(' * depth + '7' + ')' * depth, ('ok', (int, '7', variables))),
+        ('1' + ' + 1' * depth, ('ok', (int, repr(depth + 1), variables))),
+        ('1 ^ ' * depth + '2', ('ok', (int, '1', variables))),
+        ('VAR a = ' * depth + '2', ('ok', (int, '2', {**variables, 'a': 2}))),
+        (missing, ('error', 'Runtime Error', "'missing' is not defined", depth, 0, depth, depth + len('missing')))
+    ]
+
+def CheckDeep(rng:random.Random, options:argparse.Namespace, report:Callable[..., None]) -> None:
+    for text, expected in DeepPrograms(DEEP_NESTING):
+        for name, run in ProgramRuns(text).items():
+            outcome = Outcome(run)
+            if outcome != expected:
+                report(f'deep-{name}', text[:40] + '...', expected, outcome[:3])
+
+###################
+### INCREMENTAL ###
+###################
+
+def FullParse(text:str) -> Shork.NodeBase:
+    return Shork.IterativeParser.Parse(Shork.TableLexer.Lex(text, "<diff>"))
+
+def DescribeDocument(document:Shork.IncrementalDocument) -> Callable[[Shork.NodeBase], tuple]:
+    # The tree along with the tokens it was parsed from, whose positions are replayed from the edit log
+    return lambda tree: (DescribeTree(tree), DescribeTokens(document.tokens))
+
+def CheckIncremental(rng:random.Random, options:argparse.Namespace, report:Callable[..., None]) -> None:
+    # Each document takes a run of random edits, and after each its tokens and tree have to match
+    # a full lex and parse of the new text
+    def Expected(text:str) -> tuple:
+        return Outcome(lambda: FullParse(text), lambda tree: (DescribeTree(tree), DescribeTokens(Shork.TableLexer.Lex(text, "<diff>"))))
+
+    for _ in range(options.cases):
+        text = GenerateExpression(rng)
+        document = Shork.IncrementalDocument(text, "<diff>")
+        outcome, expected = Outcome(document.Analyze, DescribeDocument(document)), Expected(text)
+        if outcome != expected:
+            report('incremental-analyze', text, expected, outcome)
+        for _ in range(EDITS):
+            offset = rng.randint(0, len(text))
+            removedLength = rng.randint(0, min(3, len(text) - offset))
+            insertedText = rng.choice(PIECES) if rng.random() < 0.8 else ''
+            text = text[:offset] + insertedText + text[offset + removedLength:]
+            outcome = Outcome(lambda: document.Edit(offset, removedLength, insertedText), DescribeDocument(document))
+            expected = Expected(text)
+            if outcome != expected or document.text != text:
+                report('incremental-edit', text, expected, outcome)
+
+    # Changing one term of a long sum, grouped or not, lexes and parses only that term
+    for text in (' + '.join(f'({group} * a)' for group in range(GROUPS)), ' + '.join(map(str, range(GROUPS)))):
+        document = Shork.IncrementalDocument(text, "<diff>")
+        document.Analyze()
+        offset = text.index(f'{GROUPS // 2} ')
+        tree = document.Edit(offset, len(str(GROUPS // 2)), '7')
+        if (document.relexedTokens, document.reparsedTokens) != (1, 1) or DescribeTree(tree) != Expected(document.text)[1][0]:
+            report('incremental-reuse', document.text, (1, 1), (document.relexedTokens, document.reparsedTokens))
+    # Changing the last operator parses the whole sum again, but none of its groups
+    text = ' + '.join(f'({group} * a)' for group in range(GROUPS))
+    document = Shork.IncrementalDocument(text, "<diff>")
+    document.Analyze()
+    tree = document.Edit(text.rindex('+'), 1, '-')
+    if document.reusedGroups != GROUPS or DescribeTree(tree) != Expected(document.text)[1][0]:
+        report('incremental-reuse', document.text, GROUPS, document.reusedGroups)
+
+##################
+### STATEMENTS ###
+##################
+
+def GenerateStatements(rng:random.Random, context:Shork.Context, filename:str) -> tuple[str, list[str]]:
+    # A file of ';' separated statements split across lines, and what running each statement of it
+    # prints. Each statement is run on its own with everything before it blanked out, so the
+    # reference reports the same lines as a run of the whole file.
+    text, printed = '', []
+    for _ in range(STATEMENTS):
+        if rng.random() < 0.2:
+            statement = rng.choice(BAD_STATEMENTS)
+        else:
+            statement = ''.join(rng.choice(' \n') if char == ' ' and rng.random() < 0.2 else char for char in GenerateExpression(rng))
+        padded = ''.join(char if char in '\r\n' else ' ' for char in text) + statement
+        symbols = dict(context.symbolTable.symbols)
+        try:
+            printed.append(str(Shork.Interpreter.Interpret(Shork.Parser.Parse(Shork.Lexer.Lex(padded, filename)), context)))
+        except Shork.ShorkError as error:
+            # A file is lexed from its mapping, whose positions carry no text, so its errors are
+            # printed without the excerpt the reference shows of its blanked-out copy
+            printed.append(str(error).split('\n\n')[0])
+        except Exception:
+            # Python errors escape a run of the file, so the statement is left out, along with
+            # anything it assigned before failing
+            for name in context.symbolTable.symbols.keys() - symbols.keys():
+                context.symbolTable.Remove(name)
+            for name, value in symbols.items():
+                context.symbolTable.Set(name, value)
+            continue
+        text += statement + ';' + rng.choice(['', ' ', '\n', '\r\n', ';\n'])
+    return text, printed
+
+def CheckStatements(rng:random.Random, options:argparse.Namespace, report:Callable[..., None]) -> None:
+    # A file runs one statement at a time on every backend and level and prints what each
+    # statement would print on its own; an error only abandons its own statement
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'statements.shk')
+        for _ in range(max(1, options.cases // STATEMENTS)):
+            reference = MakeContext(RUNNER_VARIABLES)
+            text, printed = GenerateStatements(rng, reference, path)
+            expected = (''.join(line + '\n' for line in printed), sum(line.startswith(('Invalid', 'Illegal', 'Traceback')) for line in printed),
+                        {name: Raw(value) for name, value in reference.symbolTable.symbols.items()})
+            with open(path, 'wb') as file:
+                file.write(text.encode('utf-8'))
+            for backend in Shork.Backend:
+                for level in Shork.OptimizationLevel:
+                    context = MakeContext(RUNNER_VARIABLES)
+                    output = io.StringIO()
+                    stdout, sys.stdout = sys.stdout, output
+                    try:
+                        failures = Shork.RunFile(path, backend, level, context=context)
+                    finally:
+                        sys.stdout = stdout
+                    outcome = (output.getvalue(), failures, {name: Raw(value) for name, value in context.symbolTable.symbols.items()})
+                    if outcome != expected:
+                        report(f'statements-{backend.name.lower()}-O{level.value}', text, expected, outcome)
+        
+        # A byte that cannot start a UTF-8 character is skipped alone, keeping the newline after it
+        with open(path, 'wb') as file:
+            file.write(b'1+\xe9;\n2;\n3+$;\n')
+        expected = (f"Illegal Character: '\ufffd'\nFile: {path}, Line 1, Column 3\n2\n"
+                    f"Illegal Character: '$'\nFile: {path}, Line 3, Column 3\n", 2)
+        for backend in Shork.Backend:
+            for level in Shork.OptimizationLevel:
+                output = io.StringIO()
+                stdout, sys.stdout = sys.stdout, output
+                try:
+                    failures = Shork.RunFile(path, backend, level, context=MakeContext(RUNNER_VARIABLES))
+                finally:
+                    sys.stdout = stdout
+                if (output.getvalue(), failures) != expected:
+                    report(f'statements-latin1-{backend.name.lower()}-O{level.value}', '1+\xe9;\n2;\n3+$;\n', expected, (output.getvalue(), failures))
+
+#############
+### CACHE ###
+#############
+
+def CheckCache(rng:random.Random, options:argparse.Namespace, report:Callable[..., None]) -> None:
+    # A pool of programs is loaded in random order through a cache too small to hold them, so
+    # entries are evicted and loaded again. A second cache then finds each one on disk.
+    pool = [GenerateExpression(rng) for _ in range(CACHE_ENTRIES * 3)]
+    with tempfile.TemporaryDirectory() as directory:
+        cache = Shork.ProgramCache(CACHE_ENTRIES, directory)
+        # Programs that failed to parse are never stored
+        stored, failed = set(), 0
+        for _ in range(options.cases):
+            text = rng.choice(pool)
+            level = rng.choice(list(Shork.OptimizationLevel))
+            expected = Outcome(DescribeRun(lambda context: Execute(Shork.Program.Parse(Shork.TableLexer.Stream(text, "<diff>"), level), context)))
+            outcome = Outcome(DescribeRun(lambda context: Execute(cache.Load(text, "<diff>", level), context)))
+            if outcome != expected:
+                report(f'cache-O{level.value}', text, expected, outcome)
+            if expected[:2] == ('error', 'Invalid Syntax'):
+                failed += 1
+            else:
+                stored.add((text, level))
+        
+        # Each miss reads the program from disk, or parses and writes it, or fails to parse
+        stats = cache.Stats()
+        if stats['entries'] > CACHE_ENTRIES or stats['hits'] + stats['misses'] != options.cases or \
+           stats['diskWrites'] != len(stored) or stats['diskHits'] + stats['diskWrites'] + failed != stats['misses']:
+            report('cache-stats', f'{options.cases} loads of {len(stored)} programs', None, stats)
+        
+        reloaded = Shork.ProgramCache(CACHE_ENTRIES, directory)
+        for text, level in stored:
+            expected = Outcome(DescribeRun(lambda context: Execute(Shork.Program.Parse(Shork.TableLexer.Stream(text, "<diff>"), level), context)))
+            outcome = Outcome(DescribeRun(lambda context: Execute(reloaded.Load(text, "<diff>", level), context)))
+            if outcome != expected:
+                report(f'disk-cache-O{level.value}', text, expected, outcome)
+        if reloaded.Stats()['diskHits'] != len(stored):
+            report('disk-cache-stats', f'{len(stored)} programs', None, reloaded.Stats())
+
+    # Threads loading through one cache get the programs a lone caller would, with every load
+    # counted once, even when an entry one thread found is evicted by another. Loads mostly hit a
+    # cache one entry too small, and threads are switched far more often than usual, so that they
+    # meet inside Load.
+    cache = Shork.ProgramCache(CACHE_ENTRIES)
+    texts = [rng.choice(pool[:CACHE_ENTRIES + 1]) for _ in range(options.cases)]
+    loads = []
+    def Work(index:int) -> None:
+        for text in texts[index::SHARED_THREADS]:
+            loads.append((text, Outcome(lambda: cache.Load(text, "<diff>"))))
+    threads = [threading.Thread(target=Work, args=(index,)) for index in range(SHARED_THREADS)]
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        for thread in threads: thread.start()
+        for thread in threads: thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+
+    for text, loaded in loads:
+        expected = Outcome(DescribeRun(lambda context: Execute(Shork.Program.Parse(Shork.TableLexer.Stream(text, "<diff>")), context)))
+        outcome = Outcome(DescribeRun(lambda context: Execute(loaded[1], context))) if loaded[0] == 'ok' else loaded
+        if outcome != expected:
+            report('threaded-cache', text, expected, outcome)
+    stats = cache.Stats()
+    if stats['entries'] > CACHE_ENTRIES or stats['hits'] + stats['misses'] != len(texts):
+        report('threaded-cache-stats', f'{len(texts)} loads from {SHARED_THREADS} threads', None, stats)
+
+#############
+### BATCH ###
+#############
+
+def SameRow(expected:tuple, outcome:tuple) -> bool:
+    if outcome[:3] == ('error', 'Runtime Error', 'Result is not a real number'):
+        # Rows that turn complex are reported as failed, where the tree walker carries on
+        return expected[0] != 'ok' or isinstance(expected[1], complex)
+    if expected[0] == 'ok' and outcome[0] == 'ok':
+        # Only floats are compared loosely; an int row has to stay an exact int
+        return type(expected[1]) is type(outcome[1]) and \
+               (expected[1] == outcome[1] or abs(expected[1] - outcome[1]) <= 1e-9 * abs(expected[1]) or
+                expected[1] != expected[1] and outcome[1] != outcome[1])
+    return expected[:3] == outcome[:3] and expected[3] == outcome[3]
+
+def CheckBatch(rng:random.Random, options:argparse.Namespace, report:Callable[..., None]) -> None:
+    # Each row of a batch has to match the tree walker run on that row's values alone
+    try:
+        import numpy
+    except ImportError:
+        print("batch: skipped, NumPy is not installed", file=sys.stderr)
+        return
+    
+    cases = [(GenerateExpression(rng), [{name: rng.choice(values) for name, values in BATCH_COLUMNS.items()} for _ in range(BATCH_ROWS)])
+             for _ in range(options.cases)]
+    # A negative exponent in one row leaves the others exact
+    cases.append(('a ^ b', [{'a': 3, 'b': 35}, {'a': 3, 'b': -1}]))
+    cases.append(('(a ^ b) * a + 1', [{'a': 3, 'b': 35}, {'a': 2, 'b': -2}, {'a': 0, 'b': -1}]))
+    for text, rows in cases:
+        columns = {name: numpy.array([row[name] for row in rows]) for name in rows[0]}
+        try:
+            tree = Parse(text)
+        except Shork.ShorkError:
+            continue
+        context = MakeContext({name: value for name, value in VARIABLES.items() if name not in columns})
+        try:
+            result = Shork.BatchEvaluator.Evaluate(tree, columns, context)
+        except Shork.ShorkError as error:
+            # Raised for the whole batch, which only an undefined variable does
+            result = ErrorOutcome(error)
+        
+        for index, row in enumerate(rows):
+            expected = Outcome(lambda: Shork.Interpreter.Interpret(ParseReference(text), MakeContext(VARIABLES | row)), Raw)
+            if isinstance(result, tuple):
+                outcome = result
+                same = expected[0] != 'ok'
+            else:
+                outcome = ErrorOutcome(result.errors[index]) if index in result.errors else ('ok', result.values.tolist()[index])
+                same = SameRow(expected, outcome)
+            if not same:
+                report(f'batch-row-{index}', f'{text} with {row}', expected, outcome)
+
+###################
+### ALLOCATIONS ###
+###################
+
+def CheckAllocations(rng:random.Random, options:argparse.Namespace, report:Callable[..., None]) -> None:
+    # Both backends compute on raw numbers and box only the value they return
+    for _ in range(options.cases):
+        text = GenerateExpression(rng)
+        try:
+            program = Shork.Program.Parse(Shork.TableLexer.Stream(text, "<diff>"))
+        except Shork.ShorkError:
+            continue
+        runs = {
+            'tree-allocations': lambda: Shork.Interpreter.Interpret(program.tree, MakeContext()),
+            'vm-allocations': lambda: Execute(program, MakeContext())
+        }
+        for name, run in runs.items():
+            try:
+                _, allocations = Shork.CountAllocations(run)
+            except Exception:
+                # Failures are compared by the 'backends' suite
+                continue
+            if allocations > 1:
+                report(name, text, 1, allocations)
+
+################
+### ADAPTIVE ###
+################
+
+def CheckAdaptive(rng:random.Random, options:argparse.Namespace, report:Callable[..., None]) -> None:
+    # One program runs again and again while its variables change type, so its operators specialize,
+    # miss and fall back; every run has to give what the reference gives on those variables
+    for _ in range(options.cases):
+        text = GenerateExpression(rng)
+        level = rng.choice(list(Shork.OptimizationLevel))
+        try:
+            program = Shork.Program.Parse(Shork.TableLexer.Stream(text, "<diff>"), level)
+        except Shork.ShorkError:
+            continue
+        stats = Shork.SpecializationStats()
+        for _ in range(ADAPTIVE_RUNS):
+            variables = VARIABLES | {name: rng.choice(values) for name, values in ADAPTIVE_VALUES.items()}
+            expected = Outcome(lambda: Shork.Interpreter.Interpret(ParseReference(text), MakeContext(variables)), Raw)
+            interpreter = Shork.AdaptiveInterpreter(stats, **ADAPTIVE_THRESHOLDS)
+            outcome = Outcome(lambda: interpreter.Evaluate(program.tree, MakeContext(variables)).value, Raw)
+            name = f'adaptive-O{level.value}'
+            if outcome != expected:
+                report(name, f'{text} with {variables}', expected, outcome)
+
+    # Every operator of a formula whose operands keep their types ends up specialized, whether the
+    # variables are in the table itself or inherited, as RunProgram's overlays inherit the globals
+    before = Shork.GLOBAL_SYMBOL_TABLE.snapshot
+    try:
+        for name, value in VARIABLES.items():
+            Shork.GLOBAL_SYMBOL_TABLE.Set(name, value)
+        for tables, makeContext in (('flat', MakeContext), ('overlay', lambda: Shork.Context("<diff>", symbolTable=Shork.GLOBAL_SYMBOL_TABLE.Overlay()))):
+            for text in ('a * 2 + a * a - (a - 1) * a', 'b * 0.5 - (b + 0.5) * b'):
+                program = Shork.Program.Parse(Shork.TableLexer.Stream(text, "<diff>"))
+                stats = Shork.SpecializationStats()
+                for _ in range(ADAPTIVE_RUNS):
+                    Shork.AdaptiveInterpreter(stats, **ADAPTIVE_THRESHOLDS).Evaluate(program.tree, makeContext())
+                coverage = Shork.SpecializationCoverage(program.tree)
+                if 'GENERIC' in coverage or stats.Stats()['misses'] or not stats.Stats()['hits']:
+                    report(f'adaptive-coverage-{tables}', text, 'every operator specialized', (coverage, stats.Stats()))
+    finally:
+        Shork.GLOBAL_SYMBOL_TABLE.snapshot = before
+
+############
+### MEMO ###
+############
+
+def GenerateRedundant(rng:random.Random) -> str:
+    # A few subexpressions used over and over, with assignments in between that change what some
+    # of them read
+    pool = [GenerateFormula(rng, ['a', 'b', 'null']) for _ in range(MEMO_POOL)]
+    terms = []
+    for _ in range(MEMO_TERMS):
+        term = f'({rng.choice(pool)})'
+        if rng.random() < 0.2:
+            term = f'(VAR {rng.choice("ab")} = {term})'
+        terms.append(term)
+    return ' + '.join(terms)
+
+def CheckMemo(rng:random.Random, options:argparse.Namespace, report:Callable[..., None]) -> None:
+    # The memo walker on a shared DAG gives the recursive Interpreter's results and errors, however
+    # much the assignments in between invalidate
+    shared = hits = 0
+    for _ in range(options.cases):
+        text = GenerateRedundant(rng)
+        try:
+            program = Shork.Program.Parse(Shork.TableLexer.Stream(text, "<diff>"))
+        except Shork.ShorkError:
+            continue
+        expected = Outcome(DescribeRun(lambda context: Shork.Interpreter.Interpret(ParseReference(text), context)))
+        outcome = Outcome(DescribeRun(lambda context: RunMemo(program, context)))
+        if outcome != expected:
+            report('memo', text, expected, outcome)
+        # Without the tree to fall back on, only the span of an error may differ
+        conser = Shork.HashConser()
+        dag = conser.DoShare(program.tree)
+        interpreter = Shork.MemoInterpreter()
+        outcome = Outcome(DescribeRun(lambda context: Shork.Box(interpreter.Evaluate(dag, context).value)))
+        same = outcome[:3] == expected[:3] if outcome[0] == 'error' else outcome == expected
+        if not same:
+            report('memo-dag', text, expected, outcome)
+        shared += conser.sharedNodes
+        hits += interpreter.hits
+    # Programs this redundant always have something to share and to reuse
+    if options.cases and not (shared and hits):
+        report('memo-reuse', f'{options.cases} programs', 'nodes shared and results reused', (shared, hits))
+    
+    # A subexpression that is both operands of one node is worked out once
+    text = '(a*b+1) * (a*b+1)'
+    dag = Shork.HashConser().DoShare(Shork.Program.Parse(Shork.TableLexer.Stream(text, "<diff>")).tree)
+    interpreter = Shork.MemoInterpreter()
+    expected = Outcome(DescribeRun(lambda context: Shork.Interpreter.Interpret(ParseReference(text), context)))
+    outcome = Outcome(DescribeRun(lambda context: Shork.Box(interpreter.Evaluate(dag, context).value)))
+    if outcome != expected or interpreter.hits != 1:
+        report('memo-square', text, (expected, 1), (outcome, interpreter.hits))
+
+##############
+### LIMITS ###
+##############
+
+def GenerateWide(rng:random.Random, depth:int = 0) -> str:
+    # Integer arithmetic whose results reach a few thousand bits at most, so the reference can
+    # still compute what a limited run refuses
+    if depth >= 3 or rng.random() < 0.3:
+        return str(rng.randint(0, 99))
+    if rng.random() < 0.4:
+        return f'({GenerateWide(rng, depth + 1)}) ^ {rng.randint(0, 40)}'
+    return f'({GenerateWide(rng, depth + 1)}) {rng.choice("+-*")} ({GenerateWide(rng, depth + 1)})'
+
+class WidthHook(Shork.InterpreterHook):
+    # Records the widest integer any operator produced
+    def __init__(self) -> None:
+        self.widest = 0
+
+    def Exit(self, node:Shork.NodeBase, context:Shork.Context, value:any, error:BaseException) -> None:
+        if isinstance(node, Shork.BinOpNode) and type(value) is int:
+            self.widest = max(self.widest, value.bit_length())
+
+def RunLimited(text:str, backend:Shork.Backend, limits:Shork.ExecutionLimits) -> Callable[[], tuple]:
+    def function():
+        program = Shork.Program.Parse(Shork.TableLexer.Stream(text, "<diff>"))
+        return Shork.RunProgram(program, backend, context=MakeContext(), limits=limits)
+    return function
+
+def CheckLimits(rng:random.Random, options:argparse.Namespace, report:Callable[..., None]) -> None:
+    # A limited run gives what an unlimited run gives, unless it needs more than it was allowed, in
+    # which case it stops with a Limit Exceeded error
+    for _ in range(options.cases):
+        text = GenerateExpression(rng)
+        try:
+            program = Shork.Program.Parse(Shork.TableLexer.Stream(text, "<diff>"))
+        except Shork.ShorkError:
+            continue
+        # A step is a node on the tree walkers and an instruction on the VM
+        needed = {
+            Shork.Backend.TREE: sum(1 for _ in Shork.PostOrder(program.tree)),
+            Shork.Backend.ADAPTIVE: sum(1 for _ in Shork.PostOrder(program.tree)),
+            Shork.Backend.VM: len(program.Compile().code) // 2
+        }
+        # Shared subexpressions are only charged the first time, so the memo walker is measured
+        budget = Shork.ExecutionBudget(Shork.ExecutionLimits(maxIntegerBits=1 << 16))
+        Outcome(lambda: Shork.MemoInterpreter.Interpret(program.Share(), MakeContext(), budget))
+        needed[Shork.Backend.MEMO] = budget.steps
+        maxSteps = rng.randint(0, max(needed.values()) + 1)
+        # Both runs are kept from computing towers such as 7 ^ 7 ^ 7 ^ 7; only the steps differ
+        unlimited = Shork.ExecutionLimits(maxIntegerBits=1 << 16)
+        limited = Shork.ExecutionLimits(maxSteps=maxSteps, maxIntegerBits=1 << 16)
+        for backend in Shork.Backend:
+            expected = Outcome(DescribeRun(lambda context: Shork.RunProgram(Shork.Program.Parse(Shork.TableLexer.Stream(text, "<diff>")), backend,
+                                                                            context=context, limits=unlimited)))
+            outcome = Outcome(DescribeRun(lambda context: Shork.RunProgram(Shork.Program.Parse(Shork.TableLexer.Stream(text, "<diff>")), backend,
+                                                                           context=context, limits=limited)))
+            if outcome[:3] == ('error', 'Limit Exceeded', f'Evaluation took more than {maxSteps} steps'):
+                # The adaptive walker runs a fresh tree here, so it needs as many steps as the tree walker
+                same = maxSteps < needed[backend]
+            else:
+                same = outcome == expected and (maxSteps >= needed[backend] or expected[0] != 'ok')
+            if not same:
+                report(f'steps-{backend.name.lower()}', f'{text} in {maxSteps} steps', expected, outcome)
+
+    # Operators whose integer results stay within the width give the unlimited result, and any
+    # wider one stops the run
+    limits = Shork.ExecutionLimits(maxIntegerBits=LIMIT_BITS)
+    for _ in range(options.cases):
+        text = GenerateWide(rng)
+        hook = WidthHook()
+        expected = Outcome(lambda: Shork.Interpreter.Interpret(ParseReference(text), MakeContext(), [hook]), Raw)
+        for backend in Shork.Backend:
+            outcome = Outcome(RunLimited(text, backend, limits), Raw)
+            if hook.widest > LIMIT_BITS:
+                same = outcome[:3] == ('error', 'Limit Exceeded', f'Result is wider than {LIMIT_BITS} bits')
+            else:
+                same = outcome == expected
+            if not same:
+                report(f'bits-{backend.name.lower()}', text, expected if hook.widest <= LIMIT_BITS else 'Limit Exceeded', outcome)
+
+    # 9 ^ 9 ^ 9 is refused before it is computed, and a run out of time stops
+    text = ' + '.join(['1'] * LIMIT_TERMS)
+    for backend in Shork.Backend:
+        outcome = Outcome(RunLimited('9 ^ 9 ^ 9', backend, Shork.ExecutionLimits(timeout=5, maxIntegerBits=1 << 16)))
+        if outcome[:3] != ('error', 'Limit Exceeded', f'Result is wider than {1 << 16} bits') or outcome[3:5] != (0, 0):
+            report(f'power-{backend.name.lower()}', '9 ^ 9 ^ 9', 'Limit Exceeded at 0', outcome)
+        outcome = Outcome(RunLimited(text, backend, Shork.ExecutionLimits(timeout=0)))
+        if outcome[:3] != ('error', 'Limit Exceeded', 'Evaluation took longer than 0 seconds'):
+            report(f'timeout-{backend.name.lower()}', f'{LIMIT_TERMS} terms', 'Limit Exceeded', outcome)
+
+    # The memo walker fails this before its clock is first read, but repeats it on the tree, which
+    # is twice as long, to report the error, and that repeat is held to the same deadline
+    terms = ' + '.join(['a'] * (Shork.BUDGET_CHECK_INTERVAL // 3))
+    text = f'({terms}) * ({terms}) / 0'
+    outcome = Outcome(RunLimited(text, Shork.Backend.MEMO, Shork.ExecutionLimits(timeout=0)))
+    if outcome[:3] != ('error', 'Limit Exceeded', 'Evaluation took longer than 0 seconds'):
+        report('timeout-memo-repeat', f'{terms.count("a")} shared terms', 'Limit Exceeded', outcome)
+
+##############
+### SHARED ###
+##############
+
+def DescribeOverlay(text:str, backend:Shork.Backend, overlay:Shork.SymbolTable) -> tuple:
+    # The result and whatever the run wrote, which only the overlay holds
+    program = Shork.Program.Parse(Shork.TableLexer.Stream(text, "<diff>"))
+    outcome = Outcome(lambda: Shork.RunProgram(program, backend, context=Shork.Context("<diff>", symbolTable=overlay)), Raw)
+    return outcome, {name: Raw(value) for name, value in overlay.symbols.items()}
+
+def CheckShared(rng:random.Random, options:argparse.Namespace, report:Callable[..., None]) -> None:
+    # Threads running against overlays of one shared table see only the snapshot they started from,
+    # whatever the others commit meanwhile, and the last commit of a name is the one that stays
+    shared = Shork.SharedSymbolTable()
+    for name, value in VARIABLES.items():
+        shared.Set(name, value)
+    texts = []
+    while len(texts) < options.cases:
+        text = GenerateExpression(rng)
+        try:
+            Shork.Program.Parse(Shork.TableLexer.Stream(text, "<diff>"))
+            texts.append(text)
+        except Shork.ShorkError:
+            pass
+    backends = list(Shork.Backend)
+    runs = []
+    def Work(index:int) -> None:
+        for number in range(index, len(texts), SHARED_THREADS):
+            overlay = shared.Overlay()
+            outcome = DescribeOverlay(texts[number], backends[number % len(backends)], overlay)
+            runs.append((number, overlay.parent, outcome, shared.Commit(overlay)))
+    threads = [threading.Thread(target=Work, args=(index,)) for index in range(SHARED_THREADS)]
+    for thread in threads: thread.start()
+    for thread in threads: thread.join()
+
+    lastWrites = {}
+    for number, snapshot, outcome, committed in runs:
+        expected = DescribeOverlay(texts[number], Shork.Backend.TREE, Shork.SymbolTable(snapshot))
+        if outcome != expected:
+            report('shared-overlay', texts[number], expected, outcome)
+        for name, value in outcome[1].items():
+            if committed.version > lastWrites.get(name, (0,))[0]:
+                lastWrites[name] = (committed.version, value)
+    final = {name: Raw(value) for name, value in shared.Snapshot().symbols.items()}
+    expected = VARIABLES | {name: value for name, (_, value) in lastWrites.items()}
+    if final != expected:
+        report('shared-commits', f'{len(runs)} commits', expected, final)
+
+    # Without merging, only a name someone else committed since the snapshot is refused
+    base = shared.Snapshot()
+    before = base.symbols
+    first, second, third = shared.Overlay(), shared.Overlay(), shared.Overlay()
+    first.Set('a', 1)
+    second.Set('a', 2)
+    third.Set('b', 3)
+    shared.Commit(first, merge=False)
+    outcome = Outcome(lambda: shared.Commit(second, merge=False), lambda snapshot: snapshot.version)
+    if outcome[:2] != ('crash', 'CommitConflictError') or Raw(shared.Get('a')) != 1:
+        report('shared-conflict', "a written twice", 'CommitConflictError', outcome)
+    outcome = Outcome(lambda: Raw(shared.Commit(third, merge=False).Get('b')))
+    if outcome != ('ok', 3):
+        report('shared-no-conflict', "b written once", ('ok', 3), outcome)
+    outcome = Outcome(lambda: base.Set('a', 4))
+    if outcome[:2] != ('crash', 'TypeError') or base.symbols != before:
+        report('shared-snapshot', "snapshot written", 'TypeError', outcome)
+
+    # Names resolved by many threads at once still get a slot each
+    names = [[f'shared_{index}_{number}' for number in range(SHARED_NAMES)] for index in range(SHARED_THREADS)]
+    threads = [threading.Thread(target=lambda names: [Shork.SYMBOL_SLOTS.Slot(name) for name in names], args=(group,)) for group in names]
+    for thread in threads: thread.start()
+    for thread in threads: thread.join()
+    slots = {name: Shork.SYMBOL_SLOTS.Find(name) for group in names for name in group}
+    if len(set(slots.values())) != len(slots) or any(Shork.SYMBOL_SLOTS.names[slot] != name for name, slot in slots.items()):
+        report('shared-slots', f'{len(slots)} names', 'a slot each', sorted(slots)[:10])
+
+    # With all those names handed out, a table holding one name, and the snapshot committing it
+    # publishes, still store just that one
+    shared = Shork.SharedSymbolTable()
+    overlay = shared.Overlay()
+    overlay.Set(names[-1][-1], 1)
+    snapshot = shared.Commit(overlay)
+    if (len(overlay.values), len(snapshot.values), len(snapshot.versions)) != (1, 1, 1):
+        report('shared-sparse', f'1 name of {len(Shork.SYMBOL_SLOTS)}', (1, 1, 1), (len(overlay.values), len(snapshot.values), len(snapshot.versions)))
+
+################
+### REACTIVE ###
+################
+
+def GenerateFormula(rng:random.Random, names:list[str], depth:int = 0) -> str:
+    if depth >= 3 or rng.random() < 0.35:
+        return rng.choice(names) if rng.random() < 0.7 else str(rng.randint(0, 5))
+    return f'({GenerateFormula(rng, names, depth + 1)} {rng.choice("+-*/")} {GenerateFormula(rng, names, depth + 1)})'
+
+def ReactiveReference(inputs:dict, formulas:dict[str, tuple[str, set]]) -> tuple[dict, set]:
+    # Every formula run from scratch, after everything it reads; one that fails leaves its name
+    # undefined. Returns the values and the formulas that failed.
+    context = MakeContext({'null': 0} | inputs)
+    order = graphlib.TopologicalSorter({name: reads & formulas.keys() for name, (_, reads) in formulas.items()}).static_order()
+    failed = set()
+    for name in order:
+        try:
+            Shork.Interpreter.Interpret(ParseReference(formulas[name][0]), context)
+        except Shork.ShorkError:
+            failed.add(name)
+    return {name: (type(value), repr(value)) for name, value in context.symbolTable.symbols.items()}, failed
+
+def CheckReactive(rng:random.Random, options:argparse.Namespace, report:Callable[..., None]) -> None:
+    # After every change a reactive table holds what running all of its formulas from scratch
+    # gives, tells subscribers about exactly the names that changed, and runs no formula that is
+    # not downstream of the change
+    inputNames = [f'i{index}' for index in range(REACTIVE_INPUTS)]
+    formulaNames = [f'f{index}' for index in range(REACTIVE_FORMULAS)]
+    for _ in range(max(options.cases // REACTIVE_CHANGES, 1)):
+        table = Shork.ReactiveTable(symbolTable=Shork.SymbolTable())
+        table.Set('null', 0)
+        inputs = {'null': 0}
+        formulas:dict[str, tuple[str, set]] = {}
+        notified = []
+        for name in inputNames + formulaNames:
+            table.Subscribe(name, lambda name, value, error: notified.append(name))
+
+        for change in range(REACTIVE_CHANGES):
+            before, failedBefore = ReactiveReference(inputs, formulas)
+            choice = rng.random()
+            if change < REACTIVE_FORMULAS or choice < 0.4:
+                name = formulaNames[change] if change < REACTIVE_FORMULAS else rng.choice(formulaNames)
+                # Early formulas read only what came before them; later ones may close a loop
+                names = inputNames + (formulaNames[:change] if change < REACTIVE_FORMULAS else formulaNames)
+                text = f'VAR {name} = {GenerateFormula(rng, names)}'
+                reads = {node.varNameToken.value for node in Shork.PostOrder(ParseReference(text).valueNode) if isinstance(node, Shork.VarAccessNode)}
+                candidate = formulas | {name: (text, reads)}
+                try:
+                    graphlib.TopologicalSorter({key: value & candidate.keys() for key, (_, value) in candidate.items()}).prepare()
+                    cyclic = False
+                except graphlib.CycleError:
+                    cyclic = True
+                downstream = {name} | table.Downstream([name])
+                outcome = Outcome(lambda: table.Define(text))
+                if cyclic:
+                    if outcome[:2] != ('error', 'Circular Dependency'):
+                        report('reactive-cycle', text, 'Circular Dependency', outcome)
+                    continue
+                formulas = candidate
+            elif choice < 0.9 or not formulas:
+                name = rng.choice(inputNames)
+                text = f'{name} = {(value := rng.choice([0, 1, 2, 2.5, -3]))}'
+                downstream = table.Downstream([name])
+                inputs[name] = value
+                outcome = Outcome(lambda: table.Set(name, value))
+            else:
+                name = rng.choice(sorted(formulas))
+                text = f'remove {name}'
+                downstream = table.Downstream([name])
+                del formulas[name]
+                outcome = Outcome(lambda: table.Remove(name))
+
+            expected, failed = ReactiveReference(inputs, formulas)
+            if outcome[0] == 'crash':
+                report('reactive-crash', text, 'no crash', outcome)
+            received = {name: (type(value), repr(value)) for name, value in table.context.symbolTable.symbols.items()}
+            if received != expected:
+                report('reactive-values', text, expected, received)
+            # A formula starting to fail is news even when it had no value before
+            changed = {name for name in expected.keys() | before.keys() if expected.get(name) != before.get(name)} | (failed - failedBefore)
+            if set(notified) != changed or len(notified) != len(changed):
+                report('reactive-notify', text, sorted(changed), notified)
+            if table.recomputed > len(downstream):
+                report('reactive-work', text, f'at most {len(downstream)} formulas', table.recomputed)
+            notified.clear()
+
+#################
+### WORKLOADS ###
+#################
+
+def CheckWorkloads(rng:random.Random, options:argparse.Namespace, report:Callable[..., None]) -> None:
+    # The benchmark's stages have to do the same work for their timings to be compared
+    import ShorkBench
+    # Long flat sums are as deep as they are long, so this raises the limit as ShorkBench does
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 10000))
+    for workload in ShorkBench.GenerateWorkloads(options.seed):
+        expected = Outcome(lambda: Shork.Interpreter.Interpret(ParseReference(workload.text), MakeContext(VARIABLES | workload.variables)), Raw)
+        for stage in ('interpret', 'adaptive', 'memo', 'vm'):
+            outcome = Outcome(ShorkBench.StageFunction(workload, stage), Raw)
+            if outcome != expected:
+                report(f'bench-{stage}', workload.name, expected, outcome)
+        
+        expected = Outcome(ShorkBench.StageFunction(workload, 'lex'), DescribeTokens)
+        outcome = Outcome(ShorkBench.StageFunction(workload, 'table-lex'), DescribeTokens)
+        if outcome != expected:
+            report('bench-table-lex', workload.name, expected, outcome)
+
+#############
+### HOOKS ###
+#############
+
+class RecordingHook(Shork.InterpreterHook):
+    # Counts calls and checks that every node entered is exited, innermost first
+    def __init__(self) -> None:
+        self.active:list[Shork.NodeBase] = []
+        self.calls = 0
+        self.unbalanced = 0
+    
+    def Enter(self, node:Shork.NodeBase, context:Shork.Context) -> None:
+        self.active.append(node)
+        self.calls += 1
+    
+    def Exit(self, node:Shork.NodeBase, context:Shork.Context, value:any, error:BaseException) -> None:
+        if not self.active or self.active.pop() is not node:
+            self.unbalanced += 1
+
+def CheckHooks(rng:random.Random, options:argparse.Namespace, report:Callable[..., None]) -> None:
+    # Hooks only watch: a run gives what it gives without them, and the profiler and tracer
+    # see every node the run visits
+    for _ in range(options.cases):
+        text = GenerateExpression(rng)
+        try:
+            tree = Shork.Program.Parse(Shork.TableLexer.Stream(text, "<diff>")).tree
+        except Shork.ShorkError:
+            continue
+        expected = Outcome(DescribeRun(lambda context: Shork.Interpreter.Interpret(tree, context)))
+        recorder, profiler, trace = RecordingHook(), Shork.Profiler(), io.StringIO()
+        hooks = [recorder, profiler, Shork.Tracer(trace)]
+        outcome = Outcome(DescribeRun(lambda context: Shork.Interpreter.Interpret(tree, context, hooks)))
+        if outcome != expected:
+            report('hooks', text, expected, outcome)
+        
+        calls = {
+            'recorded': recorder.calls,
+            'profiled by type': sum(entry.calls for entry in profiler.byType.values()),
+            'profiled by span': sum(entry.calls for entry in profiler.bySpan.values()),
+            'traced': sum(line.lstrip().startswith('> ') for line in trace.getvalue().splitlines())
+        }
+        if recorder.active or recorder.unbalanced or profiler.frames or len(set(calls.values())) != 1:
+            report('hook-calls', text, recorder.calls, calls)
+
+##############
+### RUNNER ###
+##############
+
+def ExpectedRecord(outcome:tuple, valueRecord:Callable[[any], any]) -> tuple:
+    if outcome[0] == 'ok':
+        return ('ok', valueRecord(outcome[1]))
+    if outcome[0] == 'error':
+        # Records count lines and columns from one
+        return ('error', outcome[1], outcome[2], outcome[4] + 1, outcome[5] + 1)
+    return ('error', outcome[1], outcome[2])
+
+def DescribeRecord(record:dict) -> tuple:
+    if record['ok']:
+        return ('ok', record['value'])
+    error = record['error']
+    return ('error', error['name'], error['details']) + ((error['line'], error['column']) if 'line' in error else ())
+
+def CheckRunner(rng:random.Random, options:argparse.Namespace, report:Callable[..., None]) -> None:
+    # Programs run in one process and across a pool, in order and not, must each give the
+    # record of a run on its own. No program sees another's assignments.
+    import ShorkBatch
+    lines, texts, expected = [], [], []
+    for _ in range(options.cases):
+        text = GenerateExpression(rng)
+        outcome = Outcome(lambda: Shork.Interpreter.Interpret(ParseReference(text), MakeContext(RUNNER_VARIABLES)), Raw)
+        if rng.random() < 0.05:
+            # Lines that are not programs fail on their own without stopping the rest
+            lines.append(rng.choice(['{"source": ', '{"name": "x"}', '[1, 2]', '{"source": 1}']))
+            texts.append(None)
+            expected.append(('error', "Invalid Request", "Expected a JSON object with a 'source' string, or a string"))
+        # Lines are objects with a name or bare strings, between blank lines that are skipped
+        lines.append(json.dumps({'source': text, 'name': f'<program {len(texts)}>'} if rng.random() < 0.5 else text))
+        if rng.random() < 0.1:
+            lines.append('')
+        texts.append(text)
+        expected.append(ExpectedRecord(outcome, ShorkBatch.ValueRecord))
+    
+    programs = list(ShorkBatch.ReadJsonLines(lines))
+    if [program.text for program in programs] != texts or [program.index for program in programs] != list(range(len(texts))):
+        report('runner-jsonl', f'{len(texts)} programs', texts, [program.text for program in programs])
+        return
+    
+    for jobs, ordered in ((1, True), (2, True), (2, False)):
+        name = f'runner-{jobs}' + ('' if ordered else '-unordered')
+        records = sorted(ShorkBatch.RunBatch(programs, jobs=jobs, ordered=ordered), key=lambda record: record['index'])
+        if [record['index'] for record in records] != list(range(len(programs))):
+            report(name, f'{len(programs)} programs', list(range(len(programs))), [record['index'] for record in records])
+            continue
+        for program, record, want in zip(programs, records, expected):
+            if DescribeRecord(record) != want:
+                report(name, program.text, want, DescribeRecord(record))
+
+##############
+### SERVER ###
+##############
+
+def CheckServer(rng:random.Random, options:argparse.Namespace, report:Callable[..., None]) -> None:
+    # Sessions served at once must each answer like one context that every request of that session
+    # runs against in turn, keeping its own assignments and never seeing another's
+    import ShorkServer
+    from concurrent.futures import ThreadPoolExecutor
+    from ShorkBatch import ValueRecord
+    sessions = []
+    for _ in range(SERVER_SESSIONS):
+        context, requests = MakeContext(RUNNER_VARIABLES), []
+        for _ in range(options.cases // SERVER_SESSIONS):
+            text = GenerateExpression(rng)
+            outcome = Outcome(lambda: Shork.Interpreter.Interpret(ParseReference(text), context), Raw)
+            requests.append((text, ExpectedRecord(outcome, ValueRecord)))
+        sessions.append(requests)
+
+    async def Talk(port:int, requests:list[tuple[str, tuple]]) -> list[dict]:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        replies = []
+        for requestId, (text, _) in enumerate(requests):
+            writer.write(json.dumps({'id': requestId, 'source': text}).encode('utf-8') + b'\n')
+            await writer.drain()
+            replies.append(json.loads(await reader.readline()))
+        writer.close()
+        return replies
+
+    async def Run() -> list[list[dict]]:
+        executor = ThreadPoolExecutor(1)
+        server = ShorkServer.EvaluationServer(executor)
+        listener = await server.Start(port=0)
+        try:
+            port = listener.sockets[0].getsockname()[1]
+            return await asyncio.gather(*(Talk(port, requests) for requests in sessions))
+        finally:
+            listener.close()
+            await listener.wait_closed()
+            executor.shutdown()
+
+    for requests, replies in zip(sessions, asyncio.run(Run())):
+        for requestId, ((text, want), reply) in enumerate(zip(requests, replies)):
+            if reply.get('id') != requestId or DescribeRecord(reply) != want:
+                report('server', text, want, reply)
+
+################
+### ONE-SHOT ###
+################
+
+def CheckOneShot(rng:random.Random, options:argparse.Namespace, report:Callable[..., None]) -> None:
+    # A one-shot run must give the record of the batch runner, whether the prelude's globals come
+    # from running it or from its snapshot, and a snapshot must be rebuilt once the prelude changes
+    import ShorkRun
+    from ShorkBatch import ValueRecord
+    before = Shork.GLOBAL_SYMBOL_TABLE.snapshot
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            preludePath = os.path.join(directory, 'prelude.shk')
+            for case in range(options.cases // 10):
+                lines, variables = [], dict(RUNNER_VARIABLES)
+                for name in PRELUDE_NAMES:
+                    value = rng.randint(-9, 9 ** (case % 4))
+                    lines.append(f'VAR {name} = {value}')
+                    variables[name] = value
+                with open(preludePath, 'w') as file:
+                    file.write(';\n'.join(lines))
+                # Python tells a rewritten .pyc apart by its size and mtime, and so does the snapshot
+                os.utime(preludePath, ns=(case, case))
+
+                Shork.GLOBAL_SYMBOL_TABLE.snapshot = before
+                for reuse in (False, True):
+                    snapshot = ShorkRun.PreludeSnapshot(preludePath)
+                    snapshot.Install()
+                    if (snapshot.loaded, snapshot.written) != (reuse, not reuse):
+                        report('oneshot-snapshot', '; '.join(lines), (reuse, not reuse), (snapshot.loaded, snapshot.written))
+                    symbols = Shork.GLOBAL_SYMBOL_TABLE.symbols
+                    if symbols != variables:
+                        report('oneshot-prelude', '; '.join(lines), variables, symbols)
+                    Shork.GLOBAL_SYMBOL_TABLE.snapshot = before
+                
+                snapshot.Install()
+                for _ in range(10):
+                    text = GenerateFormula(rng, PRELUDE_NAMES + ['null', 'missing'])
+                    outcome = Outcome(lambda: Shork.Interpreter.Interpret(ParseReference(text), MakeContext(variables)), Raw)
+                    record = ShorkRun.RunOnce(text, "<diff>")
+                    if DescribeRecord(record) != ExpectedRecord(outcome, ValueRecord):
+                        report('oneshot', text, ExpectedRecord(outcome, ValueRecord), DescribeRecord(record))
+                if Shork.GLOBAL_SYMBOL_TABLE.symbols != variables:
+                    report('oneshot-globals', '; '.join(lines), variables, Shork.GLOBAL_SYMBOL_TABLE.symbols)
+                Shork.GLOBAL_SYMBOL_TABLE.snapshot = before
+
+            # The exit code and output a caller sees, from a process of its own
+            runner = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ShorkRun.py')
+            with open(preludePath, 'w') as file:
+                file.write('VAR p = 6')
+            missingPath = os.path.join(directory, 'missing.shk')
+            failingPath = os.path.join(directory, 'failing.shk')
+            with open(failingPath, 'w') as file:
+                file.write('VAR q = 0 ^ -1')
+            for arguments, want in ((['-e', 'p * 7', '--prelude', preludePath], (0, 'ok', 42)),
+                                    (['-e', 'p / 0', '--prelude', preludePath], (1, 'error', 'Runtime Error')),
+                                    (['-e', '0 ^ -p', '--prelude', preludePath], (1, 'error', 'Runtime Error')),
+                                    (['-e', 'p', '--prelude', failingPath], (2, 'error', 'Runtime Error')),
+                                    (['-e', 'p', '--prelude', missingPath], (2, None, None))):
+                finished = subprocess.run([sys.executable, runner, '--json'] + arguments, capture_output=True)
+                record = json.loads(finished.stdout) if finished.stdout else {}
+                outcome = (finished.returncode, 'ok' if record.get('ok') else 'error' if record else None,
+                           record.get('value', record.get('error', {}).get('name')))
+                if outcome != want:
+                    report('oneshot-process', ' '.join(arguments), want, outcome)
+    finally:
+        Shork.GLOBAL_SYMBOL_TABLE.snapshot = before
+
+############
+### MAIN ###
+############
+
+SUITES = {
+    'backends': CheckBackends,
+    'lexers': CheckLexers,
+    'parsers': CheckParsers,
+    'deep': CheckDeep,
+    'incremental': CheckIncremental,
+    'statements': CheckStatements,
+    'cache': CheckCache,
+    'batch': CheckBatch,
+    'allocations': CheckAllocations,
+    'adaptive': CheckAdaptive,
+    'memo': CheckMemo,
+    'limits': CheckLimits,
+    'shared': CheckShared,
+    'reactive': CheckReactive,
+    'workloads': CheckWorkloads,
+    'hooks': CheckHooks,
+    'runner': CheckRunner,
+    'server': CheckServer,
+    'oneshot': CheckOneShot
+}
+
+def Main(arguments:list[str]) -> int:
+    parser = argparse.ArgumentParser(description="Checks the ShorkBasic implementations that should agree against each other on random programs.")
+    parser.add_argument('--seed', type=int, default=1, help="seed for the program generators")
+    parser.add_argument('--cases', type=int, default=300, help="random programs per suite")
+    parser.add_argument('--suite', action='append', choices=list(SUITES), help="only run these suites")
+    options = parser.parse_args(arguments)
+
+    mismatches = 0
+    def Report(name:str, text:str, expected:tuple, outcome:tuple) -> None:
+        nonlocal mismatches
+        mismatches += 1
+        if mismatches <= MAX_REPORTED:
+            print(f"{name} differs on {text!r}:\n  expected {expected}\n  received {outcome}", file=sys.stderr)
+
+    for suite in options.suite or SUITES:
+        SUITES[suite](random.Random(options.seed), options, Report)
+
+    if mismatches:
+        print(f"{mismatches} mismatch(es)", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(Main(sys.argv[1:]))
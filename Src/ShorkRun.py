@@ -0,0 +1,210 @@
+###############
+### IMPORTS ###
+###############
+
+from __future__ import annotations
+import time
+
+# Taken before anything else is imported, so --startup-time covers loading the interpreter
+STARTED = time.perf_counter()
+
+import sys, os, json, pickle, argparse
+
+import ShorkBasic as Shork
+from ShorkBatch import ValueRecord, ErrorRecord
+
+#################
+### CONSTANTS ###
+#################
+
+# Bump whenever the snapshot changes shape; the cache format covers the values stored in it
+SNAPSHOT_FORMAT_VERSION = (1, Shork.CACHE_FORMAT_VERSION)
+
+# Exit codes: the program ran, the program failed, or it never ran because of how it was invoked
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+
+##################
+### EVALUATION ###
+##################
+
+class Options:
+    def __init__(self, backend:Shork.Backend = Shork.Backend.VM,
+                 optimizationLevel:Shork.OptimizationLevel = Shork.OptimizationLevel.NONE,
+                 limits:Shork.ExecutionLimits = None) -> None:
+        self.backend = backend
+        self.optimizationLevel = optimizationLevel
+        # Applied to each statement on its own
+        self.limits = limits
+
+def Evaluate(text:str, filename:str, context:Shork.Context, options:Options = None) -> Shork.Object:
+    # Runs the ';' separated statements in turn, stopping at the first error, and returns the
+    # value of the last one, or None if there were none
+    options = options or Options()
+    parser = Shork.StatementParser(Shork.TableLexer.Stream(text, filename))
+    value = None
+    while True:
+        tree = parser.NextStatement()
+        if tree == None:
+            return value
+        program = Shork.Program.FromTree(tree, options.optimizationLevel)
+        value = Shork.RunProgram(program, options.backend, context=context, limits=options.limits)
+
+def RunOnce(text:str, filename:str, options:Options = None) -> dict:
+    # Runs against a private overlay of the global symbol table, which it leaves untouched
+    context = Shork.Context("<program>", symbolTable=Shork.GLOBAL_SYMBOL_TABLE.Overlay())
+    try:
+        value = Evaluate(text, filename, context, options)
+        record = {'ok': True, 'value': None if value == None else ValueRecord(Shork.Unbox(value))}
+    except Shork.ShorkError as error:
+        # Kept for the plain output, which renders it the way the REPL would; JSON output never does
+        record = {'ok': False, 'error': ErrorRecord(error), 'exception': error}
+    except (RecursionError, MemoryError, ValueError, OverflowError) as error:
+        # Limits of the host rather than errors in the program
+        record = {'ok': False, 'error': {'name': type(error).__name__, 'details': str(error)}, 'exception': error}
+    return record
+
+###############
+### PRELUDE ###
+###############
+
+class PreludeError(Exception):
+    def __init__(self, record:dict) -> None:
+        super().__init__(record['error']['details'])
+        self.record = record
+
+class PreludeSnapshot:
+    def __init__(self, preludePath:str, snapshotPath:str = None) -> None:
+        self.preludePath = preludePath
+        # Kept next to the prelude and named for the Python that wrote it, like a .pyc
+        self.snapshotPath = snapshotPath or f'{os.path.splitext(preludePath)[0]}.{sys.implementation.cache_tag}.shorks'
+        self.loaded = False
+        self.written = False
+
+    def Key(self) -> tuple:
+        # Checked the way Python checks a .pyc against its source, so a valid snapshot is used
+        # without reading the prelude at all
+        stat = os.stat(self.preludePath)
+        return (os.path.abspath(self.preludePath), stat.st_mtime_ns, stat.st_size)
+
+    def Install(self, options:Options = None, useSnapshot:bool = True) -> None:
+        # Publishes the globals the prelude leaves behind, from the snapshot if it is up to date
+        # and by running the prelude, then storing a new snapshot, if not
+        key = self.Key()
+        symbols = self.Read(key) if useSnapshot else None
+        if symbols == None:
+            symbols = self.Build(options)
+            if useSnapshot: self.Write(key, symbols)
+        overlay = Shork.SymbolTable(Shork.GLOBAL_SYMBOL_TABLE.Snapshot())
+        for name, value in symbols.items():
+            overlay.Set(name, value)
+        Shork.GLOBAL_SYMBOL_TABLE.Commit(overlay)
+
+    def Build(self, options:Options = None) -> dict:
+        with open(self.preludePath, encoding='utf-8') as file:
+            text = file.read()
+        context = Shork.Context("<prelude>", symbolTable=Shork.GLOBAL_SYMBOL_TABLE.Overlay())
+        try:
+            Evaluate(text, self.preludePath, context, options)
+        except Shork.ShorkError as error:
+            raise PreludeError({'ok': False, 'error': ErrorRecord(error), 'exception': error})
+        # Every global is stored, not only the prelude's, so loading needs nothing else
+        return {**Shork.GLOBAL_SYMBOL_TABLE.symbols, **context.symbolTable.symbols}
+
+    def Read(self, key:tuple) -> dict:
+        try:
+            with open(self.snapshotPath, 'rb') as file:
+                version, storedKey, symbols = pickle.load(file)
+        except (OSError, EOFError, ValueError, pickle.UnpicklingError, AttributeError, ImportError):
+            return None
+        if version != SNAPSHOT_FORMAT_VERSION or storedKey != key:
+            return None
+        self.loaded = True
+        return symbols
+
+    def Write(self, key:tuple, symbols:dict) -> None:
+        # Only needed when the snapshot is rebuilt, so it is not imported at startup
+        import tempfile
+        try:
+            data = pickle.dumps((SNAPSHOT_FORMAT_VERSION, key, symbols), pickle.HIGHEST_PROTOCOL)
+            # Written to a temporary file and renamed, so concurrent starts never see a partial snapshot
+            fd, temporaryPath = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.snapshotPath)), suffix='.tmp')
+            with os.fdopen(fd, 'wb') as file:
+                file.write(data)
+            os.replace(temporaryPath, self.snapshotPath)
+        except (OSError, pickle.PicklingError):
+            # The prelude still ran; the next start runs it again
+            return
+        self.written = True
+
+############
+### MAIN ###
+############
+
+def Report(record:dict, asJson:bool) -> None:
+    if asJson:
+        print(json.dumps({key: value for key, value in record.items() if key != 'exception'}), flush=True)
+    elif record['ok']:
+        if record['value'] != None:
+            print(record['value'], flush=True)
+    else:
+        error = record['exception']
+        message = error if isinstance(error, Shork.ShorkError) else f"{type(error).__name__}: {error}"
+        print(message, file=sys.stderr, flush=True)
+
+def Main(arguments:list[str]) -> int:
+    parser = argparse.ArgumentParser(description="Evaluates one ShorkBasic program and exits, for callers that start the interpreter often.",
+                                     epilog="Exits with 0 once the program has run, 1 if it failed, and 2 if it could not be run at all.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('-e', dest='expression', help="the program to run")
+    source.add_argument('-f', dest='file', help="a file holding the program to run, or - for stdin")
+    parser.add_argument('--json', action='store_true', help="write the result as one JSON object on stdout")
+    parser.add_argument('--prelude', help="a file of statements whose globals every program sees")
+    parser.add_argument('--snapshot', help="where the prelude's globals are stored between runs")
+    parser.add_argument('--no-snapshot', action='store_true', help="run the prelude every time")
+    parser.add_argument('--startup-time', action='store_true', help="report how long the interpreter took to become ready")
+    parser.add_argument('--tree', action='store_true', help="run on the tree walker instead of the VM")
+    parser.add_argument('-O', dest='level', type=int, nargs='?', const=2, default=0, choices=[0, 1, 2], help="optimization level")
+    parser.add_argument('--max-steps', type=int, default=None, help="evaluation steps per statement")
+    parser.add_argument('--timeout', type=float, default=None, help="seconds per statement")
+    parser.add_argument('--max-int-bits', type=int, default=None, help="widest integer the program may compute")
+    options = parser.parse_args(arguments)
+
+    limits = None
+    if options.max_steps != None or options.timeout != None or options.max_int_bits != None:
+        limits = Shork.ExecutionLimits(options.max_steps, options.timeout, options.max_int_bits)
+    runOptions = Options(Shork.Backend.TREE if options.tree else Shork.Backend.VM, Shork.OptimizationLevel(options.level), limits)
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 10000))
+    # Results are written in full, however many digits they have
+    sys.set_int_max_str_digits(0)
+
+    try:
+        if options.expression != None:
+            text, filename = options.expression, "<EXPR>"
+        elif options.file == '-':
+            text, filename = sys.stdin.read(), "<STDIN>"
+        else:
+            with open(options.file, encoding='utf-8') as file:
+                text, filename = file.read(), options.file
+
+        if options.prelude != None:
+            PreludeSnapshot(options.prelude, options.snapshot).Install(runOptions, not options.no_snapshot)
+    except (OSError, UnicodeDecodeError) as error:
+        print(f"{parser.prog}: {error}", file=sys.stderr)
+        return EXIT_USAGE
+    except PreludeError as error:
+        Report(error.record, options.json)
+        return EXIT_USAGE
+
+    ready = time.perf_counter()
+    record = RunOnce(text, filename, runOptions)
+    if options.startup_time:
+        record['startupSeconds'] = ready - STARTED
+        if not options.json:
+            print(f"Ready in {(ready - STARTED) * 1e3:.2f} ms", file=sys.stderr)
+    Report(record, options.json)
+    return EXIT_OK if record['ok'] else EXIT_FAILED
+
+if __name__ == "__main__":
+    sys.exit(Main(sys.argv[1:]))
@@ -0,0 +1,243 @@
+###############
+### IMPORTS ###
+###############
+
+from __future__ import annotations
+import sys, os, json, signal, asyncio, argparse, itertools
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+import ShorkBasic as Shork
+from ShorkBatch import ValueRecord, ErrorRecord, InitializeWorker
+
+##############
+### LIMITS ###
+##############
+
+class SessionLimits:
+    def __init__(self, maxLineBytes:int = 1 << 16, maxVariables:int = 1024, timeout:float = 10.0,
+                 idleTimeout:float = 300.0, maxSessions:int = 256, maxSteps:int = None, maxIntegerBits:int = 1 << 16) -> None:
+        # Longest request line a session may send
+        self.maxLineBytes = maxLineBytes
+        # Variables a session may define before further assignments are refused
+        self.maxVariables = maxVariables
+        # Seconds one evaluation may take before the session is told it timed out
+        self.timeout = timeout
+        # Seconds without a request before the connection is closed
+        self.idleTimeout = idleTimeout
+        # Connections served at once; any more are turned away
+        self.maxSessions = maxSessions
+        # Steps one evaluation may take, and the widest integer it may compute
+        self.maxSteps = maxSteps
+        self.maxIntegerBits = maxIntegerBits
+
+    def ExecutionLimits(self) -> Shork.ExecutionLimits:
+        # What a worker enforces on each evaluation; the timeout stops the worker itself
+        return Shork.ExecutionLimits(self.maxSteps, self.timeout, self.maxIntegerBits)
+
+###############
+### WORKERS ###
+###############
+
+def Evaluate(text:str, symbols:dict, optimizationLevel:Shork.OptimizationLevel, backend:Shork.Backend,
+             limits:Shork.ExecutionLimits = None) -> tuple[dict, dict]:
+    # Runs in a worker. The session's variables travel with the request and come back with the
+    # reply, so any worker can serve any session.
+    symbolTable = Shork.SymbolTable(Shork.GLOBAL_SYMBOL_TABLE)
+    for name, value in symbols.items():
+        symbolTable.Set(name, value)
+    context = Shork.Context("<session>", symbolTable=symbolTable)
+
+    try:
+        program = Shork.PROGRAM_CACHE.Load(text, "<session>", optimizationLevel)
+        value = Shork.RunProgram(program, backend, context=context, limits=limits)
+        record = {'ok': True, 'value': ValueRecord(Shork.Unbox(value))}
+    except Shork.ShorkError as error:
+        record = {'ok': False, 'error': ErrorRecord(error)}
+    except (RecursionError, MemoryError, ValueError, OverflowError) as error:
+        record = {'ok': False, 'error': {'name': type(error).__name__, 'details': str(error)}}
+    return record, symbolTable.symbols
+
+def InitializeServerWorker() -> None:
+    InitializeWorker()
+    sys.set_int_max_str_digits(0)
+
+###############
+### SESSION ###
+###############
+
+class Session:
+    def __init__(self, server:EvaluationServer, sessionId:int, reader:asyncio.StreamReader, writer:asyncio.StreamWriter) -> None:
+        self.server = server
+        self.sessionId = sessionId
+        self.reader = reader
+        self.writer = writer
+        # The session's own variables, layered over the global table in the worker
+        self.symbols:dict = {}
+        self.requests = 0
+
+    async def Serve(self) -> None:
+        limits = self.server.limits
+        # One request is evaluated at a time and the next line is only read once the reply has been
+        # flushed, so a client that does not read its replies stops being read from
+        while True:
+            try:
+                line = await asyncio.wait_for(self.reader.readuntil(b'\n'), limits.idleTimeout)
+            except asyncio.IncompleteReadError as error:
+                if not error.partial.strip(): return
+                line = error.partial
+            except asyncio.LimitOverrunError:
+                await self.Reply(None, self.Failure("Limit Exceeded", f"Requests may be at most {limits.maxLineBytes} bytes"), True)
+                return
+            except asyncio.TimeoutError:
+                return
+
+            if not line.strip(): continue
+            requestId, text, framed = self.Decode(line)
+            if text == None:
+                await self.Reply(requestId, self.Failure("Invalid Request", "Expected a JSON object with a 'source' string"), True)
+                continue
+
+            self.requests += 1
+            await self.Reply(requestId, await self.Evaluate(text), framed)
+
+    def Decode(self, line:bytes) -> tuple[any, str, bool]:
+        # A line holding a JSON object is a framed request; anything else is source code
+        text = line.decode('utf-8', 'replace').rstrip('\r\n')
+        if not text.lstrip().startswith('{'):
+            return None, text, False
+        try:
+            request = json.loads(text)
+            source = request.get('source')
+        except (ValueError, AttributeError):
+            return None, None, True
+        return request.get('id'), source if isinstance(source, str) else None, True
+
+    async def Evaluate(self, text:str) -> dict:
+        server = self.server
+        async with server.pending:
+            future = server.loop.run_in_executor(server.executor, Evaluate, text, self.symbols,
+                                                 server.optimizationLevel, server.backend, server.limits.ExecutionLimits())
+            try:
+                # The worker gives up on its own once the timeout passes and reports where it was.
+                # This only catches work outside the budget, such as parsing, so it allows longer.
+                record, symbols = await asyncio.wait_for(future, 2 * server.limits.timeout)
+            except asyncio.TimeoutError:
+                # A process worker cannot be interrupted; it finishes in the background and its result is dropped
+                return self.Failure("Timeout", f"Evaluation took longer than {server.limits.timeout} seconds")
+
+        if len(symbols) > server.limits.maxVariables:
+            return self.Failure("Limit Exceeded", f"Sessions may define at most {server.limits.maxVariables} variables")
+        self.symbols = symbols
+        return record
+
+    def Failure(self, name:str, details:str) -> dict:
+        return {'ok': False, 'error': {'name': name, 'details': details}}
+
+    async def Reply(self, requestId:any, record:dict, framed:bool) -> None:
+        if framed:
+            data = json.dumps({'id': requestId, **record})
+        elif record['ok']:
+            data = str(record['value'])
+        else:
+            error = record['error']
+            data = f"{error['name']}: {error['details']}"
+            if 'line' in error:
+                data += f" (line {error['line']}, column {error['column']})"
+        self.writer.write(data.encode('utf-8') + b'\n')
+        await self.writer.drain()
+
+##############
+### SERVER ###
+##############
+
+class EvaluationServer:
+    def __init__(self, executor:Executor, limits:SessionLimits = None, maxPending:int = None,
+                 optimizationLevel:Shork.OptimizationLevel = Shork.OptimizationLevel.NONE,
+                 backend:Shork.Backend = Shork.Backend.VM) -> None:
+        self.executor = executor
+        self.limits = limits or SessionLimits()
+        self.optimizationLevel = optimizationLevel
+        self.backend = backend
+        # Evaluations handed to the pool at once, across every session
+        self.maxPending = maxPending or 2 * (os.cpu_count() or 1)
+        self.pending:asyncio.Semaphore = None
+        self.loop:asyncio.AbstractEventLoop = None
+        self.sessions:dict[int, Session] = {}
+        self.sessionIds = itertools.count(1)
+
+    async def Start(self, host:str = '127.0.0.1', port:int = 7777, path:str = None) -> asyncio.AbstractServer:
+        self.loop = asyncio.get_running_loop()
+        self.pending = asyncio.Semaphore(self.maxPending)
+        if path != None:
+            return await asyncio.start_unix_server(self.HandleConnection, path, limit=self.limits.maxLineBytes)
+        return await asyncio.start_server(self.HandleConnection, host, port, limit=self.limits.maxLineBytes)
+
+    async def HandleConnection(self, reader:asyncio.StreamReader, writer:asyncio.StreamWriter) -> None:
+        session = Session(self, next(self.sessionIds), reader, writer)
+        try:
+            if len(self.sessions) >= self.limits.maxSessions:
+                await session.Reply(None, session.Failure("Limit Exceeded", "Too many sessions"), True)
+                return
+            self.sessions[session.sessionId] = session
+            await session.Serve()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self.sessions.pop(session.sessionId, None)
+            writer.close()
+
+############
+### MAIN ###
+############
+
+async def Serve(options:argparse.Namespace) -> None:
+    if options.workers == 0:
+        # Evaluations share the event loop's process; handy for debugging
+        executor = ThreadPoolExecutor(1)
+    else:
+        executor = ProcessPoolExecutor(options.workers, initializer=InitializeServerWorker)
+
+    limits = SessionLimits(options.max_line_bytes, options.max_variables, options.timeout,
+                           options.idle_timeout, options.max_sessions, options.max_steps, options.max_int_bits)
+    server = EvaluationServer(executor, limits, options.max_pending, Shork.OptimizationLevel(options.level),
+                              Shork.Backend.TREE if options.tree else Shork.Backend.VM)
+    listener = await server.Start(options.host, options.port, options.unix)
+
+    loop = asyncio.get_running_loop()
+    stopped = loop.create_future()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, lambda: stopped.done() or stopped.set_result(None))
+
+    address = options.unix or f"{options.host}:{listener.sockets[0].getsockname()[1]}"
+    print(f"Listening on {address}", file=sys.stderr, flush=True)
+    try:
+        await stopped
+    finally:
+        listener.close()
+        await listener.wait_closed()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def Main(arguments:list[str]) -> int:
+    parser = argparse.ArgumentParser(description="Serves ShorkBasic sessions over TCP or a Unix socket.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=7777, help="0 picks a free port")
+    parser.add_argument('--unix', help="listen on this Unix socket path instead of TCP")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes, all cores by default; 0 evaluates in-process")
+    parser.add_argument('--max-pending', type=int, default=None, help="evaluations queued on the workers at once")
+    parser.add_argument('--max-sessions', type=int, default=256)
+    parser.add_argument('--max-line-bytes', type=int, default=1 << 16)
+    parser.add_argument('--max-variables', type=int, default=1024)
+    parser.add_argument('--timeout', type=float, default=10.0, help="seconds per evaluation")
+    parser.add_argument('--idle-timeout', type=float, default=300.0, help="seconds before an idle session is closed")
+    parser.add_argument('--max-steps', type=int, default=None, help="evaluation steps per request")
+    parser.add_argument('--max-int-bits', type=int, default=1 << 16, help="widest integer a request may compute")
+    parser.add_argument('--tree', action='store_true', help="run on the tree walker instead of the VM")
+    parser.add_argument('-O', dest='level', type=int, nargs='?', const=2, default=0, choices=[0, 1, 2], help="optimization level")
+    options = parser.parse_args(arguments)
+
+    sys.set_int_max_str_digits(0)
+    asyncio.run(Serve(options))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(Main(sys.argv[1:]))